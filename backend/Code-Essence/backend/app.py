@@ -1,15 +1,27 @@
-from flask import Flask, request, jsonify, session, redirect, url_for, render_template
-from authlib.integrations.flask_client import OAuth
-from summarizer import summarize_repo
+from flask import Flask, request, jsonify, session, redirect, url_for, render_template, Response, stream_with_context, g
+from summarizer import summarize_repo, summarize_repo_file, IGNORE_DIRS
 from healthchecker import analyze_repo_health as summarize_repo_health
 import os
 import warnings
 from dotenv import load_dotenv
-from file_summarizer import summarize_file_content
 from summarizer import summarize_content as summarize_file_content
 from push_summary import push_summary_to_repo
-import tempfile
-import shutil
+import repo_cache
+import summary_cache
+import result_cache
+import metrics
+import snippets
+import jobs
+import json
+import contextvars
+import queue
+import threading
+import time
+import file_access
+import import_graph
+import lockgraph
+import manifests
+from scanner import FileIndex
 import subprocess
 from flask_cors import CORS
 
@@ -20,23 +32,160 @@ GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_REGION = os.getenv("AWS_REGION")
+FILE_STRUCTURE_PAGE_SIZE = int(os.getenv("FILE_STRUCTURE_PAGE_SIZE", "200"))
+FILE_STRUCTURE_MAX_PAGE_SIZE = int(os.getenv("FILE_STRUCTURE_MAX_PAGE_SIZE", "2000"))
 
 app = Flask(__name__)
 CORS(app)
 
 app.secret_key = os.getenv("SECRET_KEY", "supersecret")  # used for session
 
-oauth = OAuth(app)
-github = oauth.register(
-    name="github",
-    client_id=os.getenv("GITHUB_CLIENT_ID"),
-    client_secret=os.getenv("GITHUB_CLIENT_SECRET"),
-    access_token_url="https://github.com/login/oauth/access_token",
-    authorize_url="https://github.com/login/oauth/authorize",
-    api_base_url="https://api.github.com/",
-    client_kwargs={"scope": "user:email"},
-)
-
+_github = None
+_github_lock = threading.Lock()
+
+
+def get_github():
+    """GitHub OAuth client, registered on the first login so authlib stays out of startup"""
+    global _github
+    with _github_lock:
+        if _github is None:
+            from authlib.integrations.flask_client import OAuth
+
+            _github = OAuth(app).register(
+                name="github",
+                client_id=os.getenv("GITHUB_CLIENT_ID"),
+                client_secret=os.getenv("GITHUB_CLIENT_SECRET"),
+                access_token_url="https://github.com/login/oauth/access_token",
+                authorize_url="https://github.com/login/oauth/authorize",
+                api_base_url="https://api.github.com/",
+                client_kwargs={"scope": "user:email"},
+            )
+        return _github
+
+
+def run_summarize_repo_job(params, emit):
+    return summarize_repo(
+        params["repo_url"], params["level"], previous=params.get("previous"), progress=emit,
+        pipeline=params.get("pipeline", "default"), ref=params.get("commit"),
+    )
+
+jobs.register("summarize_repo", run_summarize_repo_job)
+_jobs_recovered = False
+
+@app.before_request
+def recover_jobs():
+    # Pick up jobs interrupted by a restart once this worker serves traffic
+    global _jobs_recovered
+    if not _jobs_recovered:
+        _jobs_recovered = True
+        jobs.recover()
+
+
+@app.before_request
+def start_request_trace():
+    g.trace = metrics.start_trace()
+
+
+def _wants_timings():
+    if request.args.get("timings") in ("1", "true"):
+        return True
+    body = request.get_json(silent=True) if request.is_json else None
+    return isinstance(body, dict) and bool(body.get("timings"))
+
+
+@app.after_request
+def report_request_trace(response):
+    trace = getattr(g, "trace", None)
+    if trace is None:
+        return response
+    endpoint = request.endpoint or "unknown"
+    metrics.observe_histogram(
+        "request_seconds", time.perf_counter() - trace.started,
+        help="HTTP request duration", endpoint=endpoint, status=str(response.status_code),
+    )
+    if trace.stages:
+        response.headers["Server-Timing"] = trace.server_timing()
+    if _wants_timings() and response.mimetype == "application/json" and not response.is_streamed:
+        body = json.loads(response.get_data())
+        if isinstance(body, dict):
+            body["timings"] = trace.as_dict()
+            response.set_data(json.dumps(body))
+    return response
+
+
+@app.teardown_request
+def end_request_trace(exc):
+    metrics.end_trace()
+
+
+def sse_response(run):
+    """
+    Run run(emit) on a worker thread and relay what it emits as Server-Sent
+    Events, ending with a "done" event carrying its return value (or "error").
+    """
+    events = queue.Queue()
+
+    def emit(event, data):
+        events.put((event, data))
+
+    def worker():
+        try:
+            events.put(("done", run(emit)))
+        except Exception as e:
+            print(f"[SERVER ERROR] {e}", flush=True)
+            events.put(("error", {"error": str(e)}))
+        events.put(None)
+
+    threading.Thread(target=contextvars.copy_context().run, args=(worker,), daemon=True).start()
+
+    def generate():
+        while True:
+            item = events.get()
+            if item is None:
+                return
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def cached_json(endpoint, repo_url, params, compute):
+    """
+    Serve compute(commit) through the shared result cache. Identical requests
+    for the same HEAD commit share one computation; X-Cache says how it was served.
+    """
+    commit = repo_cache.resolve_head(repo_url)
+    key = result_cache.request_key(endpoint, repo_url, commit, params)
+    body, status = result_cache.get_or_compute(key, lambda: compute(commit))
+    return Response(body, status=200, mimetype="application/json", headers={"X-Cache": status})
+
+
+def summarize_repo_error(data):
+    """Validation error for a /summarize_repo body, or None"""
+    if not data.get("repo_url"):
+        return "repo_url is required"
+    if data.get("level", "repo") not in ["repo", "folder", "file"]:
+        return "level must be 'repo', 'folder', or 'file'"
+    if data.get("previous") is not None and not isinstance(data["previous"], dict):
+        return "previous must be an earlier summarize_repo result"
+    if data.get("pipeline", "default") not in ["default", "graph"]:
+        return "pipeline must be 'default' or 'graph'"
+    return None
+
+
+def submit_summarize_repo(repo_url, level, previous, pipeline, commit):
+    """Queue a summarize_repo job, sharing one already queued for the same commit"""
+    previous_commit = (previous or {}).get("commit", "")
+    return jobs.submit(
+        "summarize_repo",
+        {"repo_url": repo_url, "level": level, "previous": previous, "pipeline": pipeline,
+         "commit": commit},
+        dedup_key=f"summarize_repo|{repo_url}|{commit}|{level}|{previous_commit}|{pipeline}",
+    )
 
 
 @app.route("/summarize_repo", methods=["POST"])
@@ -44,20 +193,95 @@ def summarize_repository():
     data = request.json
     repo_url = data.get("repo_url")
     level = data.get("level", "repo")
+    previous = data.get("previous")  # earlier result incl. "commit" for incremental runs
+    pipeline = data.get("pipeline", "default")  # default | graph
 
-    if not repo_url:
-        return jsonify({"error": "repo_url is required"}), 400
-    if level not in ["repo", "folder", "file"]:
-        return jsonify({"error": "level must be 'repo', 'folder', or 'file'"}), 400
+    error = summarize_repo_error(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    if data.get("async"):
+        try:
+            commit = repo_cache.resolve_head(repo_url)
+            job_id, created = submit_summarize_repo(repo_url, level, previous, pipeline, commit)
+            return jsonify({
+                "job_id": job_id,
+                "deduplicated": not created,
+                "status_url": url_for("job_status", job_id=job_id),
+                "events_url": url_for("job_events", job_id=job_id),
+            }), 202
+        except Exception as e:
+            print(f"[SERVER ERROR] {e}", flush=True)
+            return jsonify({"error": str(e)}), 500
+
+    if data.get("stream"):
+        # "delta" events carry repo summary text, "file"/"folder" events partial results
+        return sse_response(lambda emit: summarize_repo(
+            repo_url, level, previous=previous, progress=emit, pipeline=pipeline,
+            on_delta=lambda text: emit("delta", {"text": text}),
+        ))
 
     try:
-        summaries = summarize_repo(repo_url, level)
-        return jsonify(summaries), 200
+        if previous is not None:
+            # Output depends on the earlier summaries, not only on the commit
+            result_cache.record_bypass()
+            summaries = summarize_repo(repo_url, level, previous=previous, pipeline=pipeline)
+            return jsonify(summaries), 200, {"X-Cache": result_cache.BYPASS}
+        return cached_json(
+            "summarize_repo", repo_url, {"level": level, "pipeline": pipeline},
+            lambda commit: summarize_repo(repo_url, level, pipeline=pipeline, ref=commit),
+        )
     except Exception as e:
         print(f"[SERVER ERROR] {e}", flush=True)
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(job), 200
+
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    if jobs.get_job(job_id) is None:
+        return jsonify({"error": "job not found"}), 404
+    after = request.headers.get("Last-Event-ID") or request.args.get("after", "0")
+    after = int(after) if str(after).isdigit() else 0
+
+    def generate():
+        for seq, event, payload in jobs.stream_events(job_id, after):
+            yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/summary_cache/stats", methods=["GET"])
+def summary_cache_stats():
+    return jsonify(summary_cache.cache_stats()), 200
+
+
+@app.route("/result_cache/stats", methods=["GET"])
+def result_cache_stats():
+    return jsonify(result_cache.cache_stats()), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/latency_stats", methods=["GET"])
+def latency_stats():
+    return jsonify(metrics.latency_stats()), 200
+
+
 @app.route("/health_check", methods=["POST"])
 def health_check():
     data = request.json
@@ -66,15 +290,17 @@ def health_check():
     if not repo_url:
         return jsonify({"error": "repo_url is required"}), 400
     try:
-        summary = summarize_repo_health(repo_url)
-        print("Health summary:", summary)  # DEBUG
-        return jsonify(summary), 200
+        return cached_json(
+            "health_check", repo_url, {},
+            lambda commit: summarize_repo_health(repo_url, commit=commit),
+        )
     except Exception as e:
         print("Error in health_check:", e)  # DEBUG
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/summarize_snippet", methods=["POST"])
+@metrics.timed("summarize_snippet")
 def summarize_snippet():
     data = request.json
     code = data.get("code")
@@ -83,10 +309,14 @@ def summarize_snippet():
     if not code:
         return jsonify({"error": "code is required"}), 400
 
+    if data.get("stream"):
+        return sse_response(lambda emit: {"summary": snippets.summarize_snippet(
+            code, language, on_delta=lambda text: emit("delta", {"text": text})
+        )[0]})
+
     try:
-        from summarizer import summarize_content
-        summary = summarize_content("snippet", code, file_type=language)
-        return jsonify({"summary": summary}), 200
+        summary, cache_status = snippets.summarize_snippet(code, language)
+        return jsonify({"summary": summary}), 200, {"X-Cache": cache_status}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -100,46 +330,91 @@ def summarize_file():
     if not repo_url or not file_name:
         return jsonify({"error": "repo_url and file_name are required"}), 400
 
-    temp_dir = tempfile.mkdtemp()
+    if data.get("stream"):
+        def run(emit):
+            summary = summarize_repo_file(
+                repo_url, file_name, ref=data.get("ref"),
+                on_delta=lambda text: emit("delta", {"text": text}),
+            )
+            if summary is None:
+                raise FileNotFoundError(f"File not found: {file_name}")
+            return {"summary": summary}
+        return sse_response(run)
+
     try:
-        subprocess.run(["git", "clone", repo_url, temp_dir], check=True)
-        file_path = os.path.join(temp_dir, file_name)
-        if not os.path.exists(file_path):
+        summary = summarize_repo_file(repo_url, file_name, ref=data.get("ref"))
+        if summary is None:
             return jsonify({"error": "File not found"}), 404
-
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        ext = file_name.lower().split('.')[-1] if '.' in file_name else file_name.lower()
-        summary = summarize_file_content(file_name, content, file_type=ext)
         return jsonify({"summary": summary}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def page_params(data):
+    """(page, page_size) of a /get_file_structure body; ValueError or TypeError if not integers"""
+    page = max(1, int(data.get("page", 1)))
+    page_size = min(FILE_STRUCTURE_MAX_PAGE_SIZE, max(1, int(data.get("page_size", FILE_STRUCTURE_PAGE_SIZE))))
+    return page, page_size
+
+
+def folder_page(entries, path, page, page_size):
+    """One page of a folder listing, folders first"""
+    listing = sorted(entries, key=lambda e: (e["type"] != "dir", e["name"].lower()))
+    start = (page - 1) * page_size
+    return {
+        "path": path,
+        "entries": listing[start:start + page_size],
+        "page": page,
+        "page_size": page_size,
+        "total": len(listing),
+        "next_page": page + 1 if start + page_size < len(listing) else None,
+    }
 
 
 @app.route("/get_file_structure", methods=["POST"])
 def get_file_structure():
+    """
+    List repository paths from `git ls-tree`, without checking files out.
+    - default: {"files": [paths]} for every file
+    - path: entries directly inside that folder, paginated with page/page_size
+    - stream: NDJSON, one {"path", "name", "type", "size"} entry per line
+    """
     data = request.json
     repo_url = data.get("repo_url")
+    path = (data.get("path") or "").strip("/")
+    ref = data.get("ref")
 
     if not repo_url:
         return jsonify({"error": "repo_url is required"}), 400
 
-    temp_dir = tempfile.mkdtemp()
     try:
-        subprocess.run(["git", "clone", "--depth", "1", repo_url, temp_dir], check=True)
-        structure = []
-        for root, dirs, files in os.walk(temp_dir):
-            for file in files:
-                rel_path = os.path.relpath(os.path.join(root, file), temp_dir)
-                structure.append(rel_path)
-        return jsonify({"files": structure}), 200
+        page, page_size = page_params(data)
+    except (TypeError, ValueError):
+        return jsonify({"error": "page and page_size must be integers"}), 400
+
+    # A folder listing only needs one level; streams and flat lists need everything
+    recursive = "path" not in data or data.get("recursive", False)
+    entries = repo_cache.list_tree(
+        repo_url, ref=ref, path=path, recursive=recursive, ignore_dirs=IGNORE_DIRS
+    )
+
+    if data.get("stream"):
+        def generate():
+            try:
+                for entry in entries:
+                    yield json.dumps(entry) + "\n"
+            except Exception as e:
+                yield json.dumps({"error": str(e)}) + "\n"
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    try:
+        if "path" not in data:
+            structure = [entry["path"] for entry in entries if entry["type"] == "file"]
+            return jsonify({"files": structure}), 200
+
+        return jsonify(folder_page(entries, path, page, page_size)), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
 
 
 @app.route("/push_summary", methods=["POST"])
@@ -150,58 +425,53 @@ def push_summary():
 
     if not repo_url:
         return jsonify({"error": "repo_url is required"}), 400
+    body, status = push_summary_result(repo_url, branch)
+    return jsonify(body), status
 
-    temp_dir = tempfile.mkdtemp()
-    try:
-        # Clone repo
-        subprocess.run(["git", "clone", repo_url, temp_dir], check=True, capture_output=True, text=True)
-
-        # Change working dir to repo
-        cwd = os.getcwd()
-        os.chdir(temp_dir)
 
-        # Make sure branch exists
-        subprocess.run(["git", "checkout", branch], check=True, capture_output=True, text=True)
-
-        # Pull latest changes to avoid non-fast-forward errors
-        subprocess.run(["git", "pull", "origin", branch], check=True, capture_output=True, text=True)
-
-        # Commit the summary
-        if os.path.exists("SUMMARY.md"):
-            subprocess.run(["git", "add", "SUMMARY.md"], check=True, capture_output=True, text=True)
-            subprocess.run(["git", "commit", "-m", "Update SUMMARY.md"], check=True, capture_output=True, text=True)
-
-        # Push changes
-        result = subprocess.run(["git", "push", "origin", branch], capture_output=True, text=True)
+def push_summary_result(repo_url, branch):
+    """Commit SUMMARY.md on branch and push it; (response body, HTTP status)"""
+    try:
+        # Fetch latest changes into the mirror to avoid non-fast-forward errors
+        repo_cache.ensure_mirror(repo_url, max_age=0)
+        with repo_cache.checkout(repo_url, ref=f"refs/heads/{branch}") as temp_dir:
+            # Commit the summary
+            if os.path.exists(os.path.join(temp_dir, "SUMMARY.md")):
+                subprocess.run(["git", "add", "SUMMARY.md"], cwd=temp_dir, check=True, capture_output=True, text=True)
+                subprocess.run(["git", "commit", "-m", "Update SUMMARY.md"], cwd=temp_dir, check=True, capture_output=True, text=True)
+
+            # Push changes straight to the remote; the mirror only tracks it
+            result = subprocess.run(
+                ["git", "push", repo_url, f"HEAD:refs/heads/{branch}"],
+                cwd=temp_dir, env=repo_cache.git_env(), capture_output=True, text=True
+            )
         if result.returncode != 0:
-            return jsonify({
+            return {
                 "error": "Git push failed",
-                "details": result.stderr
-            }), 500
+                "details": repo_cache.redact(result.stderr)
+            }, 500
 
-        return jsonify({"message": "Summary pushed successfully"}), 200
+        return {"message": "Summary pushed successfully"}, 200
 
     except subprocess.CalledProcessError as e:
-        return jsonify({
+        return {
             "error": "Git command failed",
-            "cmd": e.cmd,
-            "output": e.output,
-            "stderr": e.stderr
-        }), 500
+            "cmd": [repo_cache.redact(arg) for arg in e.cmd],
+            "output": repo_cache.redact(e.output),
+            "stderr": repo_cache.redact(e.stderr)
+        }, 500
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        os.chdir(cwd)
-        shutil.rmtree(temp_dir, ignore_errors=True)
+        return {"error": repo_cache.redact(str(e))}, 500
 
 
 @app.route("/login")
 def login():
     redirect_uri = url_for("authorize", _external=True)
-    return github.authorize_redirect(redirect_uri)
+    return get_github().authorize_redirect(redirect_uri)
 
 @app.route("/callback")
 def authorize():
+    github = get_github()
     token = github.authorize_access_token()
     resp = github.get("user")
     user = resp.json()
@@ -214,6 +484,65 @@ def logout():
     session.pop("user", None)
     return redirect("http://localhost:3000")
 
+def dependency_graph_plan(repo_url, data):
+    """
+    (params, compute) for a /dependency_graph body: params key the result
+    cache and compute(commit) builds the graph. ValueError on a bad body.
+    """
+    mode = data.get("mode", "manifest")  # manifest | imports | transitive
+    if mode not in ["manifest", "imports", "transitive"]:
+        raise ValueError("mode must be 'manifest', 'imports' or 'transitive'")
+
+    if mode == "imports":
+        try:
+            max_nodes = data.get("max_nodes")
+            params = {
+                "mode": mode,
+                "include_stdlib": bool(data.get("include_stdlib", False)),
+                "max_nodes": int(max_nodes) if max_nodes is not None else None,
+            }
+        except (TypeError, ValueError):
+            raise ValueError("max_nodes must be an integer")
+        if params["max_nodes"] is not None and params["max_nodes"] < 1:
+            raise ValueError("max_nodes must be at least 1")
+
+        def compute(commit):
+            with file_access.request_budget(), repo_cache.checkout(repo_url, ref=commit) as temp_dir:
+                return import_graph.build_graph(
+                    FileIndex.build(temp_dir),
+                    include_stdlib=params["include_stdlib"],
+                    max_nodes=params["max_nodes"],
+                )
+    elif mode == "transitive":
+        # Lockfile-resolved graph in compact CSR form (see lockgraph.DepGraph.to_compact)
+        try:
+            depth = 1 if data.get("direct_only") else data.get("depth")
+            params = {
+                "mode": mode,
+                "depth": int(depth) if depth is not None else None,
+                "include_dev": bool(data.get("include_dev", True)),
+                "package": data.get("package") or None,
+                "max_paths": int(data.get("max_paths", lockgraph.DEFAULT_MAX_PATHS)),
+            }
+        except (TypeError, ValueError):
+            raise ValueError("depth and max_paths must be integers")
+
+        def compute(commit):
+            with file_access.request_budget(), repo_cache.checkout(repo_url, ref=commit) as temp_dir:
+                graph, lockfiles = lockgraph.build(FileIndex.build(temp_dir))
+            result = lockgraph.query(graph, params["depth"], params["include_dev"], params["package"],
+                                     params["max_paths"])
+            result["lockfiles"] = lockfiles
+            return result
+    else:
+        params = {"mode": mode}
+
+        def compute(commit):
+            with file_access.request_budget(), repo_cache.checkout(repo_url, ref=commit) as temp_dir:
+                return manifests.build_graph(FileIndex.build(temp_dir))
+    return params, compute
+
+
 @app.route("/dependency_graph", methods=["POST"])
 def dependency_graph():
     data = request.json
@@ -221,70 +550,15 @@ def dependency_graph():
 
     if not repo_url:
         return jsonify({"error": "repo_url is required"}), 400
-
-    temp_dir = tempfile.mkdtemp()
     try:
-        subprocess.run(["git", "clone", "--depth", "1", repo_url, temp_dir], check=True)
-
-        graph = {"nodes": [], "links": []}
-        added_nodes = set()
-
-        def add_node(node_id, group):
-            if node_id not in added_nodes:
-                graph["nodes"].append({"id": node_id, "group": group})
-                added_nodes.add(node_id)
-
-        # Always add root project node
-        add_node("project", "root")
-
-        for root, dirs, files in os.walk(temp_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-
-                #  Node.js: package.json
-                if file.lower() == "package.json":
-                    import json
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        pkg = json.load(f)
-                        deps = pkg.get("dependencies", {})
-                        dev_deps = pkg.get("devDependencies", {})
-                        for dep in {**deps, **dev_deps}.keys():
-                            add_node(dep, "node")
-                            graph["links"].append({"source": "project", "target": dep})
-
-                #  Python: requirements.txt
-                elif file.lower() == "requirements.txt":
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        for line in f:
-                            dep = line.strip().split("==")[0]
-                            if dep:
-                                add_node(dep, "python")
-                                graph["links"].append({"source": "project", "target": dep})
-
-                #  Kubernetes: yaml / yml
-                elif file.lower().endswith((".yaml", ".yml")):
-                    import yaml
-                    try:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            docs = list(yaml.safe_load_all(f))
-                        for doc in docs:
-                            if not isinstance(doc, dict):
-                                continue
-                            kind = doc.get("kind", "Resource")
-                            name = doc.get("metadata", {}).get("name", "unknown")
-                            node_id = f"{kind}:{name}"
-                            add_node(node_id, "k8s")
-                            graph["links"].append({"source": "project", "target": node_id})
-                    except Exception:
-                        continue
-
-        return jsonify(graph), 200
+        params, compute = dependency_graph_plan(repo_url, data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
+    try:
+        return cached_json("dependency_graph", repo_url, params, compute)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
-
 
 
 if __name__ == "__main__":
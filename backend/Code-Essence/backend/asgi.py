@@ -0,0 +1,403 @@
+# hypercorn asgi:application --workers 4 --bind 0.0.0.0:5000
+# (or: uvicorn asgi:application --workers 4 --port 5000)
+#
+# Async serving mode: the same routes and JSON contracts as app.py, but git
+# runs as asyncio subprocesses and single-file / snippet summaries await the
+# model's async client, so a waiting request holds no thread. Whole-repo
+# pipelines still run on threads, ASYNC_MAX_ANALYSES at a time; identical
+# requests share one of those runs. The OAuth routes are served by the Flask
+# app through a WSGI bridge.
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from quart import Quart, request, jsonify, Response, g, url_for
+from quart.wrappers.response import DataBody
+from quart_cors import cors
+from hypercorn.middleware import AsyncioWSGIMiddleware
+import app as wsgi
+import jobs
+import metrics
+import repo_cache
+import result_cache
+import snippets
+import summary_cache
+import summarizer
+from healthchecker import analyze_repo_health as summarize_repo_health
+from summarizer import summarize_repo, IGNORE_DIRS
+
+# Repo pipelines (summaries, health checks, graphs) running on threads at once;
+# the rest queue on the event loop without holding a thread
+ASYNC_MAX_ANALYSES = int(os.getenv("ASYNC_MAX_ANALYSES", "16"))
+# Requests one process accepts at a time; beyond this it answers 503
+ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", "512"))
+# Threads for pipelines plus the short blocking calls (mirror fetches, micro-batches)
+ASYNC_WORKER_THREADS = int(os.getenv("ASYNC_WORKER_THREADS", str(ASYNC_MAX_ANALYSES * 2)))
+# Paths handed to the Flask app: authlib's OAuth client is Flask-only
+WSGI_PATHS = {"/login", "/callback", "/logout"}
+
+app = cors(Quart(__name__), allow_origin="*")
+app.secret_key = wsgi.app.secret_key
+
+_analyses = asyncio.Semaphore(ASYNC_MAX_ANALYSES)
+_in_flight = 0
+
+
+@app.before_serving
+async def start_worker():
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(ASYNC_WORKER_THREADS, thread_name_prefix="asgi")
+    )
+    jobs.recover()
+
+
+async def run_blocking(fn, *args):
+    """Run a blocking pipeline on a thread, at most ASYNC_MAX_ANALYSES at once"""
+    async with _analyses:
+        return await asyncio.to_thread(fn, *args)
+
+
+@app.before_request
+async def admit_request():
+    global _in_flight
+    if _in_flight >= ASYNC_MAX_IN_FLIGHT:
+        metrics.inc("requests_rejected_total", help="Requests refused while at ASYNC_MAX_IN_FLIGHT")
+        return jsonify({"error": "server busy, retry later"}), 503, {"Retry-After": "1"}
+    _in_flight += 1
+    g.admitted = True
+    g.trace = metrics.start_trace()
+
+
+async def _wants_timings():
+    if request.args.get("timings") in ("1", "true"):
+        return True
+    body = await request.get_json(silent=True) if request.is_json else None
+    return isinstance(body, dict) and bool(body.get("timings"))
+
+
+@app.after_request
+async def report_request_trace(response):
+    trace = getattr(g, "trace", None)
+    if trace is None:
+        return response
+    endpoint = request.endpoint or "unknown"
+    metrics.observe_histogram(
+        "request_seconds", time.perf_counter() - trace.started,
+        help="HTTP request duration", endpoint=endpoint, status=str(response.status_code),
+    )
+    if trace.stages:
+        response.headers["Server-Timing"] = trace.server_timing()
+    if await _wants_timings() and response.mimetype == "application/json" and isinstance(response.response, DataBody):
+        body = json.loads(await response.get_data())
+        if isinstance(body, dict):
+            body["timings"] = trace.as_dict()
+            response.set_data(json.dumps(body))
+    return response
+
+
+@app.teardown_request
+async def end_request_trace(exc):
+    global _in_flight
+    if getattr(g, "admitted", False):
+        _in_flight -= 1
+        metrics.end_trace()
+
+
+def sse_response(run):
+    """
+    app.sse_response for the event loop: run(emit) runs on a pipeline thread
+    and what it emits is relayed through an asyncio queue.
+    """
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def emit(event, data):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    async def worker():
+        try:
+            events.put_nowait(("done", await run_blocking(run, emit)))
+        except Exception as e:
+            print(f"[SERVER ERROR] {e}", flush=True)
+            events.put_nowait(("error", {"error": str(e)}))
+        events.put_nowait(None)
+
+    task = asyncio.ensure_future(worker())
+
+    async def generate():
+        while True:
+            item = await events.get()
+            if item is None:
+                await task
+                return
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def cached_json(endpoint, repo_url, params, compute):
+    """app.cached_json for the event loop: waiting on a shared computation holds no thread"""
+    commit = await repo_cache.resolve_head_async(repo_url)
+    key = result_cache.request_key(endpoint, repo_url, commit, params)
+    body, status = await result_cache.aget_or_compute(key, lambda: compute(commit), run=run_blocking)
+    return Response(body, status=200, mimetype="application/json", headers={"X-Cache": status})
+
+
+@app.route("/summarize_repo", methods=["POST"])
+async def summarize_repository():
+    data = await request.get_json()
+    repo_url = data.get("repo_url")
+    level = data.get("level", "repo")
+    previous = data.get("previous")
+    pipeline = data.get("pipeline", "default")
+
+    error = wsgi.summarize_repo_error(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    if data.get("async"):
+        try:
+            commit = await repo_cache.resolve_head_async(repo_url)
+            job_id, created = wsgi.submit_summarize_repo(repo_url, level, previous, pipeline, commit)
+            return jsonify({
+                "job_id": job_id,
+                "deduplicated": not created,
+                "status_url": url_for("job_status", job_id=job_id),
+                "events_url": url_for("job_events", job_id=job_id),
+            }), 202
+        except Exception as e:
+            print(f"[SERVER ERROR] {e}", flush=True)
+            return jsonify({"error": str(e)}), 500
+
+    if data.get("stream"):
+        return sse_response(lambda emit: summarize_repo(
+            repo_url, level, previous=previous, progress=emit, pipeline=pipeline,
+            on_delta=lambda text: emit("delta", {"text": text}),
+        ))
+
+    try:
+        if previous is not None:
+            result_cache.record_bypass()
+            summaries = await run_blocking(
+                lambda: summarize_repo(repo_url, level, previous=previous, pipeline=pipeline)
+            )
+            return jsonify(summaries), 200, {"X-Cache": result_cache.BYPASS}
+        return await cached_json(
+            "summarize_repo", repo_url, {"level": level, "pipeline": pipeline},
+            lambda commit: summarize_repo(repo_url, level, pipeline=pipeline, ref=commit),
+        )
+    except Exception as e:
+        print(f"[SERVER ERROR] {e}", flush=True)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+async def job_status(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(job), 200
+
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+async def job_events(job_id):
+    if jobs.get_job(job_id) is None:
+        return jsonify({"error": "job not found"}), 404
+    after = request.headers.get("Last-Event-ID") or request.args.get("after", "0")
+    after = int(after) if str(after).isdigit() else 0
+
+    async def generate():
+        async for seq, event, payload in jobs.astream_events(job_id, after):
+            yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/summary_cache/stats", methods=["GET"])
+async def summary_cache_stats():
+    return jsonify(summary_cache.cache_stats()), 200
+
+
+@app.route("/result_cache/stats", methods=["GET"])
+async def result_cache_stats():
+    return jsonify(result_cache.cache_stats()), 200
+
+
+@app.route("/metrics", methods=["GET"])
+async def prometheus_metrics():
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/latency_stats", methods=["GET"])
+async def latency_stats():
+    return jsonify(metrics.latency_stats()), 200
+
+
+@app.route("/health_check", methods=["POST"])
+async def health_check():
+    data = await request.get_json()
+    repo_url = data.get("repo_url")
+    if not repo_url:
+        return jsonify({"error": "repo_url is required"}), 400
+    try:
+        return await cached_json(
+            "health_check", repo_url, {},
+            lambda commit: summarize_repo_health(repo_url, commit=commit),
+        )
+    except Exception as e:
+        print(f"[ERROR] health_check failed: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/summarize_snippet", methods=["POST"])
+async def summarize_snippet():
+    start = time.perf_counter()
+    try:
+        data = await request.get_json()
+        code = data.get("code")
+        language = data.get("language", "py")
+
+        if not code:
+            return jsonify({"error": "code is required"}), 400
+
+        if data.get("stream"):
+            return sse_response(lambda emit: {"summary": snippets.summarize_snippet(
+                code, language, on_delta=lambda text: emit("delta", {"text": text})
+            )[0]})
+
+        try:
+            summary, cache_status = await snippets.asummarize_snippet(code, language)
+            return jsonify({"summary": summary}), 200, {"X-Cache": cache_status}
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+    finally:
+        metrics.observe("summarize_snippet", time.perf_counter() - start)
+
+
+@app.route("/summarize_file", methods=["POST"])
+async def summarize_file():
+    data = await request.get_json()
+    repo_url = data.get("repo_url")
+    file_name = data.get("file_name")
+
+    if not repo_url or not file_name:
+        return jsonify({"error": "repo_url and file_name are required"}), 400
+
+    if data.get("stream"):
+        def run(emit):
+            summary = summarizer.summarize_repo_file(
+                repo_url, file_name, ref=data.get("ref"),
+                on_delta=lambda text: emit("delta", {"text": text}),
+            )
+            if summary is None:
+                raise FileNotFoundError(f"File not found: {file_name}")
+            return {"summary": summary}
+        return sse_response(run)
+
+    try:
+        summary = await summarizer.asummarize_repo_file(repo_url, file_name, ref=data.get("ref"))
+        if summary is None:
+            return jsonify({"error": "File not found"}), 404
+        return jsonify({"summary": summary}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/get_file_structure", methods=["POST"])
+async def get_file_structure():
+    """See app.get_file_structure; ls-tree output is read from an asyncio subprocess"""
+    data = await request.get_json()
+    repo_url = data.get("repo_url")
+    path = (data.get("path") or "").strip("/")
+    ref = data.get("ref")
+
+    if not repo_url:
+        return jsonify({"error": "repo_url is required"}), 400
+
+    try:
+        page, page_size = wsgi.page_params(data)
+    except (TypeError, ValueError):
+        return jsonify({"error": "page and page_size must be integers"}), 400
+
+    recursive = "path" not in data or data.get("recursive", False)
+    entries = repo_cache.list_tree_async(
+        repo_url, ref=ref, path=path, recursive=recursive, ignore_dirs=IGNORE_DIRS
+    )
+
+    if data.get("stream"):
+        async def generate():
+            try:
+                async for entry in entries:
+                    yield json.dumps(entry) + "\n"
+            except Exception as e:
+                yield json.dumps({"error": str(e)}) + "\n"
+        return Response(generate(), mimetype="application/x-ndjson")
+
+    try:
+        if "path" not in data:
+            structure = [entry["path"] async for entry in entries if entry["type"] == "file"]
+            return jsonify({"files": structure}), 200
+        listing = [entry async for entry in entries]
+        return jsonify(wsgi.folder_page(listing, path, page, page_size)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/push_summary", methods=["POST"])
+async def push_summary():
+    data = await request.get_json()
+    repo_url = data.get("repo_url")
+    branch = data.get("branch", "main")
+
+    if not repo_url:
+        return jsonify({"error": "repo_url is required"}), 400
+    body, status = await run_blocking(wsgi.push_summary_result, repo_url, branch)
+    return jsonify(body), status
+
+
+@app.route("/dependency_graph", methods=["POST"])
+async def dependency_graph():
+    data = await request.get_json()
+    repo_url = data.get("repo_url")
+
+    if not repo_url:
+        return jsonify({"error": "repo_url is required"}), 400
+    try:
+        params, compute = wsgi.dependency_graph_plan(repo_url, data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        return await cached_json("dependency_graph", repo_url, params, compute)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+_oauth = AsyncioWSGIMiddleware(wsgi.app)
+
+
+async def application(scope, receive, send):
+    """ASGI entry point: the Quart app, with the OAuth paths served by Flask"""
+    if scope["type"] == "http" and scope["path"] in WSGI_PATHS:
+        await _oauth(scope, receive, send)
+    else:
+        await app(scope, receive, send)
+
+
+if __name__ == "__main__":
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [os.getenv("BIND", "0.0.0.0:5000")]
+    asyncio.run(serve(application, config))
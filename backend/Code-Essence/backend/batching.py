@@ -0,0 +1,109 @@
+import json
+import os
+import re
+import threading
+
+# Files at or below this many tokens are candidates for a shared prompt
+BATCH_FILE_MAX_TOKENS = int(os.getenv("BATCH_FILE_MAX_TOKENS", "400"))
+BATCH_TOKEN_BUDGET = int(os.getenv("BATCH_TOKEN_BUDGET", "3000"))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "15"))
+
+BATCH_PROMPT = """
+    You are a senior engineer. Summarize each of the following files for documentation.
+    Follow the instructions given for each file and keep every summary to 2-3 sentences.
+    Respond with only a JSON object that maps every file id (e.g. "F1") to its summary string.
+    No code blocks, no text outside the JSON.
+
+    {files}
+"""
+
+FILE_ENTRY = """
+    ---
+    id: {file_id}
+    File: {file_name} ({file_type})
+    Instructions: {instructions}
+    Code/content:
+    {content}
+"""
+
+
+def pack(entries, budget=None, max_files=None):
+    """
+    Group (key, tokens) entries, in order, into batches that stay within
+    budget tokens and max_files files. Returns lists of keys.
+    """
+    budget = budget or BATCH_TOKEN_BUDGET
+    max_files = max_files or BATCH_MAX_FILES
+    batches, batch, used = [], [], 0
+    for key, tokens in entries:
+        if batch and (used + tokens > budget or len(batch) >= max_files):
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(key)
+        used += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def cache_prompt(instructions):
+    """
+    Summary cache "prompt" for answers to BATCH_PROMPT. Batched summaries are
+    shorter than single-file ones, so they never share a cache entry.
+    """
+    return instructions + BATCH_PROMPT
+
+
+def build_prompt(files):
+    """files: list of dicts with file_id, file_name, file_type, instructions, content"""
+    return BATCH_PROMPT.format(files="".join(FILE_ENTRY.format(**f) for f in files))
+
+
+def parse_response(text, file_ids):
+    """
+    Pull {file_id: summary} out of the model output. Ids that are missing or
+    empty are left out so the caller can fall back to single-file calls.
+    """
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    parsed = {}
+    for file_id in file_ids:
+        summary = data.get(file_id)
+        if isinstance(summary, str) and summary.strip():
+            parsed[file_id] = summary.strip()
+    return parsed
+
+
+class BatchStats:
+    """Thread-safe savings counters for one request"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.batch_calls = 0
+        self.batched_files = 0
+        self.fallback_files = 0
+        self.tokens_saved = 0
+
+    def record(self, files, parsed, single_tokens, batch_tokens):
+        with self.lock:
+            self.batch_calls += 1
+            self.batched_files += parsed
+            self.fallback_files += files - parsed
+            self.tokens_saved += max(0, single_tokens - batch_tokens)
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                "batch_calls": self.batch_calls,
+                "batched_files": self.batched_files,
+                "fallback_files": self.fallback_files,
+                "calls_saved": max(0, self.batched_files - self.batch_calls),
+                "tokens_saved": self.tokens_saved,
+            }
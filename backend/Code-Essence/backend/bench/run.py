@@ -0,0 +1,263 @@
+"""
+Benchmark the API routes against synthetic repositories with a fake LLM.
+
+    python -m bench.run                          # run all, compare with the baselines
+    python -m bench.run --scenario small --case health_check
+    python -m bench.run --update-baseline        # record the current numbers
+
+Run from the backend directory. bench/baseline.json is committed and holds
+the deterministic metrics (LLM calls, prompt tokens, response bytes), so CI
+fails on any regression in them; timings and RSS depend on the machine and
+go to bench/baseline.local.json, which is compared only where it exists. Every case runs in a fresh process with
+empty caches, so import time, wall time and peak RSS belong to that request
+alone. eager_modules lists the heavy modules (startup.HEAVY_MODULES) that
+importing the app still loads up front.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+LOCAL_BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.local.json")
+RESULT_PREFIX = "BENCH_RESULT "
+
+# Repository shapes, passed to synthetic.make_repo
+SCENARIOS = {
+    "small": {"files": 40, "depth": 2},
+    "deep": {"files": 300, "depth": 8},
+    "monorepo": {"files": 300, "depth": 3, "subprojects": 6},
+    "huge_files": {"files": 30, "depth": 2, "huge_files": 2, "huge_size": 2 * 1024 * 1024},
+}
+
+# name -> (route, extra JSON body); "{file}" is replaced by a file of the repo
+CASES = {
+    "summarize_repo:file": ("/summarize_repo", {"level": "file"}),
+    "summarize_repo:folder": ("/summarize_repo", {"level": "folder"}),
+    "summarize_repo:repo": ("/summarize_repo", {"level": "repo"}),
+    "summarize_file": ("/summarize_file", {"file_name": "{file}"}),
+    "health_check": ("/health_check", {}),
+    "dependency_graph:manifest": ("/dependency_graph", {"mode": "manifest"}),
+    "dependency_graph:imports": ("/dependency_graph", {"mode": "imports"}),
+    "dependency_graph:transitive": ("/dependency_graph", {"mode": "transitive"}),
+    "get_file_structure": ("/get_file_structure", {}),
+}
+SNIPPET = "def add(a, b):\n    # add two numbers\n    return a + b\n"
+
+# A metric regresses when it exceeds baseline * (1 + ratio) + slack
+TOLERANCES = {
+    "wall_s": (0.25, 0.05),
+    "import_s": (0.25, 0.05),
+    "peak_rss_mb": (0.20, 5.0),
+    "llm_calls": (0.0, 0),
+    "prompt_tokens": (0.02, 0),
+    "response_bytes": (0.02, 0),
+}
+# Same on every machine for the same code; the rest go to the local baseline
+DETERMINISTIC_METRICS = ["llm_calls", "prompt_tokens", "response_bytes"]
+
+
+def run_child(spec):
+    """Executed inside the per-case process: import the app and issue one request"""
+    started = time.perf_counter()
+    import app as app_module
+    import llm_client
+    import_s = time.perf_counter() - started
+    # Heavy modules that app startup still pulls in eagerly
+    from startup import HEAVY_MODULES
+    eager = sorted(name for name in HEAVY_MODULES if name in sys.modules)
+
+    client = app_module.app.test_client()
+    started = time.perf_counter()
+    response = client.post(spec["route"], json=spec["body"])
+    # The repo URL is a temp path whose length varies between machines
+    body = response.get_data().replace(spec["body"].get("repo_url", "").encode(), b"<repo>")
+    wall_s = time.perf_counter() - started
+
+    # Same request again: what a client sees once caches are warm
+    started = time.perf_counter()
+    client.post(spec["route"], json=spec["body"]).get_data()
+    warm_wall_s = time.perf_counter() - started
+
+    model = llm_client.get_llm()
+    usage = model.usage() if hasattr(model, "usage") else {}
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    result = {
+        "status": response.status_code,
+        "wall_s": round(wall_s, 4),
+        "warm_wall_s": round(warm_wall_s, 4),
+        "import_s": round(import_s, 4),
+        "eager_modules": eager,
+        "peak_rss_mb": round(kb / 1024, 1),
+        "peak_child_rss_mb": round(children_kb / 1024, 1),
+        "response_bytes": len(body),
+        "x_cache": response.headers.get("X-Cache"),
+        "llm_calls": usage.get("llm_calls", 0),
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+    }
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def _case_env(workdir, latency):
+    env = dict(os.environ)
+    env.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY": str(latency),
+        "BEDROCK_REQUESTS_PER_SECOND": "100000",
+        "REPO_CACHE_DIR": os.path.join(workdir, "repos"),
+        "SUMMARY_CACHE_PATH": os.path.join(workdir, "summaries.sqlite3"),
+        "JOBS_DB_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "REDIS_URL": "local://",
+        "PYTHONPATH": BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    return env
+
+
+def run_case(route, body, latency, verbose=False):
+    workdir = tempfile.mkdtemp(prefix="bench-case-")
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-m", "bench.run", "--child", json.dumps({"route": route, "body": body})],
+            cwd=BACKEND_DIR, env=_case_env(workdir, latency), capture_output=True, text=True,
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if verbose:
+        sys.stderr.write(proc.stdout + proc.stderr)
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    return {"status": None, "error": (proc.stderr or proc.stdout).strip().splitlines()[-1:]}
+
+
+def run_all(scenarios, cases, latency, verbose=False):
+    results = {}
+    repos_dir = tempfile.mkdtemp(prefix="bench-repos-")
+    from bench.synthetic import make_repo
+    try:
+        for scenario in scenarios:
+            shape = SCENARIOS[scenario]
+            repo_url = make_repo(os.path.join(repos_dir, scenario), **shape)
+            sample = "services/svc0/app.py" if shape.get("subprojects") else "app.py"
+            for case in cases:
+                route, extra = CASES[case]
+                body = {"repo_url": repo_url}
+                body.update({k: (sample if v == "{file}" else v) for k, v in extra.items()})
+                key = f"{scenario}/{case}"
+                results[key] = run_case(route, body, latency, verbose)
+                print(_format_row(key, results[key]), flush=True)
+    finally:
+        shutil.rmtree(repos_dir, ignore_errors=True)
+    return results
+
+
+def _format_row(key, result):
+    if result.get("status") != 200:
+        return f"{key:<42} FAILED status={result.get('status')} {result.get('error', '')}"
+    return (
+        f"{key:<42} import={result.get('import_s', 0):>6.3f}s "
+        f"wall={result['wall_s']:>8.3f}s warm={result['warm_wall_s']:>7.3f}s "
+        f"rss={result['peak_rss_mb']:>7.1f}MB calls={result['llm_calls']:>5} "
+        f"tokens={result['prompt_tokens']:>8}"
+    )
+
+
+def compare(results, baseline):
+    """Human-readable regressions of results against baseline"""
+    regressions = []
+    for key, result in results.items():
+        if result.get("status") != 200:
+            regressions.append(f"{key}: request failed (status {result.get('status')})")
+            continue
+        expected = baseline.get(key)
+        if not expected:
+            continue
+        for metric, (ratio, slack) in TOLERANCES.items():
+            if metric not in expected:
+                continue
+            limit = expected[metric] * (1 + ratio) + slack
+            if result.get(metric, 0) > limit:
+                regressions.append(f"{key}: {metric} {result[metric]} > {expected[metric]} (limit {limit:.3f})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Code-Essence routes offline")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--case", action="append", choices=sorted(CASES) + ["summarize_snippet"])
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="fake model latency per call (s)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--local-baseline", default=LOCAL_BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="also write the results as JSON here")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own output")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(json.loads(args.child))
+        return 0
+
+    scenarios = args.scenario or list(SCENARIOS)
+    cases = args.case or list(CASES) + ["summarize_snippet"]
+    results = run_all(scenarios, [c for c in cases if c in CASES], args.llm_latency, args.verbose)
+    if "summarize_snippet" in cases:
+        results["snippet/summarize_snippet"] = run_case(
+            "/summarize_snippet", {"code": SNIPPET, "language": "py"}, args.llm_latency, args.verbose
+        )
+        print(_format_row("snippet/summarize_snippet", results["snippet/summarize_snippet"]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        ok = {k: v for k, v in results.items() if v.get("status") == 200}
+        _update_baseline(args.baseline, ok, DETERMINISTIC_METRICS)
+        _update_baseline(args.local_baseline, ok, [m for m in TOLERANCES if m not in DETERMINISTIC_METRICS])
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"[ERROR] No baseline at {args.baseline}; run with --update-baseline to record one")
+        return 1
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    missing = [key for key in results if key not in baseline]
+    for key in missing:
+        print(f"[WARN] {key} has no baseline entry")
+    regressions = compare(results, baseline)
+    if os.path.exists(args.local_baseline):
+        with open(args.local_baseline) as f:
+            regressions += compare(results, json.load(f))
+    for regression in regressions:
+        print(f"[ERROR] Regression: {regression}")
+    if not regressions:
+        print("[INFO] No regressions against baseline")
+    return 1 if regressions else 0
+
+
+def _update_baseline(path, results, metrics):
+    """Merge the given metrics of results into the baseline file at path"""
+    baseline = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            baseline = json.load(f)
+    for key, result in results.items():
+        baseline[key] = {metric: result[metric] for metric in metrics if metric in result}
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"[INFO] Baseline written to {path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import json
+import os
+import random
+import shutil
+import subprocess
+
+# Fixed identity and dates so the same shape always yields the same commit SHA
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "bench",
+    "GIT_AUTHOR_EMAIL": "bench@example.com",
+    "GIT_COMMITTER_NAME": "bench",
+    "GIT_COMMITTER_EMAIL": "bench@example.com",
+    "GIT_AUTHOR_DATE": "2024-01-01T00:00:00+0000",
+    "GIT_COMMITTER_DATE": "2024-01-01T00:00:00+0000",
+}
+
+PY_PACKAGES = ["flask", "requests", "numpy", "pandas", "pyyaml", "boto3", "sqlalchemy", "pydantic"]
+NODE_PACKAGES = ["react", "axios", "express", "lodash", "dayjs", "zod", "@mui/material", "redux"]
+# What each package pulls in, for the generated lockfiles
+PY_REQUIRES = {
+    "flask": ["werkzeug", "jinja2", "click"], "jinja2": ["markupsafe"], "werkzeug": ["markupsafe"],
+    "requests": ["urllib3", "idna", "certifi", "charset-normalizer"], "pandas": ["numpy", "python-dateutil"],
+    "python-dateutil": ["six"], "boto3": ["botocore", "s3transfer"], "s3transfer": ["botocore"],
+    "botocore": ["urllib3", "python-dateutil"], "sqlalchemy": ["typing-extensions"],
+    "pydantic": ["pydantic-core", "typing-extensions"], "pydantic-core": ["typing-extensions"],
+}
+NODE_REQUIRES = {
+    "react": ["loose-envify"], "loose-envify": ["js-tokens"], "axios": ["follow-redirects", "form-data"],
+    "form-data": ["mime-types"], "mime-types": ["mime-db"], "express": ["body-parser", "debug"],
+    "body-parser": ["debug"], "debug": ["ms"], "@mui/material": ["react", "clsx"], "redux": ["loose-envify"],
+}
+WORDS = ["user", "order", "cache", "index", "report", "stream", "token", "config", "event", "queue"]
+
+
+def _python_module(rng, name, siblings):
+    lines = ['"""Synthetic module %s."""' % name, "import os", "import json"]
+    for sibling in rng.sample(siblings, min(2, len(siblings))):
+        lines.append(f"from . import {sibling}")
+    lines.append(f"import {rng.choice(['requests', 'yaml', 'numpy'])}")
+    for i in range(rng.randint(2, 6)):
+        word = rng.choice(WORDS)
+        lines += [
+            "",
+            "",
+            f"def {word}_{i}(value, retries=3):",
+            f'    """Handle a {word} value."""',
+            "    result = []",
+            "    for attempt in range(retries):",
+            f"        result.append(json.dumps({{'{word}': value, 'attempt': attempt}}))",
+            "    return os.linesep.join(result)",
+        ]
+    lines += ["", "", f"class {name.title().replace('_', '')}Service:", "    def run(self):",
+              "        return None", ""]
+    return "\n".join(lines)
+
+
+def _js_module(rng, name, siblings):
+    lines = ["import React from 'react';", "import axios from 'axios';"]
+    for sibling in rng.sample(siblings, min(2, len(siblings))):
+        lines.append(f"import {{ {sibling} }} from './{sibling}';")
+    for i in range(rng.randint(2, 5)):
+        word = rng.choice(WORDS)
+        lines += [
+            "",
+            f"export async function {word}{i}(id) {{",
+            f"  const response = await axios.get(`/api/{word}/${{id}}`);",
+            "  return response.data;",
+            "}",
+        ]
+    lines += ["", f"export const {name} = () => <div>{name}</div>;", ""]
+    return "\n".join(lines)
+
+
+def _huge_module(rng, size):
+    chunks, total, i = [], 0, 0
+    while total < size:
+        chunk = (
+            f"\n\ndef generated_{i}(items):\n"
+            f"    total = 0\n"
+            f"    for item in items:\n"
+            f"        total += item * {rng.randint(1, 99)}\n"
+            f"    return total\n"
+        )
+        chunks.append(chunk)
+        total += len(chunk)
+        i += 1
+    return '"""Large generated module."""' + "".join(chunks)
+
+
+def _closure(direct, requires):
+    """Every package reachable from direct, sorted"""
+    seen, stack = set(), list(direct)
+    while stack:
+        name = stack.pop()
+        if name not in seen:
+            seen.add(name)
+            stack.extend(requires.get(name, []))
+    return sorted(seen)
+
+
+def _poetry_lock(direct):
+    blocks = []
+    for name in _closure(direct, PY_REQUIRES):
+        blocks.append(f'[[package]]\nname = "{name}"\nversion = "1.0.0"\ncategory = "main"\n')
+        if PY_REQUIRES.get(name):
+            blocks.append("[package.dependencies]\n" + "".join(f'{dep} = "*"\n' for dep in PY_REQUIRES[name]))
+    return "\n".join(blocks)
+
+
+def _npm_lock(name, deps):
+    packages = {"": {"name": name, "dependencies": deps}}
+    for package in _closure(deps, NODE_REQUIRES):
+        entry = {"version": deps.get(package, "^1.0.0").lstrip("^")}
+        if NODE_REQUIRES.get(package):
+            entry["dependencies"] = {dep: "^1.0.0" for dep in NODE_REQUIRES[package]}
+        packages[f"node_modules/{package}"] = entry
+    return json.dumps({"name": name, "lockfileVersion": 3, "packages": packages}, indent=2)
+
+
+def _write(root, rel_path, content):
+    path = os.path.join(root, *rel_path.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def _project(rng, root, prefix, files, depth, kind):
+    """Write one project of `files` source files nested up to `depth` folders deep"""
+    dirs = [prefix.rstrip("/")] if prefix else [""]
+    for level in range(1, depth + 1):
+        parent = rng.choice(dirs)
+        dirs.append(f"{parent}/{rng.choice(WORDS)}{level}".lstrip("/"))
+    base = prefix.rstrip("/")
+    join = lambda *parts: "/".join(p for p in parts if p)
+
+    if kind == "python":
+        packages = rng.sample(PY_PACKAGES, 4)
+        _write(root, join(base, "requirements.txt"),
+               "\n".join(f"{p}=={rng.randint(1, 3)}.{rng.randint(0, 9)}" for p in packages) + "\n")
+        _write(root, join(base, "poetry.lock"), _poetry_lock(packages))
+        _write(root, join(base, "app.py"), "from flask import Flask\napp = Flask(__name__)\n")
+    else:
+        deps = {p: f"^{rng.randint(1, 18)}.0.0" for p in rng.sample(NODE_PACKAGES, 4)}
+        _write(root, join(base, "package.json"), json.dumps({"name": base or "web", "dependencies": deps}, indent=2))
+        _write(root, join(base, "package-lock.json"), _npm_lock(base or "web", deps))
+        _write(root, join(base, "index.js"), "import React from 'react';\nexport default {};\n")
+
+    by_dir = {}
+    for i in range(files):
+        folder = rng.choice(dirs)
+        name = f"{rng.choice(WORDS)}_{i}"
+        by_dir.setdefault(folder, []).append(name)
+    for folder, names in by_dir.items():
+        for name in names:
+            if kind == "python":
+                _write(root, join(folder, f"{name}.py"), _python_module(rng, name, names))
+            else:
+                _write(root, join(folder, f"{name}.js"), _js_module(rng, name, names))
+        if kind == "python":
+            _write(root, join(folder, "__init__.py"), "")
+
+
+def make_repo(path, files=50, depth=3, subprojects=0, huge_files=0, huge_size=1024 * 1024, seed=0):
+    """
+    Create a git repository at path and return its file:// URL.
+
+    files source files are spread over folders up to depth deep. With
+    subprojects > 0 they are split across services/<n> projects that
+    alternate between Python and Node. huge_files adds Python modules of
+    about huge_size bytes each.
+    """
+    rng = random.Random(seed)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+    _write(path, "README.md", "# Synthetic repo\n\nGenerated for benchmarks.\n")
+    _write(path, "Dockerfile", "FROM python:3.11-slim\nCOPY . /app\nCMD [\"python\", \"app.py\"]\n")
+    _write(path, "deploy/k8s.yaml",
+           "apiVersion: apps/v1\nkind: Deployment\nmetadata:\n  name: bench\n---\n"
+           "apiVersion: v1\nkind: Service\nmetadata:\n  name: bench\n")
+    if subprojects:
+        per_project = max(1, files // subprojects)
+        for n in range(subprojects):
+            kind = "python" if n % 2 == 0 else "node"
+            _project(rng, path, f"services/svc{n}/", per_project, depth, kind)
+    else:
+        _project(rng, path, "", files, depth, "python")
+    for i in range(huge_files):
+        _write(path, f"generated/huge_{i}.py", _huge_module(rng, huge_size))
+
+    env = {**os.environ, **GIT_ENV}
+    for args in (["init", "-q", "-b", "main"], ["add", "-A"], ["commit", "-q", "-m", "Synthetic repository"]):
+        subprocess.run(["git", *args], cwd=path, env=env, check=True, capture_output=True)
+    return "file://" + os.path.abspath(path)
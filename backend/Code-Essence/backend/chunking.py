@@ -0,0 +1,148 @@
+import ast
+import os
+import re
+import threading
+
+# Hugging Face tokenizer (hub name or local directory) for exact counts. Unset
+# by default: token limits are estimated from length, since no local tokenizer
+# matches the Bedrock model and loading one by name downloads it from the hub
+TOKENIZER_NAME = os.getenv("TOKENIZER_NAME", "")
+# Characters per token assumed without a tokenizer
+CHARS_PER_TOKEN = 4
+
+JS_TYPES = {"js", "jsx", "ts", "tsx", "mjs", "cjs"}
+# Top-level declarations that start a new semantic unit in JS/TS
+JS_BOUNDARY = re.compile(
+    r"^(?:export\s+(?:default\s+)?)?(?:async\s+)?(?:function\*?|class)\s"
+    r"|^(?:export\s+)?(?:const|let|var)\s+[\w$]+\s*(?::[^=]+)?=\s*(?:async\s*)?(?:\(|function|class|[\w$]+\s*=>)"
+    r"|^(?:export\s+)?(?:interface|type|enum)\s"
+    r"|^export\s+default\s"
+)
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def _get_tokenizer():
+    global _tokenizer
+    with _tokenizer_lock:
+        if _tokenizer is None:
+            if not TOKENIZER_NAME:
+                _tokenizer = False
+                return _tokenizer
+            try:
+                from transformers import AutoTokenizer
+                _tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_NAME)
+            except Exception as e:
+                print(f"[WARN] Tokenizer unavailable, estimating tokens from length: {e}")
+                _tokenizer = False
+        return _tokenizer
+
+
+def count_tokens(text):
+    """Token count of text; CHARS_PER_TOKEN characters per token without a tokenizer"""
+    tokenizer = _get_tokenizer()
+    if tokenizer:
+        return len(tokenizer.encode(text, add_special_tokens=False))
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def truncate_tokens(text, max_tokens):
+    """The longest prefix of text that count_tokens puts at max_tokens or fewer"""
+    tokenizer = _get_tokenizer()
+    if tokenizer:
+        ids = tokenizer.encode(text, add_special_tokens=False)
+        return text if len(ids) <= max_tokens else tokenizer.decode(ids[:max_tokens])
+    return text[:max(0, max_tokens - 1) * CHARS_PER_TOKEN]
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class TokenBudget:
+    """Thread-safe per-request ceiling on prompt tokens sent to the model"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def consume(self, tokens):
+        with self.lock:
+            if self.limit and self.used + tokens > self.limit:
+                raise BudgetExceeded(f"token budget of {self.limit} exhausted ({self.used} used)")
+            self.used += tokens
+
+
+def _python_boundaries(content):
+    """Start lines (0-based) of top-level statements, decorators included"""
+    tree = ast.parse(content)
+    starts = []
+    for node in tree.body:
+        lineno = node.lineno
+        for decorator in getattr(node, "decorator_list", []):
+            lineno = min(lineno, decorator.lineno)
+        starts.append(lineno - 1)
+    return starts
+
+
+def _js_boundaries(lines):
+    return [i for i, line in enumerate(lines) if JS_BOUNDARY.match(line)]
+
+
+def _segments(content, file_type):
+    """Split content into semantic units (functions, classes, blocks of statements)"""
+    lines = content.splitlines(keepends=True)
+    starts = []
+    try:
+        if file_type == "py":
+            starts = _python_boundaries(content)
+        elif file_type in JS_TYPES:
+            starts = _js_boundaries(lines)
+    except SyntaxError:
+        starts = []
+    if not starts:
+        return [content]
+    # Comments and blank lines before a unit belong to that unit
+    adjusted = []
+    for start in starts:
+        while start > 0 and (not lines[start - 1].strip() or lines[start - 1].lstrip().startswith(("#", "//", "/*", "*"))):
+            if adjusted and start - 1 <= adjusted[-1]:
+                break
+            start -= 1
+        adjusted.append(start)
+    adjusted[0] = 0
+    bounds = adjusted + [len(lines)]
+    return ["".join(lines[a:b]) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+
+def split_code(content, file_type, max_tokens):
+    """
+    Split content into chunks of at most max_tokens, cutting on function and
+    class boundaries for Python and JS/TS. Units that are still too big fall
+    back to recursive character splitting.
+    """
+    file_type = file_type.lower()
+    chunks, current, used = [], [], 0
+    for segment in _segments(content, file_type):
+        tokens = count_tokens(segment)
+        if tokens > max_tokens:
+            if current:
+                chunks.append("".join(current))
+                current, used = [], 0
+            # langchain is slow to import; most files never need it
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            fallback = RecursiveCharacterTextSplitter(
+                chunk_size=max_tokens, chunk_overlap=min(50, max_tokens // 4), length_function=count_tokens
+            )
+            chunks.extend(fallback.split_text(segment))
+            continue
+        if current and used + tokens > max_tokens:
+            chunks.append("".join(current))
+            current, used = [], 0
+        current.append(segment)
+        used += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
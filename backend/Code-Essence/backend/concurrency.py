@@ -0,0 +1,100 @@
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Bedrock error codes that mean "slow down" rather than "broken request"
+THROTTLING_CODES = {"ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException"}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _take(self, tokens):
+        """0 once tokens were taken, else the seconds to wait before trying again"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens=1.0):
+        while True:
+            wait = self._take(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=1.0):
+        """acquire for the event loop: waits without blocking other tasks"""
+        while True:
+            wait = self._take(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+def is_throttling_error(exc):
+    """True for botocore ClientErrors (or wrapped errors) signalling throttling"""
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code")
+        if code in THROTTLING_CODES:
+            return True
+    text = f"{type(exc).__name__} {exc}"
+    return any(code in text for code in THROTTLING_CODES)
+
+
+def call_with_backoff(fn, *args, retries=5, base_delay=1.0, max_delay=30.0, **kwargs):
+    """
+    Call fn, retrying throttling errors with full-jitter exponential backoff.
+    Any other exception is raised immediately.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or not is_throttling_error(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            print(f"[WARN] Throttled, retrying in {delay:.1f}s ({attempt + 1}/{retries})")
+            time.sleep(delay)
+
+
+async def acall_with_backoff(fn, *args, retries=5, base_delay=1.0, max_delay=30.0, **kwargs):
+    """call_with_backoff for coroutine functions: await fn, sleeping on the event loop between tries"""
+    for attempt in range(retries + 1):
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or not is_throttling_error(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            print(f"[WARN] Throttled, retrying in {delay:.1f}s ({attempt + 1}/{retries})")
+            await asyncio.sleep(delay)
+
+
+def map_ordered(fn, items, max_workers):
+    """
+    Run fn over items on a bounded thread pool, returning results in input
+    order. Each call runs in a copy of the caller's context, so request-scoped
+    state such as the metrics trace follows the work onto the pool.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, fn, item) for item in items]
+        return [future.result() for future in futures]
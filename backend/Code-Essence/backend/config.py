@@ -1,7 +1,10 @@
-import boto3
+import llm_client
 
-REGION = "us-east-1"
+REGION = llm_client.AWS_REGION
 
-# Bedrock client
-session = boto3.Session(region_name=REGION)
-bedrock_client = session.client("bedrock-runtime")
+
+def __getattr__(name):
+    # Bedrock client is shared with the summarizer and only built when first used
+    if name == "bedrock_client":
+        return llm_client.get_bedrock_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,78 +1,52 @@
 # controllers/file_analysis_graph.py
-import ast
-from langgraph.graph import StateGraph
-from langchain_core.prompts import PromptTemplate
-from controllers.splitters import split_document
-from controllers.redis_cache import save_docs_to_redis, load_docs_from_redis
+import os
+import threading
+from typing import TypedDict
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import StateGraph, START, END
+import file_access
+import import_graph
+
+PIPELINE_CONCURRENCY = int(os.getenv("PIPELINE_CONCURRENCY", "8"))
 
 # Define state
-class FileState(dict):
+class FileState(TypedDict, total=False):
     repo_url: str
+    root: str
     file_path: str
     summary: str | None
     dependencies: list[str]
 
-# ---- Node 1: Summarize file ----
-def summarize_file_node(state: FileState):
-    repo_url, file_path = state["repo_url"], state["file_path"]
-
-    # 1. Check cache
-    cached = load_docs_from_redis(repo_url, f"summary:{file_path}")
-    if cached:
-        print(f" Cache hit (summary): {file_path}")
-        state["summary"] = cached
-        return state
-
-    # 2. Fresh summarization
-    with open(file_path, "r", encoding="utf-8") as f:
-        content = f.read()
-
-    chunks = split_document(content)
-    summary = ""
-
-    prompt = PromptTemplate(
-        template="Summarize the following Python code clearly and concisely:\n\n{content}\n\nSummary:",
-        input_variables=["content"],
-    )
-
-    for c in chunks:
-        summary += " " + prompt.format(content=c)
+def _read(state: FileState):
+    # None for files file_access skips (binary, generated, over budget)
+    return file_access.read_text(os.path.join(state["root"], state["file_path"]), truncate=True)
 
-    summary = summary.strip()
-
-    # Save to cache
-    save_docs_to_redis(repo_url, f"summary:{file_path}", summary)
-    state["summary"] = summary
-    return state
+# ---- Node 1: Summarize file ----
+def summarize_file_node(state: FileState, config: RunnableConfig):
+    from summarizer import summarize_content  # summarizer imports this module lazily
+    options = config.get("configurable", {})
+    file_path = state["file_path"]
+    content = _read(state)
+    if content is None:
+        return {"summary": None}
+
+    # Chunked on code boundaries for large files; summary_cache serves unchanged blobs
+    file = os.path.basename(file_path)
+    ext = file.lower().split('.')[-1] if '.' in file else file.lower()
+    summary = summarize_content(file, content, file_type=ext, token_budget=options.get("token_budget"))
+    report = options.get("report")
+    if report is not None:
+        report(file_path, summary)
+    return {"summary": summary}
 
 # ---- Node 2: Analyze dependencies ----
 def analyze_dependencies_node(state: FileState):
-    repo_url, file_path = state["repo_url"], state["file_path"]
-
-    # 1. Check cache
-    cached = load_docs_from_redis(repo_url, f"deps:{file_path}")
-    if cached:
-        print(f" Cache hit (deps): {file_path}")
-        state["dependencies"] = cached
-        return state
-
-    # 2. Parse AST for imports
-    deps = []
-    with open(file_path, "r", encoding="utf-8") as f:
-        tree = ast.parse(f.read(), filename=file_path)
-
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Import):
-            for alias in node.names:
-                deps.append(alias.name)
-        elif isinstance(node, ast.ImportFrom):
-            if node.module:
-                deps.append(node.module)
-
-    # Save to cache
-    save_docs_to_redis(repo_url, f"deps:{file_path}", deps)
-    state["dependencies"] = deps
-    return state
+    content = _read(state)
+    if content is None:
+        return {"dependencies": []}
+    # ast for Python, import/require for JS/TS; cached per blob like the import graph
+    imports = import_graph.cached_imports(state["file_path"], content)
+    return {"dependencies": list(dict.fromkeys("." * level + module for module, level, _ in imports))}
 
 # ---- Build Graph ----
 def build_file_analysis_graph():
@@ -82,9 +56,61 @@ def build_file_analysis_graph():
     graph.add_node("summarize_file", summarize_file_node)
     graph.add_node("analyze_dependencies", analyze_dependencies_node)
 
-    # Flow: first summarize → then analyze dependencies
-    graph.set_entry_point("summarize_file")
-    graph.add_edge("summarize_file", "analyze_dependencies")
-    graph.set_finish_point("analyze_dependencies")
+    # Flow: both nodes fan out from the start and run concurrently
+    graph.add_edge(START, "summarize_file")
+    graph.add_edge(START, "analyze_dependencies")
+    graph.add_edge("summarize_file", END)
+    graph.add_edge("analyze_dependencies", END)
 
     return graph.compile()
+
+_graph = None
+_graph_lock = threading.Lock()
+
+def get_file_analysis_graph():
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            _graph = build_file_analysis_graph()
+        return _graph
+
+def analyze_files(repo_url, root, paths, max_concurrency=None, token_budget=None, progress=None):
+    """
+    Run the per-file graph over many files in parallel, at most
+    max_concurrency at a time. Returns {path: {"summary", "dependencies"}}.
+    Prompts are charged to token_budget, and progress(event, data) gets the
+    same "file" and "progress" events as the default pipeline.
+    """
+    inputs = [{"repo_url": repo_url, "root": root, "file_path": path} for path in paths]
+    if not inputs:
+        return {}
+    done = [0]
+    done_lock = threading.Lock()
+
+    def report(file_path, summary):
+        if progress is None:
+            return
+        with done_lock:
+            done[0] += 1
+            count = done[0]
+        progress("file", {"path": file_path, "summary": summary})
+        progress("progress", {"stage": "files", "done": count, "total": len(paths)})
+
+    states = get_file_analysis_graph().batch(
+        inputs,
+        config={
+            "max_concurrency": max_concurrency or PIPELINE_CONCURRENCY,
+            "configurable": {"token_budget": token_budget, "report": report},
+        },
+        return_exceptions=True,
+    )
+    results = {}
+    for path, state in zip(paths, states):
+        if isinstance(state, Exception):
+            print(f"[WARN] Skipping {path}: {state}")
+            continue
+        results[path] = {
+            "summary": state.get("summary"),
+            "dependencies": state.get("dependencies", []),
+        }
+    return results
@@ -0,0 +1,73 @@
+# controllers/redis_cache.py
+import json
+import os
+import threading
+import time
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_TTL_SECONDS = int(os.getenv("REDIS_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_client = None
+_client_lock = threading.Lock()
+
+class LocalRedis:
+    """In-process stand-in for the subset of the redis client used here"""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires < time.time():
+                del self.data[key]
+                return None
+            return value
+
+    def set(self, key, value, ex=None):
+        with self.lock:
+            self.data[key] = (value, time.time() + ex if ex else None)
+        return True
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def ping(self):
+        return True
+
+def get_redis():
+    """Redis client for REDIS_URL; LocalRedis when REDIS_URL=local:// or Redis is unreachable"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            if REDIS_URL.startswith("local://"):
+                _client = LocalRedis()
+            else:
+                try:
+                    import redis
+                    client = redis.Redis.from_url(REDIS_URL)
+                    client.ping()
+                    _client = client
+                except Exception as e:
+                    print(f"[WARN] Redis unavailable ({e}), using in-process cache")
+                    _client = LocalRedis()
+        return _client
+
+def _redis_key(repo_url, key):
+    return f"code-essence:{repo_url}:{key}"
+
+def save_docs_to_redis(repo_url, key, value, ttl=None):
+    """Store any JSON-serializable value under (repo_url, key)"""
+    get_redis().set(_redis_key(repo_url, key), json.dumps(value), ex=ttl or REDIS_TTL_SECONDS)
+
+def load_docs_from_redis(repo_url, key):
+    """Return the cached value for (repo_url, key), or None"""
+    raw = get_redis().get(_redis_key(repo_url, key))
+    if raw is None:
+        return None
+    return json.loads(raw)
@@ -0,0 +1,306 @@
+import contextvars
+import mmap
+import os
+import re
+import threading
+from contextlib import contextmanager
+import metrics
+
+# Files over this are skipped, or cut to a prefix where one is still useful
+MAX_FILE_BYTES = int(os.getenv("MAX_FILE_BYTES", str(1024 ** 2)))
+# Manifests and lockfiles are parsed whole and can legitimately be large
+MAX_MANIFEST_BYTES = int(os.getenv("MAX_MANIFEST_BYTES", str(16 * 1024 ** 2)))
+# Files this large are memory-mapped, so rejecting one touches only its first pages
+MMAP_MIN_BYTES = int(os.getenv("MMAP_MIN_BYTES", str(64 * 1024)))
+# Repository content one request may read; 0 = unlimited
+REQUEST_BYTE_BUDGET = int(os.getenv("REQUEST_BYTE_BUDGET", str(256 * 1024 ** 2)))
+
+# Leading bytes inspected for NUL bytes and minified content
+SNIFF_BYTES = 8192
+# Leading bytes searched for "generated" banners
+HEADER_BYTES = 1024
+GENERATED_MARKERS = (b"@generated", b"do not edit", b"auto-generated", b"autogenerated", b"generated by")
+GENERATED_SUFFIXES = (
+    ".min.js", ".min.css", ".bundle.js", ".js.map", ".css.map", "_pb2.py", "_pb2_grpc.py", ".pb.go",
+)
+# Average line length (over a full sniff window) above which a file counts as minified
+MINIFIED_LINE_LENGTH = 500
+
+_budget = contextvars.ContextVar("code_essence_byte_budget", default=None)
+
+
+class ByteBudget:
+    """Thread-safe per-request ceiling on bytes read, with read and skipped totals"""
+
+    def __init__(self, limit=REQUEST_BYTE_BUDGET):
+        self.limit = limit
+        self.read = 0
+        self.skipped = {}  # reason -> [files, bytes]
+        self.lock = threading.Lock()
+
+    def reserve(self, nbytes):
+        """Count nbytes as read; False (nothing counted) when that would pass the limit"""
+        with self.lock:
+            if self.limit and self.read + nbytes > self.limit:
+                return False
+            self.read += nbytes
+            return True
+
+    def release(self, nbytes):
+        with self.lock:
+            self.read -= nbytes
+
+    def skip(self, nbytes, reason):
+        with self.lock:
+            total = self.skipped.setdefault(reason, [0, 0])
+            total[0] += 1
+            total[1] += nbytes
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                "bytes_read": self.read,
+                "bytes_skipped": sum(nbytes for _, nbytes in self.skipped.values()),
+                "skipped": {reason: {"files": files, "bytes": nbytes}
+                            for reason, (files, nbytes) in sorted(self.skipped.items())},
+                "limit": self.limit,
+            }
+
+
+@contextmanager
+def request_budget(limit=REQUEST_BYTE_BUDGET):
+    """
+    Charge reads in this context (and threads started from a copy of it) to
+    one ByteBudget. Nested scopes share the outermost budget.
+    """
+    budget = _budget.get()
+    if budget is not None:
+        yield budget
+        return
+    budget = ByteBudget(limit)
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+def current_budget():
+    return _budget.get()
+
+
+def skip(nbytes, reason):
+    """Record nbytes of repository content left unread, by reason"""
+    budget = _budget.get()
+    if budget is not None:
+        budget.skip(nbytes, reason)
+    metrics.inc("bytes_skipped_total", nbytes, help="Bytes of repository content not read", reason=reason)
+
+
+def is_generated(name, head):
+    """True for minified bundles, generated stubs and files with a "do not edit" banner"""
+    if name.lower().endswith(GENERATED_SUFFIXES):
+        return True
+    banner = head[:HEADER_BYTES].lower()
+    if any(marker in banner for marker in GENERATED_MARKERS):
+        return True
+    sample = head[:SNIFF_BYTES]
+    return len(sample) == SNIFF_BYTES and len(sample) / (sample.count(b"\n") + 1) > MINIFIED_LINE_LENGTH
+
+
+def _sniff(name, head, skip_generated):
+    if b"\0" in head[:SNIFF_BYTES]:
+        return "binary"
+    if skip_generated and is_generated(name, head):
+        return "generated"
+    return None
+
+
+def decode(data, name, size=None, skip_generated=True, errors="strict", account=True, source="checkout"):
+    """
+    Text of data, the first bytes of a file of size bytes (all of it when
+    size is None), or None when it is binary, generated, undecodable or over
+    the request's byte budget. A partial file is cut back to its last full line.
+    """
+    size = len(data) if size is None else size
+    reason = _sniff(name, data, skip_generated)
+    if reason:
+        return _skipped(size, reason, account)
+    if len(data) < size:
+        end = data.rfind(b"\n")
+        if end >= 0:
+            data = data[:end + 1]
+    budget = _budget.get() if account else None
+    if budget is not None and not budget.reserve(len(data)):
+        return _skipped(size, "budget", account)
+    try:
+        text = data.decode("utf-8", errors)
+    except UnicodeDecodeError:
+        if budget is not None:
+            budget.release(len(data))
+        return _skipped(size, "binary", account)
+    if account:
+        metrics.inc("bytes_read_total", len(data), help="Bytes of repository content read", source=source)
+        if len(data) < size:
+            skip(size - len(data), "truncated")
+    return text
+
+
+def _skipped(nbytes, reason, account):
+    if account:
+        skip(nbytes, reason)
+    return None
+
+
+def read_text(path, max_bytes=MAX_FILE_BYTES, truncate=False, skip_generated=True, errors="strict",
+              account=True):
+    """
+    Contents of the file at path, or None when it is skipped (see decode).
+    Files over max_bytes are skipped, or with truncate cut to their first
+    max_bytes. Large files are memory-mapped and checked before being copied.
+    account=False leaves the budget and metrics alone, for readers whose
+    files were already charged with admit().
+    """
+    name = os.path.basename(path)
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size > max_bytes and not truncate:
+                return _skipped(size, "too_large", account)
+            if size < MMAP_MIN_BYTES:
+                return decode(f.read(max_bytes), name, size, skip_generated, errors, account)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                reason = _sniff(name, mm[:SNIFF_BYTES], skip_generated)
+                if reason:
+                    return _skipped(size, reason, account)
+                return decode(mm[:max_bytes], name, size, skip_generated, errors, account)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Cannot read {path}: {e}")
+        return None
+
+
+def admit(name, size, max_bytes=MAX_FILE_BYTES, skip_generated=True):
+    """
+    Charge a file that another process will read with account=False. False
+    (counted as skipped) when it is too large, named like a generated file
+    or over the budget.
+    """
+    reason = None
+    if size > max_bytes:
+        reason = "too_large"
+    elif skip_generated and name.lower().endswith(GENERATED_SUFFIXES):
+        reason = "generated"
+    else:
+        budget = _budget.get()
+        if budget is not None and not budget.reserve(size):
+            reason = "budget"
+    if reason:
+        skip(size, reason)
+        return False
+    metrics.inc("bytes_read_total", size, help="Bytes of repository content read", source="checkout")
+    return True
+
+
+def _translate(pattern):
+    """Regex body for one gitignore glob"""
+    out, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end].replace("\\", "\\\\")
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append(f"[{body}]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+class GitIgnore:
+    """The .gitignore files of a checkout, matched against index paths"""
+
+    def __init__(self, rules):
+        self.rules = rules  # [(regex, negate, dir_only)], later rules win
+        self.dirs = {}
+
+    @classmethod
+    def from_index(cls, index, skip_dirs=()):
+        files = [entry for entry in index.files if entry.name == ".gitignore"
+                 and not any(part in skip_dirs for part in entry.path.split("/")[:-1])]
+        rules = []
+        for entry in sorted(files, key=lambda e: (e.depth, e.path)):
+            text = read_text(index.abspath(entry.path), skip_generated=False, errors="replace")
+            if text:
+                rules.extend(cls.parse(text, entry.dir))
+        return cls(rules)
+
+    @staticmethod
+    def parse(text, base=""):
+        rules = []
+        prefix = re.escape(base + "/") if base else ""
+        for line in text.splitlines():
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if not line:
+                continue
+            regex = prefix + ("" if anchored else "(?:.*/)?") + _translate(line)
+            rules.append((re.compile(regex), negate, dir_only))
+        return rules
+
+    def _match(self, path, is_dir):
+        ignored = False
+        for regex, negate, dir_only in self.rules:
+            if (is_dir or not dir_only) and regex.fullmatch(path):
+                ignored = not negate
+        return ignored
+
+    def ignored(self, rel_path):
+        """True when rel_path or one of its parent directories is ignored"""
+        if not self.rules:
+            return False
+        parts = rel_path.split("/")
+        for depth in range(1, len(parts)):
+            directory = "/".join(parts[:depth])
+            if directory not in self.dirs:
+                self.dirs[directory] = self._match(directory, True)
+            if self.dirs[directory]:
+                return True
+        return self._match(rel_path, False)
+
+
+def iter_files(index, skip_dirs, gitignore=True):
+    """
+    Entries of a scanner.FileIndex outside skip_dirs and not excluded by
+    the checkout's .gitignore files; the others are counted as skipped.
+    """
+    rules = GitIgnore.from_index(index, skip_dirs) if gitignore else None
+    for entry in index.files:
+        if any(part in skip_dirs for part in entry.path.split("/")[:-1]) or (rules and rules.ignored(entry.path)):
+            skip(entry.size, "ignored")
+            continue
+        yield entry
@@ -1,7 +1,4 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains.summarize import load_summarize_chain
-
-splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=200)
+import llm_client
 
 # Prompts per file type
 FILE_PROMPTS = {
@@ -24,7 +21,13 @@ Describe in 2-3 sentences, max 150 words, focusing on functionality, tech stack,
 def summarize_file_content(llm, file_name: str, content: str, file_type: str):
     """
     Summarizes a single file content using LangChain + Bedrock.
+    llm defaults to the shared llm_client model when None.
     """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain.chains.summarize import load_summarize_chain
+
+    llm = llm or llm_client.get_llm()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=200)
     prompt = FILE_PROMPTS.get(file_type.lower(), "Summarize source code file briefly.")
     docs = splitter.create_documents([f"{REPO_PROMPT}\n\n{content}"])
     chain = load_summarize_chain(llm, chain_type="map_reduce")
@@ -0,0 +1,25 @@
+# gunicorn -c gunicorn.conf.py app:app
+#
+# With GUNICORN_PRELOAD=1 (the default) the master imports the app and the
+# heavy modules once (startup.warm) and workers share them copy-on-write.
+# GUNICORN_PRELOAD=0 boots each worker on its own, importing lazily.
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+
+def on_starting(server):
+    if server.cfg.preload_app:
+        import startup
+
+        startup.warm()
+
+
+def post_fork(server, worker):
+    import startup
+
+    startup.after_fork()
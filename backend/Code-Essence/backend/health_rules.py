@@ -0,0 +1,225 @@
+import json
+import os
+import posixpath
+import threading
+from collections import OrderedDict, namedtuple
+import yaml
+import file_access
+from concurrency import map_ordered
+
+HEALTH_RULE_WORKERS = int(os.getenv("HEALTH_RULE_WORKERS", "4"))
+HEALTH_CACHE_SIZE = int(os.getenv("HEALTH_CACHE_SIZE", "256"))
+# Comma-separated optional rule ids to enable on top of the defaults
+HEALTH_EXTRA_RULES = [r for r in os.getenv("HEALTH_EXTRA_RULES", "").split(",") if r]
+# Subprojects are top-level folders with an entry point. Set to 1 to also score
+# folders at any depth that hold a dependency manifest (monorepo packages).
+HEALTH_NESTED_PROJECTS = os.getenv("HEALTH_NESTED_PROJECTS", "0") == "1"
+
+PROJECT_MAX_SCORE = 10
+
+ENTRY_POINTS = ["app.py", "main.py", "index.js", "server.js"]
+DEPENDENCY_FILES = ["requirements.txt", "pyproject.toml", "Pipfile", "package.json", "poetry.lock"]
+LAYOUT_DIRS = ["src", "app", "backend", "frontend", "services"]
+LOCKFILES = ["package-lock.json", "poetry.lock", "Pipfile.lock", "yarn.lock", "pnpm-lock.yaml"]
+# Subprojects list their details in this order; the root keeps the rule order
+SUBPROJECT_RULE_ORDER = ["entry_point", "folder_layout", "dependency_file"]
+
+# id: stable name; scope: "project" (root and every subproject) or "repo" (root bonus);
+# cost: "cheap" rules only query the index, "expensive" ones read file content and run
+# in parallel; evaluate(index, rel_dir) returns the detail text when the rule passes.
+Rule = namedtuple("Rule", ["id", "scope", "weight", "cost", "evaluate", "miss"])
+
+
+def _entry_point(index, rel_dir):
+    found = index.find(ENTRY_POINTS, rel_dir)
+    if found:
+        return f"Found entry point: {found[0].name}"
+    return None
+
+
+def _dependency_files(index, rel_dir):
+    found = index.find(DEPENDENCY_FILES, rel_dir)
+    if found:
+        return f"Dependency file found: {', '.join(entry.name for entry in found)}"
+    return None
+
+
+def _layout(index, rel_dir):
+    if any(index.is_dir(posixpath.join(rel_dir, d)) for d in LAYOUT_DIRS):
+        return "Recognizable folder layout"
+    return None
+
+
+def _readme(index, rel_dir):
+    if index.find({"readme.md"}, rel_dir, lower=True):
+        return "README.md found"
+    return None
+
+
+def _ci_config(index, rel_dir):
+    if index.exists(posixpath.join(rel_dir, ".github")):
+        return "CI/CD config detected"
+    return None
+
+
+def _valid_lockfile(index, rel_dir):
+    for entry in index.find(LOCKFILES, rel_dir):
+        text = file_access.read_text(
+            index.abspath(entry.path), max_bytes=file_access.MAX_MANIFEST_BYTES, skip_generated=False
+        )
+        if not text:
+            continue
+        try:
+            if entry.name.endswith(".json"):
+                json.loads(text)
+            elif entry.name.endswith(".yaml"):
+                yaml.load(text, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+            return f"Valid lockfile: {entry.name}"
+        except (ValueError, yaml.YAMLError):
+            continue
+    return None
+
+
+def _ci_workflows(index, rel_dir):
+    prefix = posixpath.join(rel_dir, ".github/workflows")
+    valid = []
+    for entry in index.files_under(prefix):
+        if entry.ext not in (".yml", ".yaml"):
+            continue
+        text = file_access.read_text(index.abspath(entry.path), skip_generated=False)
+        if text is None:
+            continue
+        try:
+            doc = yaml.load(text, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+        except yaml.YAMLError:
+            continue
+        if isinstance(doc, dict) and doc.get("jobs"):
+            valid.append(entry.name)
+    if valid:
+        return f"CI workflows with jobs: {', '.join(valid)}"
+    return None
+
+
+DEFAULT_RULES = [
+    Rule("entry_point", "project", 2, "cheap", _entry_point, None),
+    Rule("dependency_file", "project", 2, "cheap", _dependency_files, "No dependency file found → 0 points"),
+    Rule("folder_layout", "project", 2, "cheap", _layout, None),
+    Rule("readme", "repo", 2, "cheap", _readme, None),
+    Rule("ci_config", "repo", 2, "cheap", _ci_config, None),
+]
+
+OPTIONAL_RULES = {
+    "lockfile": Rule("lockfile", "project", 2, "expensive", _valid_lockfile, None),
+    "ci_workflows": Rule("ci_workflows", "repo", 2, "expensive", _ci_workflows, None),
+}
+
+
+def active_rules():
+    return DEFAULT_RULES + [OPTIONAL_RULES[r] for r in HEALTH_EXTRA_RULES if r in OPTIONAL_RULES]
+
+
+def project_dirs(index):
+    """Subproject folders to score next to the root"""
+    found = set(index.project_dirs(set(ENTRY_POINTS), skip_dirs=(), max_depth=1))
+    if HEALTH_NESTED_PROJECTS:
+        found.update(index.project_dirs(set(DEPENDENCY_FILES)))
+    return sorted(found)
+
+
+def _run_rule(index, rule, rel_dir):
+    try:
+        return rule.evaluate(index, rel_dir)
+    except Exception as e:
+        print(f"[WARN] Health rule {rule.id} failed for {rel_dir or 'root'}: {e}")
+        return None
+
+
+def evaluate(index, rules=None, max_workers=None):
+    """
+    Score the root project, every nested project and the repo-level rules in
+    one pass over the index. Returns the analyze_repo_health JSON shape.
+    """
+    rules = rules or active_rules()
+    max_workers = max_workers or HEALTH_RULE_WORKERS
+    projects = [""] + project_dirs(index)
+    tasks = [(rule, p) for rule in rules if rule.scope == "project" for p in projects]
+    tasks += [(rule, "") for rule in rules if rule.scope == "repo"]
+
+    # Cheap rules inline; content-reading rules on the pool
+    outcomes = {}
+    for rule, rel_dir in tasks:
+        if rule.cost == "cheap":
+            outcomes[(rule.id, rel_dir)] = _run_rule(index, rule, rel_dir)
+    expensive = [(rule, rel_dir) for rule, rel_dir in tasks if rule.cost != "cheap"]
+    results = map_ordered(lambda task: _run_rule(index, *task), expensive, max_workers)
+    for (rule, rel_dir), outcome in zip(expensive, results):
+        outcomes[(rule.id, rel_dir)] = outcome
+
+    report = {"projects": {}, "root_details": []}
+    overall_score = 0
+    overall_max_score = 0
+    project_rules = [rule for rule in rules if rule.scope == "project"]
+    subproject_rules = sorted(project_rules, key=lambda rule: (
+        SUBPROJECT_RULE_ORDER.index(rule.id) if rule.id in SUBPROJECT_RULE_ORDER else len(SUBPROJECT_RULE_ORDER)
+    ))
+    for rel_dir in projects:
+        details, score = [], 0
+        for rule in subproject_rules if rel_dir else project_rules:
+            outcome = outcomes[(rule.id, rel_dir)]
+            if outcome:
+                details.append(f"{outcome} → +{rule.weight}")
+                score += rule.weight
+            elif rule.miss:
+                details.append(rule.miss)
+        healthy = bool(outcomes[("entry_point", rel_dir)])
+        if rel_dir:
+            status = "Healthy project" if healthy else "Broken / incomplete"
+        else:
+            status = "Healthy project" if healthy else "Incomplete"
+        max_score = max(PROJECT_MAX_SCORE, sum(r.weight for r in rules if r.scope == "project"))
+        report["projects"][rel_dir or "root"] = {
+            "details": details,
+            "score": score,
+            "max_score": max_score,
+            "status": status
+        }
+        overall_score += score
+        overall_max_score += max_score
+
+    for rule in rules:
+        if rule.scope != "repo":
+            continue
+        outcome = outcomes[(rule.id, "")]
+        if outcome:
+            report["root_details"].append(f"{outcome} → +{rule.weight}")
+            overall_score += rule.weight
+        overall_max_score += rule.weight
+
+    return {
+        "overall_repo_score": overall_score,
+        "overall_repo_max_score": overall_max_score,
+        "projects": report["projects"],
+        "root_details": report["root_details"]
+    }
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cached_result(commit, rules=None):
+    key = (commit, tuple(rule.id for rule in rules or active_rules()))
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    return None
+
+
+def store_result(commit, result, rules=None):
+    key = (commit, tuple(rule.id for rule in rules or active_rules()))
+    with _cache_lock:
+        _cache[key] = result
+        _cache.move_to_end(key)
+        while len(_cache) > HEALTH_CACHE_SIZE:
+            _cache.popitem(last=False)
@@ -0,0 +1,327 @@
+import ast
+import json
+import os
+import posixpath
+import re
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import file_access
+import metrics
+import summary_cache
+
+# Bump when extraction changes so cached edges are recomputed
+PARSER_VERSION = "1"
+IMPORT_GRAPH_WORKERS = int(os.getenv("IMPORT_GRAPH_WORKERS", str(os.cpu_count() or 2)))
+# Below this many uncached files parsing stays in-process
+PROCESS_POOL_MIN_FILES = int(os.getenv("IMPORT_GRAPH_POOL_MIN_FILES", "64"))
+MAX_GRAPH_NODES = int(os.getenv("MAX_GRAPH_NODES", "2000"))
+# cluster_graph node holding the modules left over once max_nodes is reached
+OTHER_CLUSTER = "(other)"
+
+PY_EXTENSIONS = {".py"}
+JS_EXTENSIONS = [".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs"]
+SKIP_DIRS = {".git", "node_modules", "__pycache__", ".venv", "venv", "dist", "build"}
+
+JS_IMPORT = re.compile(
+    r"""(?:\bimport\s+(?:[\w$*{}\s,]+?\s+from\s+)?|\bexport\s+[\w$*{}\s,]+?\s+from\s+|\brequire\s*\(\s*|\bimport\s*\(\s*)
+        (['"])([^'"\n]+)\1""",
+    re.VERBOSE,
+)
+NODE_BUILTINS = {
+    "assert", "buffer", "child_process", "cluster", "crypto", "dns", "events", "fs", "http",
+    "http2", "https", "net", "os", "path", "process", "querystring", "readline", "stream",
+    "string_decoder", "timers", "tls", "url", "util", "v8", "vm", "worker_threads", "zlib",
+}
+PY_STDLIB = set(getattr(sys, "stdlib_module_names", ())) | set(sys.builtin_module_names)
+
+_pool = None
+_pool_lock = threading.Lock()
+_store = None
+
+
+def extract_python(content):
+    """[(module, level, names)] for every import statement"""
+    imports = []
+    for node in ast.walk(ast.parse(content)):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append((alias.name, 0, []))
+        elif isinstance(node, ast.ImportFrom):
+            imports.append((node.module or "", node.level, [alias.name for alias in node.names]))
+    return imports
+
+
+def extract_js(content):
+    return [(match.group(2), 0, []) for match in JS_IMPORT.finditer(content)]
+
+
+def parse_file(args):
+    """
+    Process-pool worker: (abs_path, rel_path) -> (rel_path, imports or None).
+    The file was charged to the request with file_access.admit beforehand.
+    """
+    abs_path, rel_path = args
+    ext = os.path.splitext(rel_path)[1].lower()
+    try:
+        content = file_access.read_text(abs_path, errors="replace", account=False)
+        if content is None:
+            return rel_path, None
+        if ext in PY_EXTENSIONS:
+            return rel_path, extract_python(content)
+        return rel_path, extract_js(content)
+    except (SyntaxError, ValueError, OSError):
+        return rel_path, None
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=IMPORT_GRAPH_WORKERS)
+        return _pool
+
+
+def _get_store():
+    global _store
+    if _store is None and summary_cache.SUMMARY_CACHE_BACKEND != "none":
+        _store = summary_cache.SQLiteStore(summary_cache.SUMMARY_CACHE_PATH, table="import_edges")
+    return _store
+
+
+def _cache_key(sha, rel_path):
+    # Extraction depends on the extension as well as the content
+    return f"{sha}|{os.path.splitext(rel_path)[1].lower()}|{PARSER_VERSION}"
+
+
+def cached_imports(rel_path, content):
+    """Imports of one file's content through the per-blob cache; [] when it does not parse"""
+    store = _get_store()
+    key = _cache_key(summary_cache.blob_sha(content), rel_path)
+    cached = store.get(key) if store else None
+    if cached is not None:
+        return [tuple(item) for item in json.loads(cached)]
+    try:
+        if os.path.splitext(rel_path)[1].lower() in PY_EXTENSIONS:
+            imports = extract_python(content)
+        else:
+            imports = extract_js(content)
+    except (SyntaxError, ValueError):
+        return []
+    if store:
+        store.set(key, json.dumps(imports))
+    return imports
+
+
+def _source_files(index):
+    for entry in file_access.iter_files(index, SKIP_DIRS):
+        if entry.ext in PY_EXTENSIONS or entry.ext in JS_EXTENSIONS:
+            yield entry
+
+
+def collect_imports(index):
+    """{rel_path: imports} for every source file, using the per-blob cache"""
+    store = _get_store()
+    results, misses = {}, []
+    for entry in _source_files(index):
+        cached = store.get(_cache_key(entry.sha, entry.path)) if store and entry.sha else None
+        if cached is not None:
+            results[entry.path] = [tuple(item) for item in json.loads(cached)]
+        elif file_access.admit(entry.name, entry.size):
+            misses.append(entry)
+
+    jobs = [(index.abspath(entry.path), entry.path) for entry in misses]
+    if len(jobs) >= PROCESS_POOL_MIN_FILES:
+        parsed = _get_pool().map(parse_file, jobs, chunksize=32)
+    else:
+        parsed = map(parse_file, jobs)
+    shas = {entry.path: entry.sha for entry in misses}
+    for rel_path, imports in parsed:
+        if imports is None:
+            continue
+        results[rel_path] = imports
+        if store and shas.get(rel_path):
+            store.set(_cache_key(shas[rel_path], rel_path), json.dumps(imports))
+    print(f"[INFO] Import graph: {len(results) - len(jobs)} cached, {len(jobs)} parsed")
+    return results
+
+
+def _resolve_python(index, rel_path, module, level, names):
+    """Internal target paths, or None when the import is external"""
+    def lookup(base, dotted):
+        candidate = posixpath.join(base, *dotted.split(".")) if dotted else base
+        for path in (candidate + ".py", posixpath.join(candidate, "__init__.py")):
+            if path in index.by_path:
+                return path
+        return None
+
+    directory = posixpath.dirname(rel_path)
+    if level:
+        bases = [directory]
+        for _ in range(level - 1):
+            bases = [posixpath.dirname(bases[0])]
+    else:
+        # Absolute imports may be rooted at any ancestor (src layouts, monorepos)
+        bases, current = [], directory
+        while True:
+            bases.append(current)
+            if not current:
+                break
+            current = posixpath.dirname(current)
+
+    for base in bases:
+        targets = []
+        for name in names:
+            # `from pkg import module` points at the submodule when there is one
+            sub = lookup(base, f"{module}.{name}" if module else name)
+            if sub:
+                targets.append(sub)
+        found = lookup(base, module) if module else None
+        if found and not targets:
+            targets.append(found)
+        if targets:
+            return targets
+    if level:
+        return []
+    top = module.split(".")[0]
+    if any(index.is_dir(posixpath.join(base, top)) for base in bases):
+        return []  # a repo package, just not a module we can see
+    return None
+
+
+def _resolve_js(index, rel_path, spec):
+    if not spec.startswith("."):
+        return None
+    base = posixpath.normpath(posixpath.join(posixpath.dirname(rel_path), spec))
+    candidates = [base] + [base + ext for ext in JS_EXTENSIONS]
+    candidates += [posixpath.join(base, "index" + ext) for ext in JS_EXTENSIONS]
+    for path in candidates:
+        if path in index.by_path:
+            return [path]
+    return []
+
+
+def build_graph(index, include_stdlib=False, max_nodes=None):
+    """
+    Module-level dependency graph: repo files become "module" nodes grouped
+    by top-level folder, third-party packages become "python"/"node" nodes.
+    Graphs over max_nodes are clustered by directory.
+    """
+    nodes, links = {}, set()
+
+    def add_node(node_id, group):
+        nodes.setdefault(node_id, group)
+
+    with metrics.span("import_parse"):
+        parsed = collect_imports(index)
+    for rel_path, imports in parsed.items():
+        top = rel_path.split("/", 1)[0] if "/" in rel_path else "root"
+        add_node(rel_path, top)
+        is_python = rel_path.endswith(".py")
+        for module, level, names in imports:
+            if is_python:
+                targets = _resolve_python(index, rel_path, module, level, names)
+            else:
+                targets = _resolve_js(index, rel_path, module)
+            if targets:
+                for target in targets:
+                    target_top = target.split("/", 1)[0] if "/" in target else "root"
+                    add_node(target, target_top)
+                    if target != rel_path:
+                        links.add((rel_path, target))
+                continue
+            if targets == []:
+                continue  # relative import of a file that is not in the repo
+            if is_python:
+                package, group = module.split(".")[0], "python"
+                if package in PY_STDLIB:
+                    if not include_stdlib:
+                        continue
+                    group = "stdlib"
+            else:
+                spec = module[5:] if module.startswith("node:") else module
+                parts = spec.split("/")
+                package = "/".join(parts[:2]) if spec.startswith("@") else parts[0]
+                group = "node"
+                if package in NODE_BUILTINS:
+                    if not include_stdlib:
+                        continue
+                    group = "stdlib"
+            if package:
+                add_node(package, group)
+                links.add((rel_path, package))
+
+    graph = {
+        "nodes": [{"id": node_id, "group": group} for node_id, group in nodes.items()],
+        "links": [{"source": s, "target": t} for s, t in sorted(links)],
+    }
+    return cluster_graph(graph, max_nodes or MAX_GRAPH_NODES)
+
+
+def cluster_graph(graph, max_nodes):
+    """
+    Collapse repo modules into their directories, shallowest depth first,
+    until the graph has at most max_nodes nodes; when root modules alone
+    are too many, the least connected go into one OTHER_CLUSTER node.
+    Links between clusters carry a "value" with the number of underlying edges.
+    """
+    if len(graph["nodes"]) <= max_nodes:
+        return graph
+    external = {n["id"]: n["group"] for n in graph["nodes"] if n["group"] in ("python", "node", "stdlib")}
+    internal = [n["id"] for n in graph["nodes"] if n["id"] not in external]
+    max_depth = max((node_id.count("/") for node_id in internal), default=0)
+
+    def cluster_id(node_id, depth):
+        parts = node_id.split("/")
+        if len(parts) - 1 < depth:
+            return node_id
+        return "/".join(parts[:depth]) + "/"
+
+    # Root-level modules have no directory to collapse into
+    mapping = {node_id: node_id for node_id in internal}
+    for depth in range(max_depth, 0, -1):
+        mapping = {node_id: cluster_id(node_id, depth) for node_id in internal}
+        if len(set(mapping.values())) + len(external) <= max_nodes:
+            break
+
+    units = sorted(set(mapping.values()))
+    if len(units) > max_nodes:
+        # Too many root modules and top-level directories: keep the best
+        # connected ones and packages, fold the remaining modules together
+        degree = {}
+        for link in graph["links"]:
+            source = mapping.get(link["source"], link["source"])
+            target = mapping.get(link["target"], link["target"])
+            if source != target:
+                degree[source] = degree.get(source, 0) + 1
+                degree[target] = degree.get(target, 0) + 1
+        ranked = sorted(units + list(external), key=lambda node_id: (-degree.get(node_id, 0), node_id))
+        kept = set(ranked[:max_nodes - 1])
+        mapping = {node_id: cluster if cluster in kept else OTHER_CLUSTER for node_id, cluster in mapping.items()}
+        kept_external = kept & set(external)
+    else:
+        # Drop the least-used packages if directories alone are not enough
+        weights = {}
+        for link in graph["links"]:
+            if link["target"] in external:
+                weights[link["target"]] = weights.get(link["target"], 0) + 1
+        budget = max(0, max_nodes - len(units))
+        kept_external = set(sorted(external, key=lambda p: -weights.get(p, 0))[:budget])
+
+    nodes, counts = {}, {}
+    for node_id in internal:
+        cluster = mapping[node_id]
+        nodes.setdefault(cluster, cluster.split("/", 1)[0] if "/" in cluster else "root")
+    for node_id in kept_external:
+        nodes[node_id] = external[node_id]
+    for link in graph["links"]:
+        source = mapping.get(link["source"], link["source"])
+        target = mapping.get(link["target"], link["target"])
+        if source == target or source not in nodes or target not in nodes:
+            continue
+        counts[(source, target)] = counts.get((source, target), 0) + 1
+    return {
+        "nodes": [{"id": node_id, "group": group} for node_id, group in nodes.items()],
+        "links": [{"source": s, "target": t, "value": v} for (s, t), v in sorted(counts.items())],
+        "clustered": True,
+    }
@@ -0,0 +1,305 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(tempfile.gettempdir(), "code-essence-jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Owners refresh updated_at on their active jobs this often; a job on another
+# host whose lease is older than JOB_LEASE_SECONDS counts as abandoned
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+
+ACTIVE_STATES = ("queued", "running")
+FINISHED_STATES = ("done", "failed")
+
+_handlers = {}
+_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+_changed = threading.Condition()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    dedup_key TEXT,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    owner TEXT,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+def _conn():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(JOBS_DB_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def owner():
+    """
+    This process as recorded in jobs.owner. Read per call: a gunicorn
+    --preload master imports this module before forking its workers.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def reset():
+    """
+    Drop the executor, heartbeat and SQLite connections inherited from the
+    parent in a freshly forked worker; they are rebuilt on first use.
+    """
+    global _executor, _executor_lock, _local, _changed
+    _executor = None
+    _executor_lock = threading.Lock()
+    _local = threading.local()
+    _changed = threading.Condition()
+
+
+def register(kind, handler):
+    """
+    Register handler(params, emit) for jobs of `kind`. emit(event, data)
+    records a progress event; the handler's return value is the job result.
+    """
+    _handlers[kind] = handler
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+            threading.Thread(target=_heartbeat, name="job-heartbeat", daemon=True).start()
+        return _executor
+
+
+def _heartbeat():
+    """Renew the lease on every active job this process owns"""
+    while True:
+        try:
+            _conn().execute(
+                "UPDATE jobs SET updated_at = ? WHERE owner = ? AND status IN (?, ?)",
+                (time.time(), owner(), *ACTIVE_STATES),
+            )
+        except sqlite3.Error as e:
+            print(f"[WARN] Job heartbeat failed: {e}")
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+
+
+def _notify():
+    with _changed:
+        _changed.notify_all()
+
+
+def _update(job_id, **fields):
+    fields["updated_at"] = time.time()
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    _conn().execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+    _notify()
+
+
+def emit(job_id, event, data):
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        seq = conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?", (job_id,)
+        ).fetchone()[0]
+        conn.execute(
+            "INSERT INTO job_events (job_id, seq, event, data) VALUES (?, ?, ?, ?)",
+            (job_id, seq, event, json.dumps(data)),
+        )
+        if event == "progress":
+            conn.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(data), time.time(), job_id),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    _notify()
+
+
+def _run(job_id):
+    row = _conn().execute("SELECT kind, params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return
+    _update(job_id, status="running")
+    emit(job_id, "status", {"status": "running"})
+    try:
+        result = _handlers[row["kind"]](
+            json.loads(row["params"]), lambda event, data: emit(job_id, event, data)
+        )
+        # Final event goes in before the status flip so streams never miss it
+        emit(job_id, "status", {"status": "done"})
+        _update(job_id, status="done", result=json.dumps(result))
+    except Exception as e:
+        print(f"[ERROR] Job {job_id} failed: {e}")
+        emit(job_id, "status", {"status": "failed", "error": str(e)})
+        _update(job_id, status="failed", error=str(e))
+
+
+def submit(kind, params, dedup_key=None):
+    """
+    Queue a job and return (job_id, created). A queued or running job with
+    the same dedup_key is reused instead of starting a new one.
+    """
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if dedup_key:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE dedup_key = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                (dedup_key, *ACTIVE_STATES),
+            ).fetchone()
+            if row:
+                conn.execute("COMMIT")
+                return row["id"], False
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn.execute(
+            "INSERT INTO jobs (id, kind, dedup_key, params, status, owner, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+            (job_id, kind, dedup_key, json.dumps(params), owner(), now, now),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    _get_executor().submit(_run, job_id)
+    return job_id, True
+
+
+def _owner_alive(job_owner, updated_at):
+    """
+    Same-host owners are checked by PID. Other hosts (pods sharing the jobs
+    volume) cannot be, so they are alive while their lease is fresh.
+    """
+    host, _, pid = (job_owner or "").rpartition(":")
+    if host != socket.gethostname():
+        return bool(job_owner) and time.time() - updated_at < JOB_LEASE_SECONDS
+    if not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def recover():
+    """
+    Requeue jobs whose owning process died (e.g. across a restart), or whose
+    owner on another host stopped renewing its lease
+    """
+    recovered = []
+    me = owner()
+    rows = _conn().execute(
+        "SELECT id, owner, updated_at FROM jobs WHERE status IN (?, ?)", ACTIVE_STATES
+    ).fetchall()
+    for row in rows:
+        if row["owner"] == me or _owner_alive(row["owner"], row["updated_at"]):
+            continue
+        # Only one worker process wins the claim
+        claimed = _conn().execute(
+            "UPDATE jobs SET owner = ?, status = 'queued', updated_at = ? "
+            "WHERE id = ? AND owner IS ? AND updated_at = ?",
+            (me, time.time(), row["id"], row["owner"], row["updated_at"]),
+        ).rowcount
+        if claimed:
+            print(f"[INFO] Requeueing interrupted job {row['id']}")
+            emit(row["id"], "status", {"status": "queued", "recovered": True})
+            _get_executor().submit(_run, row["id"])
+            recovered.append(row["id"])
+    return recovered
+
+
+def get_job(job_id):
+    row = _conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = {
+        "job_id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "params": json.loads(row["params"]),
+        "progress": json.loads(row["progress"]) if row["progress"] else None,
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+    if row["result"]:
+        job["result"] = json.loads(row["result"])
+    if row["error"]:
+        job["error"] = row["error"]
+    return job
+
+
+def events_since(job_id, after_seq=0):
+    rows = _conn().execute(
+        "SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+        (job_id, after_seq),
+    ).fetchall()
+    return [(row["seq"], row["event"], json.loads(row["data"])) for row in rows]
+
+
+def stream_events(job_id, after_seq=0, poll_seconds=1.0):
+    """Yield (seq, event, data) as they are recorded, until the job finishes"""
+    while True:
+        for seq, event, data in events_since(job_id, after_seq):
+            after_seq = seq
+            yield seq, event, data
+        job = get_job(job_id)
+        if job is None:
+            return
+        if job["status"] in FINISHED_STATES:
+            # Drain anything written between the two reads
+            for item in events_since(job_id, after_seq):
+                yield item
+            return
+        # Woken early by this process; polling covers other workers
+        with _changed:
+            _changed.wait(poll_seconds)
+
+
+async def astream_events(job_id, after_seq=0, poll_seconds=0.5):
+    """stream_events for the event loop; polls instead of holding a thread on the condition"""
+    while True:
+        for seq, event, data in events_since(job_id, after_seq):
+            after_seq = seq
+            yield seq, event, data
+        job = get_job(job_id)
+        if job is None:
+            return
+        if job["status"] in FINISHED_STATES:
+            for item in events_since(job_id, after_seq):
+                yield item
+            return
+        await asyncio.sleep(poll_seconds)
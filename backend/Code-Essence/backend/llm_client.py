@@ -0,0 +1,371 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from dotenv import load_dotenv
+import metrics
+from concurrency import TokenBucket, acall_with_backoff, call_with_backoff, is_throttling_error
+
+load_dotenv()
+
+MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-5-sonnet-20240620-v1:0")
+AWS_REGION = os.getenv("AWS_REGION") or "us-east-1"
+# "bedrock" or "fake" (deterministic offline model for load tests)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "bedrock").lower()
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0"))
+
+# botocore connection pool and retry settings
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", "50"))
+BEDROCK_CLIENT_ATTEMPTS = int(os.getenv("BEDROCK_CLIENT_ATTEMPTS", "4"))
+BEDROCK_CONNECT_TIMEOUT = float(os.getenv("BEDROCK_CONNECT_TIMEOUT", "10"))
+BEDROCK_READ_TIMEOUT = float(os.getenv("BEDROCK_READ_TIMEOUT", "120"))
+
+# Application-level limits on top of botocore's own retries
+BEDROCK_REQUESTS_PER_SECOND = float(os.getenv("BEDROCK_REQUESTS_PER_SECOND", "5"))
+BEDROCK_MAX_RETRIES = int(os.getenv("BEDROCK_MAX_RETRIES", "5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+rate_limiter = TokenBucket(BEDROCK_REQUESTS_PER_SECOND)
+
+_client = None
+_models = {}
+_slots = {}
+_async_slots = {}
+_breakers = {}
+_lock = threading.Lock()
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a model that keeps failing"""
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for
+    `cooldown` seconds; then one trial call decides whether it closes again.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def before(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial:
+                raise CircuitOpenError("LLM circuit open after repeated failures")
+            self.trial = True
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    print(f"[WARN] LLM circuit opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if self.trial else "open"
+
+
+FakeMessage = namedtuple("FakeMessage", ["content", "usage_metadata"], defaults=(None,))
+
+
+class FakeChatModel:
+    """
+    Offline stand-in for ChatBedrock: deterministic answers derived from the
+    prompt after an optional fixed latency. Batched prompts get a JSON object
+    keyed by every file id so the batching path is exercised too.
+    """
+
+    FILE_ID = re.compile(r"^\s*id: (F\d+)\s*$", re.MULTILINE)
+
+    def __init__(self, model_id=MODEL_ID, latency=FAKE_LLM_LATENCY):
+        self.model_id = model_id
+        self.latency = latency
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.lock = threading.Lock()
+
+    def _answer(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._compose(prompt)
+
+    def _compose(self, prompt):
+        from chunking import count_tokens
+
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+        file_ids = self.FILE_ID.findall(prompt)
+        if file_ids:
+            answer = json.dumps({file_id: f"Summary {digest} of {file_id}." for file_id in file_ids})
+        else:
+            answer = f"Summary {digest} of a {len(prompt)} character prompt."
+        with self.lock:
+            self.calls += 1
+            self.prompt_tokens += count_tokens(prompt)
+            self.completion_tokens += count_tokens(answer)
+        return answer
+
+    def usage(self):
+        with self.lock:
+            return {
+                "llm_calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
+
+    def _usage(self, prompt, answer):
+        from chunking import count_tokens
+        return {"input_tokens": count_tokens(prompt), "output_tokens": count_tokens(answer)}
+
+    def invoke(self, prompt):
+        prompt = str(prompt)
+        answer = self._answer(prompt)
+        return FakeMessage(answer, self._usage(prompt, answer))
+
+    async def ainvoke(self, prompt):
+        prompt = str(prompt)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        answer = self._compose(prompt)
+        return FakeMessage(answer, self._usage(prompt, answer))
+
+    def stream(self, prompt):
+        prompt = str(prompt)
+        answer = self._answer(prompt)
+        words = answer.split(" ")
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            yield FakeMessage(word + " ", self._usage(prompt, answer) if last else None)
+
+
+def get_bedrock_client():
+    """The process-wide bedrock-runtime client, built on first use"""
+    global _client
+    with _lock:
+        if _client is None:
+            import boto3
+            from botocore.config import Config
+
+            _client = boto3.client(
+                "bedrock-runtime",
+                region_name=AWS_REGION,
+                config=Config(
+                    max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS,
+                    retries={"mode": "adaptive", "max_attempts": BEDROCK_CLIENT_ATTEMPTS},
+                    connect_timeout=BEDROCK_CONNECT_TIMEOUT,
+                    read_timeout=BEDROCK_READ_TIMEOUT,
+                ),
+            )
+        return _client
+
+
+def get_llm(model_id=None):
+    """Chat model for model_id (default MODEL_ID), shared by every caller"""
+    model_id = model_id or MODEL_ID
+    with _lock:
+        model = _models.get(model_id)
+    if model is not None:
+        return model
+    if LLM_BACKEND == "fake":
+        model = FakeChatModel(model_id)
+    else:
+        from langchain_aws import ChatBedrock
+        model = ChatBedrock(client=get_bedrock_client(), model_id=model_id)
+    with _lock:
+        return _models.setdefault(model_id, model)
+
+
+def set_llm(model, model_id=None):
+    """Swap the model used for model_id, e.g. for a FakeChatModel in load tests"""
+    with _lock:
+        _models[model_id or MODEL_ID] = model
+
+
+def reset_clients():
+    """
+    Drop the boto3 client and models, e.g. in a freshly forked worker:
+    their connection pools must not be shared with the parent process.
+    """
+    global _client
+    with _lock:
+        _client = None
+        _models.clear()
+        _async_slots.clear()
+
+
+def _guards(model_id):
+    with _lock:
+        if model_id not in _slots:
+            _slots[model_id] = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+            _breakers[model_id] = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN)
+        return _slots[model_id], _breakers[model_id]
+
+
+def _check_breaker(model_id, breaker):
+    try:
+        breaker.before()
+    except CircuitOpenError:
+        _record_call(model_id, "rejected")
+        raise
+
+
+def invoke(prompt, model_id=None):
+    """
+    Call the model with rate limiting, a per-model concurrency cap, backoff
+    on throttling and a circuit breaker around repeated failures.
+    """
+    model_id = model_id or MODEL_ID
+    model = get_llm(model_id)
+    slots, breaker = _guards(model_id)
+    _check_breaker(model_id, breaker)
+
+    def _call():
+        rate_limiter.acquire()
+        with slots:
+            return model.invoke(prompt)
+
+    try:
+        with metrics.span("llm"):
+            response = call_with_backoff(_call, retries=BEDROCK_MAX_RETRIES)
+    except Exception as e:
+        breaker.failure()
+        _record_call(model_id, "error")
+        if is_throttling_error(e):
+            print(f"[WARN] {model_id} still throttled after {BEDROCK_MAX_RETRIES} retries")
+        raise
+    breaker.success()
+    _record_call(model_id, "ok", getattr(response, "usage_metadata", None))
+    return response
+
+
+def _async_guard(model_id):
+    # Event-loop tasks cannot wait on the threading semaphore, so they get
+    # their own LLM_MAX_CONCURRENCY slots
+    with _lock:
+        if model_id not in _async_slots:
+            _async_slots[model_id] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        return _async_slots[model_id]
+
+
+async def ainvoke(prompt, model_id=None):
+    """
+    invoke for the event loop, through the model's async client (langchain
+    falls back to its executor for models without one). Same rate limit,
+    breaker and throttling backoff; waiting never blocks other tasks.
+    """
+    model_id = model_id or MODEL_ID
+    model = get_llm(model_id)
+    slots = _async_guard(model_id)
+    breaker = _guards(model_id)[1]
+    _check_breaker(model_id, breaker)
+
+    async def _call():
+        await rate_limiter.acquire_async()
+        async with slots:
+            return await model.ainvoke(prompt)
+
+    try:
+        with metrics.span("llm"):
+            response = await acall_with_backoff(_call, retries=BEDROCK_MAX_RETRIES)
+    except Exception as e:
+        breaker.failure()
+        _record_call(model_id, "error")
+        if is_throttling_error(e):
+            print(f"[WARN] {model_id} still throttled after {BEDROCK_MAX_RETRIES} retries")
+        raise
+    breaker.success()
+    _record_call(model_id, "ok", getattr(response, "usage_metadata", None))
+    return response
+
+
+def _record_call(model_id, outcome, usage=None):
+    metrics.inc("llm_calls_total", help="Model calls by outcome", model=model_id, outcome=outcome)
+    for kind in ("input_tokens", "output_tokens"):
+        if usage and usage.get(kind):
+            metrics.inc("llm_tokens_total", usage[kind], help="Tokens reported by the model",
+                        model=model_id, kind=kind.split("_")[0])
+
+
+def _chunk_text(chunk):
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, list):
+        # Content blocks from the Converse streaming API
+        return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return content if isinstance(content, str) else str(content)
+
+
+def stream(prompt, model_id=None):
+    """
+    Yield the model's answer as text deltas. Limits, breaker and throttling
+    backoff match invoke; a request is only retried before its first delta.
+    """
+    model_id = model_id or MODEL_ID
+    model = get_llm(model_id)
+    slots, breaker = _guards(model_id)
+    _check_breaker(model_id, breaker)
+
+    def _open():
+        rate_limiter.acquire()
+        chunks = iter(model.stream(prompt))
+        return chunks, next(chunks, None)
+
+    usage = {}
+
+    def _usage(chunk):
+        for kind, value in (getattr(chunk, "usage_metadata", None) or {}).items():
+            if isinstance(value, int):
+                usage[kind] = usage.get(kind, 0) + value
+
+    # Settled in finally so a half-open trial always ends, including when the
+    # consumer stops early (GeneratorExit): the model was answering, so that
+    # counts as a success
+    outcome = "cancelled"
+    with slots, metrics.span("llm"):
+        try:
+            chunks, first = call_with_backoff(_open, retries=BEDROCK_MAX_RETRIES)
+            if first is not None:
+                _usage(first)
+                yield _chunk_text(first)
+                for chunk in chunks:
+                    _usage(chunk)
+                    yield _chunk_text(chunk)
+            outcome = "ok"
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            if outcome == "error":
+                breaker.failure()
+                _record_call(model_id, outcome)
+            else:
+                breaker.success()
+                _record_call(model_id, outcome, usage)
+
+
+def breaker_state(model_id=None):
+    return _guards(model_id or MODEL_ID)[1].state
@@ -0,0 +1,438 @@
+import json
+import os
+import posixpath
+from array import array
+from collections import deque
+import file_access
+import manifests
+import metrics
+import summary_cache
+
+try:
+    import ijson
+except ImportError:  # lockfiles are then loaded whole with json
+    ijson = None
+
+# Bump when parsing changes so cached lockfile graphs are recomputed
+LOCKGRAPH_VERSION = "1"
+# Lockfiles are streamed, so this only guards against pathological files
+MAX_LOCKFILE_BYTES = int(os.getenv("MAX_LOCKFILE_BYTES", str(256 * 1024 ** 2)))
+DEFAULT_MAX_PATHS = int(os.getenv("LOCKGRAPH_MAX_PATHS", "20"))
+
+LOCKFILES = {"package-lock.json": "npm", "npm-shrinkwrap.json": "npm", "poetry.lock": "poetry"}
+# Manifest next to a lockfile that lists the project's direct dependencies
+ROOT_MANIFESTS = {"npm": "package.json", "poetry": "pyproject.toml"}
+NPM_DEP_FIELDS = ("dependencies", "optionalDependencies", "peerDependencies")
+
+_store = None
+
+
+class _Interner:
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.ids = {value: i for i, value in enumerate(self.values)}
+
+    def id(self, value):
+        found = self.ids.get(value)
+        if found is None:
+            found = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return found
+
+
+class GraphBuilder:
+    """Accumulates nodes and edges as flat arrays, then packs them into a DepGraph"""
+
+    def __init__(self):
+        self.names = _Interner()
+        self.versions = _Interner([""])
+        self.name_ids = array("i")
+        self.version_ids = array("i")
+        self.dev = array("b")
+        self.sources = array("i")
+        self.targets = array("i")
+
+    def node(self, name, version="", dev=False):
+        self.name_ids.append(self.names.id(name))
+        self.version_ids.append(self.versions.id(version or ""))
+        self.dev.append(1 if dev else 0)
+        return len(self.name_ids) - 1
+
+    def edge(self, source, target):
+        self.sources.append(source)
+        self.targets.append(target)
+
+    def build(self):
+        count = len(self.name_ids)
+        offsets = array("i", [0]) * (count + 1)
+        for source in self.sources:
+            offsets[source + 1] += 1
+        for i in range(count):
+            offsets[i + 1] += offsets[i]
+        targets = array("i", [0]) * len(self.sources)
+        cursor = array("i", offsets[:count])
+        for source, target in zip(self.sources, self.targets):
+            targets[cursor[source]] = target
+            cursor[source] += 1
+        # Sort and drop duplicate edges per node
+        packed, packed_offsets = array("i"), array("i", [0])
+        for i in range(count):
+            packed.extend(sorted(set(targets[offsets[i]:offsets[i + 1]])))
+            packed_offsets.append(len(packed))
+        return DepGraph(self.names.values, self.versions.values, self.name_ids, self.version_ids,
+                        self.dev, packed_offsets, packed)
+
+
+class DepGraph:
+    """
+    Dependency graph in compressed sparse row form: node i's dependencies
+    are targets[offsets[i]:offsets[i + 1]]. Node 0 is the project root.
+    Names and versions are interned; per-node data lives in int arrays.
+    """
+
+    def __init__(self, names, versions, name_ids, version_ids, dev, offsets, targets):
+        self.names = names
+        self.versions = versions
+        self.name_ids = name_ids
+        self.version_ids = version_ids
+        self.dev = dev
+        self.offsets = offsets
+        self.targets = targets
+        self._reverse = None
+
+    def __len__(self):
+        return len(self.name_ids)
+
+    def name(self, node):
+        return self.names[self.name_ids[node]]
+
+    def version(self, node):
+        return self.versions[self.version_ids[node]]
+
+    def deps(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def find(self, name):
+        """Nodes called name, trying its PEP 503 form for Python packages"""
+        for candidate in (name, manifests.normalize_python(name)):
+            if candidate in self.names:
+                name_id = self.names.index(candidate)
+                return [node for node, found in enumerate(self.name_ids) if found == name_id]
+        return []
+
+    def depths(self, max_depth=None, include_dev=True):
+        """BFS depth of every node from the root (-1 when unreachable within the limits)"""
+        depth = array("i", [-1]) * len(self)
+        depth[0] = 0
+        queue = deque([0])
+        while queue:
+            node = queue.popleft()
+            if max_depth is not None and depth[node] >= max_depth:
+                continue
+            for target in self.deps(node):
+                if depth[target] < 0 and (include_dev or not self.dev[target]):
+                    depth[target] = depth[node] + 1
+                    queue.append(target)
+        return depth
+
+    def reverse(self):
+        """(offsets, sources) CSR of the reversed edges, built once"""
+        if self._reverse is None:
+            count = len(self)
+            offsets = array("i", [0]) * (count + 1)
+            for target in self.targets:
+                offsets[target + 1] += 1
+            for i in range(count):
+                offsets[i + 1] += offsets[i]
+            sources = array("i", [0]) * len(self.targets)
+            cursor = array("i", offsets[:count])
+            for node in range(count):
+                for target in self.deps(node):
+                    sources[cursor[target]] = node
+                    cursor[target] += 1
+            self._reverse = (offsets, sources)
+        return self._reverse
+
+    def paths_to(self, nodes, depth, limit=DEFAULT_MAX_PATHS):
+        """Up to limit shortest root-to-node paths (node lists) given depths()"""
+        offsets, sources = self.reverse()
+        paths = []
+        stack = [[node] for node in sorted(nodes, key=lambda n: depth[n]) if depth[node] >= 0]
+        while stack and len(paths) < limit:
+            path = stack.pop()
+            head = path[-1]
+            if head == 0:
+                paths.append(path[::-1])
+                continue
+            for parent in sources[offsets[head]:offsets[head + 1]]:
+                if depth[parent] == depth[head] - 1:
+                    stack.append(path + [parent])
+        return paths
+
+    def to_compact(self, keep=None, depth=None):
+        """
+        JSON-ready form restricted to the nodes in keep (all when None),
+        renumbered densely with the root first:
+
+            {"names": [...], "versions": [...],       interned strings
+             "name": [...], "version": [...],         per-node indexes into them
+             "dev": [...], "depth": [...],            dev node ids, per-node depth
+             "offsets": [...], "targets": [...]}      CSR edges
+        """
+        order = range(len(self)) if keep is None else sorted(keep)
+        remap = {node: i for i, node in enumerate(order)}
+        names, versions = _Interner(), _Interner()
+        compact = {"name": [], "version": [], "dev": [], "offsets": [0], "targets": []}
+        for i, node in enumerate(order):
+            compact["name"].append(names.id(self.name(node)))
+            compact["version"].append(versions.id(self.version(node)))
+            if self.dev[node]:
+                compact["dev"].append(i)
+            compact["targets"].extend(remap[t] for t in self.deps(node) if t in remap)
+            compact["offsets"].append(len(compact["targets"]))
+        compact["names"] = names.values
+        compact["versions"] = versions.values
+        if depth is not None:
+            compact["depth"] = [depth[node] for node in order]
+        return compact
+
+    @classmethod
+    def from_compact(cls, compact):
+        dev = array("b", [0]) * len(compact["name"])
+        for node in compact["dev"]:
+            dev[node] = 1
+        return cls(compact["names"], compact["versions"], array("i", compact["name"]),
+                   array("i", compact["version"]), dev, array("i", compact["offsets"]),
+                   array("i", compact["targets"]))
+
+
+def _npm_packages(path):
+    """(install path, entry) pairs of a package-lock, streamed when ijson is available"""
+    if ijson is not None:
+        with open(path, "rb") as f:
+            found = False
+            for key, info in ijson.kvitems(f, "packages"):
+                found = True
+                yield key, info
+        if found:
+            return
+        with open(path, "rb") as f:
+            for name, info in ijson.kvitems(f, "dependencies"):
+                yield from _npm_v1_entries(f"node_modules/{name}", info)
+        return
+    with open(path, "rb") as f:
+        lock = json.load(f)
+    if lock.get("packages"):
+        yield from lock["packages"].items()
+        return
+    for name, info in (lock.get("dependencies") or {}).items():
+        yield from _npm_v1_entries(f"node_modules/{name}", info)
+
+
+def _npm_v1_entries(install_path, info):
+    """lockfileVersion 1 nests entries; flatten them into v2-style install paths"""
+    yield install_path, {
+        "version": info.get("version"),
+        "dev": info.get("dev", False),
+        "dependencies": info.get("requires") or {},
+    }
+    for name, child in (info.get("dependencies") or {}).items():
+        yield from _npm_v1_entries(f"{install_path}/node_modules/{name}", child)
+
+
+def _npm_resolve(install_path, name, index_of):
+    """Node's lookup: the nearest node_modules/name at or above install_path"""
+    base = install_path
+    while True:
+        candidate = f"{base}/node_modules/{name}" if base else f"node_modules/{name}"
+        if candidate in index_of:
+            return index_of[candidate]
+        if not base:
+            return None
+        cut = base.rfind("/node_modules/")
+        base = base[:cut] if cut >= 0 else ""
+
+
+def parse_npm(path, root_deps=None):
+    """DepGraph of a package-lock.json or npm-shrinkwrap.json"""
+    builder = GraphBuilder()
+    builder.node("")
+    index_of, requires, links = {"": 0}, [()], {}
+    for install_path, info in _npm_packages(path):
+        if install_path == "":
+            root_deps = [n for field in NPM_DEP_FIELDS + ("devDependencies",) for n in (info.get(field) or {})]
+            continue
+        if info.get("link"):
+            links[install_path] = info.get("resolved", "")
+            continue
+        name = info.get("name") or install_path.rsplit("node_modules/", 1)[-1]
+        index_of[install_path] = builder.node(name, str(info.get("version") or ""), bool(info.get("dev")))
+        requires.append(tuple(n for field in NPM_DEP_FIELDS for n in (info.get(field) or {})))
+    # Workspace links point node_modules/<name> at the package's own folder
+    for install_path, resolved in links.items():
+        if resolved in index_of:
+            index_of[install_path] = index_of[resolved]
+    paths = [""] + [p for p in index_of if p and p not in links]
+    for install_path in paths:
+        source = index_of[install_path]
+        names = (root_deps or []) if source == 0 else requires[source]
+        for name in names:
+            target = _npm_resolve("" if source == 0 else install_path, name, index_of)
+            if target is not None:
+                builder.edge(source, target)
+    if root_deps is None:  # lockfileVersion 1 without package.json: top-level installs
+        for install_path, node in index_of.items():
+            if install_path.count("node_modules/") == 1 and install_path not in links:
+                builder.edge(0, node)
+    return builder.build()
+
+
+def _poetry_packages(path):
+    """Streams [[package]] tables of a poetry.lock line by line"""
+    current, section = None, None
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for raw in f:
+            line = raw.strip()
+            if line == "[[package]]":
+                if current is not None:
+                    yield current
+                current, section = {"name": "", "version": "", "dev": False, "deps": []}, "package"
+                continue
+            if line.startswith("["):
+                section = line.strip("[]")
+                continue
+            if current is None or not line or line.startswith("#"):
+                continue
+            key, sep, value = line.partition("=")
+            if not sep:
+                continue
+            key, value = key.strip().strip('"'), value.strip()
+            if section == "package":
+                if key in ("name", "version"):
+                    current[key] = value.strip('"')
+                elif key == "category":
+                    current["dev"] = value.strip('"') == "dev"
+            elif section == "package.dependencies":
+                current["deps"].append(manifests.normalize_python(key))
+    if current is not None:
+        yield current
+
+
+def parse_poetry(path, root_deps=None):
+    """DepGraph of a poetry.lock; one version per package name"""
+    builder = GraphBuilder()
+    builder.node("")
+    by_name, requires = {}, [()]
+    for package in _poetry_packages(path):
+        name = manifests.normalize_python(package["name"])
+        by_name[name] = builder.node(name, package["version"], package["dev"])
+        requires.append(tuple(package["deps"]))
+    required = set()
+    for source in range(1, len(requires)):
+        for name in requires[source]:
+            if name in by_name:
+                builder.edge(source, by_name[name])
+                required.add(by_name[name])
+    if root_deps is None:  # no pyproject.toml: whatever nothing else depends on
+        root_deps = [name for name, node in by_name.items() if node not in required]
+    for name in root_deps:
+        if name in by_name:
+            builder.edge(0, by_name[name])
+    return builder.build()
+
+
+def _root_deps(index, lock_entry, kind):
+    """Direct dependency names from the manifest beside a lockfile, or None"""
+    manifest = index.by_path.get(posixpath.join(lock_entry.dir, ROOT_MANIFESTS[kind]))
+    if manifest is None:
+        return None
+    parser = manifests.parse_package_json if kind == "npm" else manifests.parse_pyproject
+    text = file_access.read_text(index.abspath(manifest.path), max_bytes=file_access.MAX_MANIFEST_BYTES,
+                                 skip_generated=False)
+    if not text:
+        return None
+    try:
+        return [name for name, _, _ in parser(text)["deps"]]
+    except Exception as e:
+        print(f"[WARN] Cannot parse {manifest.path}: {e}")
+        return None
+
+
+def _get_store():
+    global _store
+    if _store is None and summary_cache.SUMMARY_CACHE_BACKEND != "none":
+        _store = summary_cache.SQLiteStore(summary_cache.SUMMARY_CACHE_PATH, table="lock_graphs")
+    return _store
+
+
+def lockfile_graph(index, entry, kind):
+    """DepGraph for one lockfile, cached by the blob SHAs of it and its manifest"""
+    store = _get_store()
+    manifest = index.by_path.get(posixpath.join(entry.dir, ROOT_MANIFESTS[kind]))
+    key = f"{entry.sha}|{manifest.sha if manifest else '-'}|{LOCKGRAPH_VERSION}"
+    cached = store.get(key) if store and entry.sha else None
+    if cached is not None:
+        return DepGraph.from_compact(json.loads(cached))
+    if not file_access.admit(entry.name, entry.size, max_bytes=MAX_LOCKFILE_BYTES, skip_generated=False):
+        return None
+    root_deps = _root_deps(index, entry, kind)
+    parse = parse_npm if kind == "npm" else parse_poetry
+    try:
+        graph = parse(index.abspath(entry.path), root_deps)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Cannot parse {entry.path}: {e}")
+        return None
+    if store and entry.sha:
+        store.set(key, json.dumps(graph.to_compact()))
+    return graph
+
+
+def build(index):
+    """
+    One DepGraph over every lockfile in the checkout. Node 0 is "project";
+    a lockfile below the root gets a "project:<dir>" node under it.
+    """
+    lockfiles = [(entry, LOCKFILES[entry.name])
+                 for entry in file_access.iter_files(index, manifests.PROJECT_SKIP_DIRS)
+                 if entry.name in LOCKFILES]
+    builder = GraphBuilder()
+    builder.node("project")
+    with metrics.span("lockfile_parse"):
+        for entry, kind in lockfiles:
+            graph = lockfile_graph(index, entry, kind)
+            if graph is None:
+                continue
+            root = 0 if not entry.dir else builder.node(f"project:{entry.dir}")
+            if root:
+                builder.edge(0, root)
+            base = len(builder.name_ids) - 1
+            for node in range(1, len(graph)):
+                builder.node(graph.name(node), graph.version(node), graph.dev[node])
+            for node in range(len(graph)):
+                source = root if node == 0 else base + node
+                for target in graph.deps(node):
+                    builder.edge(source, base + target)
+    graph = builder.build()
+    print(f"[INFO] Lockfile graph: {len(lockfiles)} lockfiles, {len(graph)} nodes, {len(graph.targets)} edges")
+    return graph, [entry.path for entry, _ in lockfiles]
+
+
+def query(graph, depth=None, include_dev=True, package=None, max_paths=DEFAULT_MAX_PATHS):
+    """
+    Compact subgraph of graph: nodes within depth of the root (depth=1 is
+    direct dependencies only), dev-only dependencies dropped unless
+    include_dev, and with package, only the nodes on up to max_paths
+    shortest paths from the root to it (returned as "paths" of node ids).
+    """
+    depths = graph.depths(depth, include_dev)
+    result = {}
+    if package:
+        paths = graph.paths_to(graph.find(package), depths, max_paths)
+        keep = sorted({node for path in paths for node in path} | {0})
+        remap = {node: i for i, node in enumerate(keep)}
+        result["paths"] = [[remap[node] for node in path] for path in paths]
+    else:
+        keep = [node for node in range(len(graph)) if depths[node] >= 0]
+    result["graph"] = graph.to_compact(keep, depths)
+    result["stats"] = {"nodes": len(graph), "edges": len(graph.targets), "returned": len(keep)}
+    return result
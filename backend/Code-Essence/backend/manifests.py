@@ -0,0 +1,377 @@
+import json
+import os
+import posixpath
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import yaml
+import file_access
+import metrics
+import summary_cache
+from scanner import PROJECT_SKIP_DIRS
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+# Bump when parsing changes so cached results are recomputed
+MANIFEST_PARSER_VERSION = "2"
+MANIFEST_WORKERS = int(os.getenv("MANIFEST_WORKERS", str(min(4, os.cpu_count() or 2))))
+# Below this many uncached manifests parsing stays in-process
+MANIFEST_POOL_MIN_FILES = int(os.getenv("MANIFEST_POOL_MIN_FILES", "16"))
+
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# File name -> (parser kind, ecosystem); requirements*.txt and k8s YAML are matched separately
+MANIFESTS = {
+    "package.json": ("package_json", "node"),
+    "package-lock.json": ("package_lock", "node"),
+    "pyproject.toml": ("pyproject", "python"),
+    "Pipfile": ("pipfile", "python"),
+    "poetry.lock": ("poetry_lock", "python"),
+    "go.mod": ("go_mod", "go"),
+}
+# Package node ids are "<registry>:<name>" so one name in two ecosystems stays two nodes
+REGISTRIES = {"node": "npm", "python": "pypi", "go": "go"}
+REQUIREMENTS = re.compile(r"^requirements[\w.-]*\.(?:txt|in)$", re.IGNORECASE)
+# name, extras, rest of a PEP 508 requirement
+REQUIREMENT = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?\s*(.*)$")
+# Per-requirement pip options (--hash, --config-settings, ...) trailing a requirement
+PIP_OPTIONS = re.compile(r"\s--[A-Za-z].*$")
+
+_pool = None
+_pool_lock = threading.Lock()
+_store = None
+
+
+def manifest_kind(name):
+    """(parser kind, ecosystem) for a file name, or None when it is not a manifest"""
+    if name in MANIFESTS:
+        return MANIFESTS[name]
+    if REQUIREMENTS.match(name):
+        return "requirements", "python"
+    if name.lower().endswith((".yaml", ".yml")):
+        return "k8s", "k8s"
+    return None
+
+
+def normalize_python(name):
+    """PEP 503 form of a Python distribution name"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _requirement(text):
+    """(name, spec) for one PEP 508 string, or None"""
+    match = REQUIREMENT.match(text.split(";", 1)[0].strip())
+    if not match:
+        return None
+    return normalize_python(match.group(1)), match.group(3).strip()
+
+
+def parse_requirements(text):
+    """
+    {"deps": [[name, spec, scope]], "includes": [path]} from a pip
+    requirements file: comments, line continuations, extras, markers,
+    per-requirement options such as --hash, editable/URL requirements and
+    -r/-c includes are handled.
+    """
+    deps, includes = [], []
+    for line in re.sub(r"\\\r?\n", " ", text).splitlines():
+        line = re.sub(r"(^|\s)#.*$", "", line).strip()
+        if not line:
+            continue
+        if line.startswith(("-r", "--requirement", "-c", "--constraint")):
+            target = re.sub(r"^(?:-r|--requirement|-c|--constraint)[=\s]*", "", line).strip()
+            if target and not line.startswith(("-c", "--constraint")):
+                includes.append(target)
+            continue
+        if line.startswith(("-e", "--editable")) or "://" in line.split(" @ ", 1)[0]:
+            egg = re.search(r"#egg=([A-Za-z0-9._-]+)", line)
+            if egg:
+                deps.append([normalize_python(egg.group(1)), line.split("#", 1)[0].split()[-1], "main"])
+            continue
+        if line.startswith("-"):
+            continue  # --index-url, --hash and other pip options
+        parsed = _requirement(PIP_OPTIONS.sub("", line))
+        if parsed:
+            deps.append([parsed[0], parsed[1], "main"])
+    return {"deps": deps, "includes": includes}
+
+
+def _toml_spec(value):
+    if isinstance(value, dict):
+        return value.get("version") or value.get("git") or value.get("path") or "*"
+    return str(value)
+
+
+def parse_pyproject(text):
+    doc = tomllib.loads(text)
+    deps = []
+    project = doc.get("project", {})
+    for spec in project.get("dependencies", []):
+        parsed = _requirement(spec)
+        if parsed:
+            deps.append([parsed[0], parsed[1], "main"])
+    for specs in project.get("optional-dependencies", {}).values():
+        for spec in specs:
+            parsed = _requirement(spec)
+            if parsed:
+                deps.append([parsed[0], parsed[1], "optional"])
+    poetry = doc.get("tool", {}).get("poetry", {})
+    groups = [("main", poetry.get("dependencies", {})), ("dev", poetry.get("dev-dependencies", {}))]
+    groups += [(name, group.get("dependencies", {})) for name, group in poetry.get("group", {}).items()]
+    for scope, table in groups:
+        for name, value in table.items():
+            if name.lower() != "python":
+                deps.append([normalize_python(name), _toml_spec(value), scope])
+    return {"deps": deps}
+
+
+def parse_pipfile(text):
+    doc = tomllib.loads(text)
+    deps = []
+    for section, scope in (("packages", "main"), ("dev-packages", "dev")):
+        for name, value in doc.get(section, {}).items():
+            deps.append([normalize_python(name), _toml_spec(value), scope])
+    return {"deps": deps}
+
+
+def parse_poetry_lock(text):
+    doc = tomllib.loads(text)
+    return {"resolved": {normalize_python(p["name"]): p.get("version") for p in doc.get("package", [])
+                         if "name" in p}}
+
+
+def parse_package_json(text):
+    pkg = json.loads(text)
+    deps = []
+    for section, scope in (("dependencies", "main"), ("devDependencies", "dev"),
+                           ("peerDependencies", "peer"), ("optionalDependencies", "optional")):
+        for name, spec in (pkg.get(section) or {}).items():
+            deps.append([name, str(spec), scope])
+    return {"deps": deps}
+
+
+def parse_package_lock(text):
+    """Resolved versions of the packages installed at the top of node_modules"""
+    lock = json.loads(text)
+    resolved = {}
+    for path, info in (lock.get("packages") or {}).items():
+        if path.startswith("node_modules/") and "/node_modules/" not in path:
+            resolved[path[len("node_modules/"):]] = info.get("version")
+    if not resolved:  # lockfileVersion 1
+        resolved = {name: info.get("version") for name, info in (lock.get("dependencies") or {}).items()}
+    return {"resolved": resolved}
+
+
+def parse_go_mod(text):
+    deps, in_block = [], False
+    for line in text.splitlines():
+        line, _, comment = line.partition("//")
+        line = line.strip()
+        if in_block:
+            if line == ")":
+                in_block = False
+                continue
+            fields = line.split()
+        elif line.startswith("require"):
+            rest = line[len("require"):].strip()
+            if rest == "(":
+                in_block = True
+                continue
+            fields = rest.split()
+        else:
+            continue
+        if len(fields) >= 2:
+            scope = "indirect" if "indirect" in comment else "main"
+            deps.append([fields[0], fields[1], scope])
+    return {"deps": deps, "resolved": {name: version for name, version, _ in deps}}
+
+
+def parse_k8s(text):
+    resources = []
+    for doc in yaml.load_all(text, Loader=YAML_LOADER):
+        if isinstance(doc, dict) and doc.get("kind") and doc.get("apiVersion"):
+            resources.append([doc["kind"], (doc.get("metadata") or {}).get("name", "unknown")])
+    return {"resources": resources}
+
+
+PARSERS = {
+    "requirements": parse_requirements,
+    "pyproject": parse_pyproject,
+    "pipfile": parse_pipfile,
+    "poetry_lock": parse_poetry_lock,
+    "package_json": parse_package_json,
+    "package_lock": parse_package_lock,
+    "go_mod": parse_go_mod,
+    "k8s": parse_k8s,
+}
+
+
+def parse_manifest(args):
+    """
+    Process-pool worker: (abs_path, rel_path, kind) -> (rel_path, parsed or None).
+    The file was charged to the request with file_access.admit beforehand.
+    """
+    abs_path, rel_path, kind = args
+    if kind in ("pyproject", "pipfile", "poetry_lock") and tomllib is None:
+        return rel_path, None
+    text = file_access.read_text(abs_path, max_bytes=file_access.MAX_MANIFEST_BYTES,
+                                 skip_generated=False, account=False)
+    if text is None:
+        return rel_path, None
+    try:
+        return rel_path, PARSERS[kind](text)
+    except Exception as e:
+        print(f"[WARN] Cannot parse {rel_path}: {e}")
+        return rel_path, None
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MANIFEST_WORKERS)
+        return _pool
+
+
+def _get_store():
+    global _store
+    if _store is None and summary_cache.SUMMARY_CACHE_BACKEND != "none":
+        _store = summary_cache.SQLiteStore(summary_cache.SUMMARY_CACHE_PATH, table="manifest_deps")
+    return _store
+
+
+def _cache_key(sha, kind):
+    return f"{sha}|{kind}|{MANIFEST_PARSER_VERSION}"
+
+
+def find_manifests(index):
+    """[(entry, kind, ecosystem)] for every manifest outside vendored and ignored trees"""
+    found = []
+    for entry in file_access.iter_files(index, PROJECT_SKIP_DIRS):
+        kind = manifest_kind(entry.name)
+        if kind:
+            found.append((entry, *kind))
+    return found
+
+
+def parse_all(index, jobs):
+    """{rel_path: parsed} for (entry, kind) jobs, using the per-blob cache"""
+    store = _get_store()
+    results, misses = {}, []
+    for entry, kind in jobs:
+        cached = store.get(_cache_key(entry.sha, kind)) if store and entry.sha else None
+        if cached is not None:
+            results[entry.path] = json.loads(cached)
+        elif file_access.admit(entry.name, entry.size, max_bytes=file_access.MAX_MANIFEST_BYTES,
+                               skip_generated=False):
+            misses.append((entry, kind))
+
+    work = [(index.abspath(entry.path), entry.path, kind) for entry, kind in misses]
+    if len(work) >= MANIFEST_POOL_MIN_FILES:
+        parsed = _get_pool().map(parse_manifest, work, chunksize=8)
+    else:
+        parsed = map(parse_manifest, work)
+    keys = {entry.path: _cache_key(entry.sha, kind) for entry, kind in misses if entry.sha}
+    for rel_path, result in parsed:
+        if result is None:
+            continue
+        results[rel_path] = result
+        if store and rel_path in keys:
+            store.set(keys[rel_path], json.dumps(result))
+    return results
+
+
+def _project_of(directory, projects):
+    """Nearest enclosing project directory ("" for the root)"""
+    while directory and directory not in projects:
+        directory = posixpath.dirname(directory)
+    return directory
+
+
+def build_graph(index):
+    """
+    Dependency graph from every manifest in one scan of the checkout.
+
+    Each directory holding a dependency manifest becomes a project node
+    ("project" for the root, "project:<dir>" below it, linked from the
+    root). Packages are nodes "<registry>:<name>" (npm:redis, pypi:redis)
+    labelled with their "name", linked once per project with the declared
+    "spec", the lockfile's "version" when there is one, and a "scope" (main,
+    dev, optional, peer, indirect). k8s resources hang off the nearest project.
+    """
+    manifests = find_manifests(index)
+    with metrics.span("manifest_parse"):
+        parsed = parse_all(index, [(entry, kind) for entry, kind, _ in manifests])
+        # -r includes outside the requirements*.txt naming scheme
+        extra = []
+        for entry, kind, _ in manifests:
+            for target in (parsed.get(entry.path) or {}).get("includes", []):
+                path = posixpath.normpath(posixpath.join(entry.dir, target))
+                if path not in parsed and path in index.by_path:
+                    extra.append((index.by_path[path], "requirements"))
+        parsed.update(parse_all(index, extra))
+
+    projects = {entry.dir for entry, kind, _ in manifests if kind != "k8s" and entry.path in parsed}
+    resolved = {}  # (project, ecosystem) -> {name: version}
+    for entry, kind, ecosystem in manifests:
+        versions = (parsed.get(entry.path) or {}).get("resolved")
+        if versions:
+            resolved.setdefault((entry.dir, ecosystem), {}).update(versions)
+
+    nodes, links = {"project": {"id": "project", "group": "root"}}, {}
+
+    def project_node(directory):
+        if not directory:
+            return "project"
+        node_id = f"project:{directory}"
+        if node_id not in nodes:
+            nodes[node_id] = {"id": node_id, "group": "project"}
+            links[("project", node_id)] = {"source": "project", "target": node_id}
+        return node_id
+
+    def add_deps(directory, ecosystem, deps):
+        source = project_node(directory)
+        lock = resolved.get((directory, ecosystem), {})
+        for name, spec, scope in deps:
+            node_id = f"{REGISTRIES.get(ecosystem, ecosystem)}:{name}"
+            node = nodes.setdefault(node_id, {"id": node_id, "name": name, "group": ecosystem, "versions": set()})
+            link = links.setdefault((source, node_id), {"source": source, "target": node_id, "scope": scope})
+            if spec and spec != "*" and "spec" not in link:
+                link["spec"] = spec
+            version = lock.get(name)
+            if version:
+                link["version"] = version
+                node.setdefault("versions", set()).add(version)
+            elif spec and spec != "*":
+                node.setdefault("versions", set()).add(spec)
+            if scope == "main":
+                link["scope"] = "main"
+
+    for entry, kind, ecosystem in manifests:
+        result = parsed.get(entry.path)
+        if not result:
+            continue
+        if kind == "k8s":
+            source = project_node(_project_of(entry.dir, projects))
+            for resource_kind, name in result["resources"]:
+                node_id = f"{resource_kind}:{name}"
+                nodes.setdefault(node_id, {"id": node_id, "group": "k8s"})
+                links.setdefault((source, node_id), {"source": source, "target": node_id})
+            continue
+        deps = list(result.get("deps", []))
+        for target in result.get("includes", []):
+            included = parsed.get(posixpath.normpath(posixpath.join(entry.dir, target)))
+            if included:
+                deps += included.get("deps", [])
+        add_deps(entry.dir, ecosystem, deps)
+
+    for node in nodes.values():
+        if "versions" in node:
+            versions = node.pop("versions")
+            if versions:
+                node["versions"] = sorted(versions)
+    print(f"[INFO] Manifest graph: {len(manifests)} manifests, {len(nodes)} nodes, {len(links)} links")
+    return {"nodes": list(nodes.values()), "links": list(links.values())}
@@ -0,0 +1,195 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Latency samples kept per endpoint for percentile estimates
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "2048"))
+METRICS_PREFIX = "code_essence_"
+# Histogram buckets (seconds) for stage and request durations
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_latencies = {}
+_lock = threading.Lock()
+
+# name -> {sorted label items: value}
+_counters = {}
+# name -> {sorted label items: [bucket counts..., +Inf count, sum]}
+_histograms = {}
+_help = {}
+
+_trace = contextvars.ContextVar("code_essence_trace", default=None)
+
+
+def observe(name, seconds):
+    with _lock:
+        samples = _latencies.get(name)
+        if samples is None:
+            samples = _latencies[name] = deque(maxlen=LATENCY_WINDOW)
+        samples.append(seconds)
+
+
+def _percentile(ordered, fraction):
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def latency_stats(name=None):
+    """{name: {count, p50_ms, p99_ms, max_ms}} over the most recent samples"""
+    with _lock:
+        snapshot = {key: sorted(samples) for key, samples in _latencies.items()
+                    if name is None or key == name}
+    return {
+        key: {
+            "count": len(ordered),
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 1),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 1),
+            "max_ms": round(ordered[-1] * 1000, 1),
+        }
+        for key, ordered in snapshot.items() if ordered
+    }
+
+
+def timed(name):
+    """Decorator recording the wall time of every call under name"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class Trace:
+    """Per-request totals: time spent in each stage and counters such as tokens"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def add_stage(self, stage, seconds):
+        with self.lock:
+            total = self.stages.setdefault(stage, [0, 0.0])
+            total[0] += 1
+            total[1] += seconds
+
+    def add_count(self, name, value):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+                "stages": {stage: {"count": count, "ms": round(seconds * 1000, 1)}
+                           for stage, (count, seconds) in self.stages.items()},
+                "counts": dict(self.counts),
+            }
+
+    def server_timing(self):
+        """Value for the Server-Timing response header"""
+        with self.lock:
+            return ", ".join(f"{stage};dur={seconds * 1000:.1f}"
+                             for stage, (_, seconds) in self.stages.items())
+
+
+def start_trace():
+    """Begin collecting spans for the current request"""
+    trace = Trace()
+    _trace.set(trace)
+    return trace
+
+
+def end_trace():
+    _trace.set(None)
+
+
+def current_trace():
+    return _trace.get()
+
+
+def inc(name, value=1, help=None, **labels):
+    """Add value to counter name{labels}, and to the request's trace"""
+    key = tuple(sorted(labels.items()))
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+        if help:
+            _help.setdefault(name, help)
+    trace = _trace.get()
+    if trace is not None:
+        # A request talks to one model, so the trace leaves that label out
+        suffix = "".join(f".{v}" for k, v in key if k != "model")
+        trace.add_count(name + suffix, value)
+
+
+def observe_histogram(name, seconds, help=None, **labels):
+    key = tuple(sorted(labels.items()))
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        values = series.get(key)
+        if values is None:
+            values = series[key] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                values[i] += 1
+        values[len(BUCKETS)] += 1
+        values[-1] += seconds
+        if help:
+            _help.setdefault(name, help)
+
+
+@contextmanager
+def span(stage):
+    """Time a pipeline stage into the stage histogram and the request's trace"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe_histogram("stage_seconds", elapsed, help="Time spent per pipeline stage", stage=stage)
+        trace = _trace.get()
+        if trace is not None:
+            trace.add_stage(stage, elapsed)
+
+
+def _labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def render_prometheus():
+    """All counters and histograms in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            full = METRICS_PREFIX + name
+            if name in _help:
+                lines.append(f"# HELP {full} {_help[name]}")
+            lines.append(f"# TYPE {full} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{full}{_labels(key)} {value}")
+        for name, series in sorted(_histograms.items()):
+            full = METRICS_PREFIX + name
+            if name in _help:
+                lines.append(f"# HELP {full} {_help[name]}")
+            lines.append(f"# TYPE {full} histogram")
+            for key, values in sorted(series.items()):
+                for bound, count in zip(BUCKETS, values):
+                    lines.append(f"{full}_bucket{_labels(key, [('le', bound)])} {count}")
+                lines.append(f"{full}_bucket{_labels(key, [('le', '+Inf')])} {values[len(BUCKETS)]}")
+                lines.append(f"{full}_count{_labels(key)} {values[len(BUCKETS)]}")
+                lines.append(f"{full}_sum{_labels(key)} {values[-1]:.6f}")
+    return "\n".join(lines) + "\n"
@@ -1,7 +1,6 @@
 import os
 import tempfile
 import shutil
-from git import Repo
 from summarizer import summarize_repo
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
@@ -17,6 +16,8 @@ def push_summary_to_repo(repo_url, branch="main", summary_file="SUMMARY.md"):
                 f"https://{GITHUB_TOKEN}@github.com"
             )
 
+        from git import Repo  # GitPython is only needed here
+
         print(f"[INFO] Cloning {repo_url}...")
         repo = Repo.clone_from(url, temp_dir, branch=branch)
 
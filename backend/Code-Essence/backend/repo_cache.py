@@ -0,0 +1,555 @@
+import asyncio
+import base64
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dotenv import load_dotenv
+import metrics
+
+load_dotenv()
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+
+# Local mirror cache settings
+REPO_CACHE_DIR = os.getenv(
+    "REPO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "code-essence-repos")
+)
+REPO_CACHE_MAX_BYTES = int(os.getenv("REPO_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+REPO_CACHE_STALE_SECONDS = int(os.getenv("REPO_CACHE_STALE_SECONDS", "300"))
+
+FETCH_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+
+# Marker files kept inside every bare mirror
+FETCHED_STAMP = "code-essence-fetched"
+USED_STAMP = "code-essence-used"
+SIZE_FILE = "code-essence-size"
+
+_locks = {}
+_locks_guard = threading.Lock()
+_active = {}
+_active_guard = threading.Lock()
+
+
+def git_env():
+    """
+    Environment for git subprocesses. The GitHub token is sent as an
+    http.extraHeader through GIT_CONFIG_* variables, so it never lands on
+    a command line, in a stored config or in a CalledProcessError.
+    """
+    env = dict(os.environ)
+    if GITHUB_TOKEN:
+        index = int(env.get("GIT_CONFIG_COUNT") or 0)
+        credentials = base64.b64encode(f"x-access-token:{GITHUB_TOKEN}".encode()).decode()
+        env[f"GIT_CONFIG_KEY_{index}"] = "http.https://github.com/.extraheader"
+        env[f"GIT_CONFIG_VALUE_{index}"] = f"Authorization: Basic {credentials}"
+        env["GIT_CONFIG_COUNT"] = str(index + 1)
+    return env
+
+
+def redact(text):
+    """Mask the GitHub token in text bound for a log or a response"""
+    if not GITHUB_TOKEN or not isinstance(text, str):
+        return text
+    credentials = base64.b64encode(f"x-access-token:{GITHUB_TOKEN}".encode()).decode()
+    return text.replace(GITHUB_TOKEN, "***").replace(credentials, "***")
+
+
+def _redacted(error):
+    cmd = [redact(arg) for arg in error.cmd] if isinstance(error.cmd, list) else redact(error.cmd)
+    return subprocess.CalledProcessError(
+        error.returncode, cmd, output=redact(error.output), stderr=redact(error.stderr)
+    )
+
+
+def _git(*args, cwd=None):
+    try:
+        result = subprocess.run(
+            ["git", *args], cwd=cwd, env=git_env(), check=True, capture_output=True, text=True
+        )
+    except subprocess.CalledProcessError as e:
+        raise _redacted(e) from None
+    return result.stdout
+
+
+def mirror_path(repo_url):
+    """Location of the bare mirror for repo_url inside the cache dir"""
+    normalized = repo_url.strip().rstrip("/")
+    if normalized.endswith(".git"):
+        normalized = normalized[:-4]
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+    name = re.sub(r"[^A-Za-z0-9_.-]", "_", normalized.rsplit("/", 1)[-1])[:40]
+    return os.path.join(REPO_CACHE_DIR, f"{name}-{digest}.git")
+
+
+@contextmanager
+def _repo_lock(path):
+    """Serialize work on one mirror across threads and worker processes"""
+    with _locks_guard:
+        lock = _locks.setdefault(path, threading.Lock())
+    with lock:
+        os.makedirs(REPO_CACHE_DIR, exist_ok=True)
+        with open(path + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _touch(path):
+    with open(path, "a"):
+        pass
+    os.utime(path, None)
+
+
+def _stamp_age(path):
+    try:
+        return time.time() - os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _dir_size(path):
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                continue
+    return total
+
+
+def _record_size(path):
+    with open(os.path.join(path, SIZE_FILE), "w") as f:
+        f.write(str(_dir_size(path)))
+
+
+def _recorded_size(path):
+    try:
+        with open(os.path.join(path, SIZE_FILE)) as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return _dir_size(path)
+
+
+def ensure_mirror(repo_url, max_age=None):
+    """
+    Return the path of an up-to-date bare mirror of repo_url.
+    The mirror is cloned on first use and re-fetched once it is older than
+    max_age seconds (REPO_CACHE_STALE_SECONDS by default).
+    """
+    if max_age is None:
+        max_age = REPO_CACHE_STALE_SECONDS
+    path = mirror_path(repo_url)
+    changed = False
+    with _repo_lock(path):
+        if not os.path.isdir(path):
+            print(f"[INFO] Mirroring {repo_url} into cache")
+            partial = path + ".partial"
+            shutil.rmtree(partial, ignore_errors=True)
+            with metrics.span("git_clone"):
+                _git("clone", "--bare", "--quiet", repo_url, partial)
+            os.rename(partial, path)
+            _touch(os.path.join(path, FETCHED_STAMP))
+            changed = True
+        else:
+            age = _stamp_age(os.path.join(path, FETCHED_STAMP))
+            if age is None or age >= max_age:
+                print(f"[INFO] Fetching {repo_url} into cached mirror")
+                with metrics.span("git_fetch"):
+                    _git("fetch", "--prune", "--force", "--quiet",
+                         repo_url, *FETCH_REFSPECS, cwd=path)
+                _git("worktree", "prune", cwd=path)
+                _touch(os.path.join(path, FETCHED_STAMP))
+                changed = True
+        _touch(os.path.join(path, USED_STAMP))
+        if changed:
+            _record_size(path)
+    if changed:
+        evict()
+    return path
+
+
+def _in_use(path):
+    with _active_guard:
+        if _active.get(path):
+            return True
+    # Worktrees checked out by other processes still reference the mirror
+    worktrees = os.path.join(path, "worktrees")
+    return os.path.isdir(worktrees) and bool(os.listdir(worktrees))
+
+
+def evict(max_bytes=None):
+    """Drop least recently used mirrors until the cache fits in max_bytes"""
+    if max_bytes is None:
+        max_bytes = REPO_CACHE_MAX_BYTES
+    if not os.path.isdir(REPO_CACHE_DIR):
+        return []
+    mirrors = []
+    for entry in os.scandir(REPO_CACHE_DIR):
+        if entry.is_dir() and entry.name.endswith(".git"):
+            used = _stamp_age(os.path.join(entry.path, USED_STAMP)) or 0
+            mirrors.append((used, entry.path, _recorded_size(entry.path)))
+    total = sum(size for _, _, size in mirrors)
+    evicted = []
+    # Oldest use first
+    for _, path, size in sorted(mirrors, reverse=True):
+        if total <= max_bytes:
+            break
+        with _repo_lock(path):
+            if not os.path.isdir(path):
+                continue
+            try:
+                _git("worktree", "prune", cwd=path)
+            except subprocess.CalledProcessError:
+                pass
+            if _in_use(path):
+                continue
+            print(f"[INFO] Evicting cached mirror {os.path.basename(path)}")
+            shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        evicted.append(path)
+    return evicted
+
+
+def add_worktree(repo_url, dest_dir, ref=None, max_age=None):
+    """Check out ref (default HEAD) of repo_url into dest_dir as a detached worktree"""
+    path = ensure_mirror(repo_url, max_age=max_age)
+    with _repo_lock(path), metrics.span("git_checkout"):
+        _git("worktree", "add", "--detach", "--force", dest_dir, ref or "HEAD", cwd=path)
+    return path
+
+
+def remove_worktree(mirror, dest_dir):
+    try:
+        _git("worktree", "remove", "--force", dest_dir, cwd=mirror)
+    except (subprocess.CalledProcessError, OSError):
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        try:
+            _git("worktree", "prune", cwd=mirror)
+        except (subprocess.CalledProcessError, OSError):
+            pass
+
+
+@contextmanager
+def _pinned(mirror):
+    """Keep mirror from being evicted while in use"""
+    with _active_guard:
+        _active[mirror] = _active.get(mirror, 0) + 1
+    try:
+        yield
+    finally:
+        with _active_guard:
+            _active[mirror] -= 1
+            if not _active[mirror]:
+                del _active[mirror]
+
+
+@contextmanager
+def checkout(repo_url, ref=None, max_age=None):
+    """
+    Yield a temporary working tree of repo_url backed by the shared mirror.
+    The worktree is removed on exit; the mirror stays cached.
+    """
+    temp_dir = tempfile.mkdtemp(prefix="worktree-")
+    mirror = mirror_path(repo_url)
+    with _pinned(mirror):
+        try:
+            mirror = add_worktree(repo_url, temp_dir, ref=ref, max_age=max_age)
+            yield temp_dir
+        finally:
+            remove_worktree(mirror, temp_dir)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def resolve_head(repo_url, ref=None, max_age=None):
+    """Commit SHA that ref (default HEAD) of repo_url points to in the mirror"""
+    path = ensure_mirror(repo_url, max_age=max_age)
+    return _git("rev-parse", f"{ref or 'HEAD'}^{{commit}}", cwd=path).strip()
+
+
+def _parse_ls_tree(record):
+    meta, _, path = record.partition("\t")
+    fields = meta.split()
+    kind = fields[1]
+    size = fields[3] if len(fields) > 3 and fields[3].isdigit() else None
+    return {
+        "path": path,
+        "name": path.rsplit("/", 1)[-1],
+        "type": "dir" if kind == "tree" else ("submodule" if kind == "commit" else "file"),
+        "size": int(size) if size is not None else None,
+    }
+
+
+def _stream_ls_tree(git_dir, ref, path, recursive, with_sizes):
+    args = ["git", "ls-tree", "-z"]
+    if recursive:
+        args.append("-r")
+    if with_sizes:
+        args.append("-l")
+    args.append(ref)
+    if path:
+        args += ["--", path.rstrip("/") + "/"]
+    proc = subprocess.Popen(args, cwd=git_dir, env=git_env(), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        buffer = b""
+        for block in iter(lambda: proc.stdout.read(65536), b""):
+            buffer += block
+            *records, buffer = buffer.split(b"\0")
+            for record in records:
+                if record:
+                    yield _parse_ls_tree(record.decode("utf-8", errors="replace"))
+        if buffer:
+            yield _parse_ls_tree(buffer.decode("utf-8", errors="replace"))
+        if proc.wait() != 0:
+            raise _redacted(subprocess.CalledProcessError(proc.returncode, args, stderr=proc.stderr.read()))
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def _blobless_fetch(repo_url, ref, git_dir):
+    """
+    git commands that fetch only ref's commit and trees into an empty bare
+    repo at git_dir. Unlike clone --branch this accepts commit SHAs as well
+    as branches and tags; the fetched commit is FETCH_HEAD.
+    """
+    return [
+        ("init", "--bare", "--quiet", git_dir),
+        ("remote", "add", "origin", repo_url),
+        ("fetch", "--quiet", "--filter=blob:none", "--depth", "1", "origin", ref or "HEAD"),
+    ]
+
+
+@contextmanager
+def tree_source(repo_url, ref=None):
+    """
+    Yield (git_dir, rev, partial) for reading ref's tree and blobs without a
+    checkout: the cached mirror when there is one, otherwise a shallow
+    blobless bare clone (partial=True) that fetches each blob on first read.
+    """
+    mirror = mirror_path(repo_url)
+    if os.path.isdir(mirror):
+        with _pinned(mirror):
+            ensure_mirror(repo_url)
+            yield mirror, ref or "HEAD", False
+        return
+
+    temp_dir = tempfile.mkdtemp(prefix="tree-")
+    try:
+        with metrics.span("git_clone"):
+            for args in _blobless_fetch(repo_url, ref, temp_dir):
+                _git(*args, cwd=temp_dir)
+        yield temp_dir, "FETCH_HEAD", True
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def list_tree(repo_url, ref=None, path="", recursive=True, ignore_dirs=()):
+    """
+    Yield {"path", "name", "type", "size"} for entries of repo_url without
+    checking any file out. Sizes are None when read from a blobless clone,
+    since blob contents are never downloaded. Entries inside ignore_dirs
+    are skipped.
+    """
+    ignore_dirs = set(ignore_dirs)
+
+    def keep(entry):
+        parts = entry["path"].split("/")
+        if entry["type"] == "dir" and parts[-1] in ignore_dirs:
+            return False
+        return not any(part in ignore_dirs for part in parts[:-1])
+
+    with tree_source(repo_url, ref=ref) as (git_dir, rev, partial):
+        for entry in _stream_ls_tree(git_dir, rev, path, recursive, not partial):
+            if keep(entry):
+                yield entry
+
+
+def blob_id(git_dir, rev, path):
+    """Blob SHA of path at rev, or None when it is missing or not a file"""
+    try:
+        line = _git("ls-tree", "-z", rev, "--", path, cwd=git_dir).split("\0", 1)[0]
+    except subprocess.CalledProcessError:
+        return None
+    meta, _, found = line.partition("\t")
+    fields = meta.split()
+    if found != path or len(fields) < 3 or fields[1] != "blob":
+        return None
+    return fields[2]
+
+
+def read_blob(git_dir, sha):
+    """Raw bytes of one blob; a blobless clone fetches just this object"""
+    with metrics.span("git_read_blob"):
+        data = subprocess.run(
+            ["git", "cat-file", "blob", sha], cwd=git_dir, env=git_env(), check=True, capture_output=True
+        ).stdout
+    metrics.inc("bytes_read_total", len(data), help="Bytes of repository content read", source="blob")
+    return data
+
+
+def read_blob_prefix(git_dir, sha, max_bytes):
+    """
+    (first max_bytes of a blob, its full size); the rest is never read, so
+    a huge blob costs no more memory than max_bytes.
+    """
+    with metrics.span("git_read_blob"):
+        proc = subprocess.Popen(["git", "cat-file", "--batch"], cwd=git_dir, env=git_env(),
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            proc.stdin.write(sha.encode("ascii") + b"\n")
+            proc.stdin.close()
+            header = proc.stdout.readline().split()
+            if len(header) != 3 or header[1] != b"blob":
+                raise ValueError(f"{sha} is not a readable blob")
+            size = int(header[2])
+            data = proc.stdout.read(min(size, max_bytes))
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+    return data, size
+
+
+# Asyncio variants for the ASGI app: git runs as asyncio subprocesses so a
+# waiting request holds no thread.
+
+async def _agit(*args, cwd=None):
+    proc = await asyncio.create_subprocess_exec(
+        "git", *args, cwd=cwd, env=git_env(), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise _redacted(subprocess.CalledProcessError(
+            proc.returncode, ["git", *args], output=stdout.decode(), stderr=stderr.decode()
+        ))
+    return stdout.decode()
+
+
+async def ensure_mirror_async(repo_url, max_age=None):
+    """
+    ensure_mirror without blocking the event loop. A fresh mirror is used as
+    is; cloning or fetching takes the cross-process mirror lock, so that rare
+    path runs on a thread.
+    """
+    if max_age is None:
+        max_age = REPO_CACHE_STALE_SECONDS
+    path = mirror_path(repo_url)
+    age = _stamp_age(os.path.join(path, FETCHED_STAMP))
+    if os.path.isdir(path) and age is not None and age < max_age:
+        _touch(os.path.join(path, USED_STAMP))
+        return path
+    return await asyncio.to_thread(ensure_mirror, repo_url, max_age)
+
+
+async def resolve_head_async(repo_url, ref=None, max_age=None):
+    """resolve_head for the event loop"""
+    path = await ensure_mirror_async(repo_url, max_age=max_age)
+    return (await _agit("rev-parse", f"{ref or 'HEAD'}^{{commit}}", cwd=path)).strip()
+
+
+@asynccontextmanager
+async def tree_source_async(repo_url, ref=None):
+    """tree_source for the event loop"""
+    mirror = mirror_path(repo_url)
+    if os.path.isdir(mirror):
+        with _pinned(mirror):
+            await ensure_mirror_async(repo_url)
+            yield mirror, ref or "HEAD", False
+        return
+
+    temp_dir = tempfile.mkdtemp(prefix="tree-")
+    try:
+        with metrics.span("git_clone"):
+            for args in _blobless_fetch(repo_url, ref, temp_dir):
+                await _agit(*args, cwd=temp_dir)
+        yield temp_dir, "FETCH_HEAD", True
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+async def list_tree_async(repo_url, ref=None, path="", recursive=True, ignore_dirs=()):
+    """list_tree as an async generator"""
+    ignore_dirs = set(ignore_dirs)
+    args = ["git", "ls-tree", "-z"]
+    if recursive:
+        args.append("-r")
+
+    def keep(entry):
+        parts = entry["path"].split("/")
+        if entry["type"] == "dir" and parts[-1] in ignore_dirs:
+            return False
+        return not any(part in ignore_dirs for part in parts[:-1])
+
+    async with tree_source_async(repo_url, ref=ref) as (git_dir, rev, partial):
+        args += [rev] if partial else ["-l", rev]
+        if path:
+            args += ["--", path.rstrip("/") + "/"]
+        proc = await asyncio.create_subprocess_exec(
+            *args, cwd=git_dir, env=git_env(), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            buffer = b""
+            while block := await proc.stdout.read(65536):
+                buffer += block
+                *records, buffer = buffer.split(b"\0")
+                for record in records:
+                    if record:
+                        entry = _parse_ls_tree(record.decode("utf-8", errors="replace"))
+                        if keep(entry):
+                            yield entry
+            if buffer:
+                entry = _parse_ls_tree(buffer.decode("utf-8", errors="replace"))
+                if keep(entry):
+                    yield entry
+            if await proc.wait() != 0:
+                raise _redacted(subprocess.CalledProcessError(proc.returncode, args, stderr=await proc.stderr.read()))
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+
+
+async def blob_id_async(git_dir, rev, path):
+    """blob_id for the event loop"""
+    try:
+        line = (await _agit("ls-tree", "-z", rev, "--", path, cwd=git_dir)).split("\0", 1)[0]
+    except subprocess.CalledProcessError:
+        return None
+    meta, _, found = line.partition("\t")
+    fields = meta.split()
+    if found != path or len(fields) < 3 or fields[1] != "blob":
+        return None
+    return fields[2]
+
+
+async def read_blob_prefix_async(git_dir, sha, max_bytes):
+    """read_blob_prefix for the event loop"""
+    with metrics.span("git_read_blob"):
+        proc = await asyncio.create_subprocess_exec(
+            "git", "cat-file", "--batch", cwd=git_dir, env=git_env(),
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            proc.stdin.write(sha.encode("ascii") + b"\n")
+            await proc.stdin.drain()
+            proc.stdin.close()
+            header = (await proc.stdout.readline()).split()
+            if len(header) != 3 or header[1] != b"blob":
+                raise ValueError(f"{sha} is not a readable blob")
+            size = int(header[2])
+            data = await proc.stdout.readexactly(min(size, max_bytes))
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+            await proc.wait()
+    return data, size
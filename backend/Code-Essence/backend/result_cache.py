@@ -0,0 +1,202 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import metrics
+
+# Finished API responses, keyed by (endpoint, repo URL, HEAD commit, params)
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "600"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 ** 2)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024"))
+
+# Values of the X-Cache response header
+HIT, MISS, COALESCED, BYPASS = "HIT", "MISS", "COALESCED", "BYPASS"
+# Marks a summary the model failed to produce; results containing one are
+# served but not cached, so an outage does not outlive itself by RESULT_CACHE_TTL
+FAILED_PREFIX = "[FAILED SUMMARY]"
+
+
+def request_key(endpoint, repo_url, commit, params=None):
+    normalized = repo_url.strip().rstrip("/")
+    if normalized.endswith(".git"):
+        normalized = normalized[:-4]
+    return "|".join([endpoint, normalized, commit, json.dumps(params or {}, sort_keys=True)])
+
+
+class ResultCache:
+    """
+    TTL + LRU cache of serialized JSON bodies, bounded by entry count and by
+    total bytes. Bodies are stored serialized so hits are never mutated.
+    """
+
+    def __init__(self, ttl=RESULT_CACHE_TTL, max_bytes=RESULT_CACHE_MAX_BYTES,
+                 max_entries=RESULT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires_at, body)
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                self._drop(key)
+                return None
+            self.entries.move_to_end(key)
+            return item[1]
+
+    def set(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (time.monotonic() + self.ttl, body)
+            self.bytes += len(body)
+            while self.entries and (self.bytes > self.max_bytes or len(self.entries) > self.max_entries):
+                self._drop(next(iter(self.entries)))
+
+    def _drop(self, key):
+        _, body = self.entries.pop(key)
+        self.bytes -= len(body)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.body = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one computation per key; concurrent callers share its outcome"""
+
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return (value, shared); errors are re-raised in every waiting caller"""
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.body, True
+        try:
+            flight.body = fn()
+            return flight.body, False
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+
+_cache = ResultCache()
+_flights = SingleFlight()
+_async_flights = {}  # key -> asyncio.Task, touched only from the event loop
+_stats = {HIT: 0, MISS: 0, COALESCED: 0, BYPASS: 0}
+_stats_lock = threading.Lock()
+
+
+def _count(status):
+    with _stats_lock:
+        _stats[status] += 1
+    metrics.inc("result_cache_total", help="API responses by result cache status", status=status.lower())
+
+
+def _complete(result):
+    """False when any summary in result is a FAILED_PREFIX placeholder"""
+    if isinstance(result, str):
+        return not result.startswith(FAILED_PREFIX)
+    if isinstance(result, dict):
+        return all(_complete(value) for value in result.values())
+    if isinstance(result, list):
+        return all(_complete(value) for value in result)
+    return True
+
+
+def get_or_compute(key, compute):
+    """
+    JSON body for key and how it was served (HIT, MISS or COALESCED).
+    compute() returns a JSON-serializable result. Exceptions and results
+    holding a failed summary are not cached.
+    """
+    body = _cache.get(key)
+    if body is not None:
+        _count(HIT)
+        return body, HIT
+
+    def run():
+        # Another flight may have finished between the lookup and now
+        cached = _cache.get(key)
+        if cached is not None:
+            return cached, True
+        result = compute()
+        with metrics.span("serialize"):
+            body = json.dumps(result)
+        if _complete(result):
+            _cache.set(key, body)
+        else:
+            print(f"[WARN] Not caching {key.rsplit('|', 1)[0]}: result has failed summaries")
+        return body, False
+
+    (body, found), shared = _flights.do(key, run)
+    status = COALESCED if shared else (HIT if found else MISS)
+    _count(status)
+    return body, status
+
+
+async def aget_or_compute(key, compute, run=asyncio.to_thread):
+    """
+    get_or_compute for the event loop. Concurrent identical requests await
+    one shared task instead of each holding a thread; that task runs
+    get_or_compute through run (a thread by default), so it also coalesces
+    with requests served by other threads.
+    """
+    body = _cache.get(key)
+    if body is not None:
+        _count(HIT)
+        return body, HIT
+    task = _async_flights.get(key)
+    if task is None:
+        task = _async_flights[key] = asyncio.ensure_future(run(get_or_compute, key, compute))
+        task.add_done_callback(lambda done: _land(key, done))
+        # Shielded: the computation outlives a client that disconnects
+        return await asyncio.shield(task)
+    body, _ = await asyncio.shield(task)
+    _count(COALESCED)
+    return body, COALESCED
+
+
+def _land(key, task):
+    _async_flights.pop(key, None)
+    if not task.cancelled():
+        task.exception()  # mark retrieved; waiters re-raise it themselves
+
+
+def record_bypass():
+    _count(BYPASS)
+
+
+def cache_stats():
+    with _stats_lock:
+        stats = {status.lower(): count for status, count in _stats.items()}
+    with _cache.lock:
+        stats.update(entries=len(_cache.entries), bytes=_cache.bytes, in_flight=len(_flights.flights))
+    served = stats["hit"] + stats["miss"] + stats["coalesced"]
+    stats["hit_rate"] = round((stats["hit"] + stats["coalesced"]) / served, 4) if served else 0.0
+    return stats
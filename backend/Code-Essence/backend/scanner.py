@@ -0,0 +1,139 @@
+import os
+import subprocess
+from collections import namedtuple
+import metrics
+
+# path is relative to the repo root with "/" separators; dir is "" for the root;
+# sha is the git blob SHA when indexed from git, else None
+FileEntry = namedtuple("FileEntry", ["path", "name", "dir", "size", "ext", "depth", "sha"])
+
+# Never descended into when scanning the filesystem directly
+SCAN_SKIP_DIRS = {".git"}
+# Vendored or generated trees that cannot hold projects of their own
+PROJECT_SKIP_DIRS = {".git", "node_modules", "venv", ".venv", "__pycache__", "dist", "build", "vendor"}
+
+
+def _entry(path, size, sha=None):
+    directory, _, name = path.rpartition("/")
+    ext = os.path.splitext(name)[1].lower()
+    return FileEntry(path, name, directory, size, ext, path.count("/"), sha)
+
+
+class FileIndex:
+    """
+    In-memory index of every file in a checkout, built in one pass.
+    Health rules and summarizers query it instead of listing directories.
+    """
+
+    def __init__(self, root, entries):
+        self.root = root
+        self.files = entries
+        self.by_path = {}
+        self.files_in = {}
+        self.subdirs = {"": set()}
+        for entry in entries:
+            self.by_path[entry.path] = entry
+            self.files_in.setdefault(entry.dir, []).append(entry)
+            self._add_dir(entry.dir)
+
+    def _add_dir(self, directory):
+        while directory and directory not in self.subdirs:
+            self.subdirs[directory] = set()
+            parent, _, name = directory.rpartition("/")
+            self.subdirs.setdefault(parent, set()).add(name)
+            directory = parent
+
+    @classmethod
+    def build(cls, root):
+        """Index root via `git ls-tree` when it is a checkout, else os.scandir"""
+        with metrics.span("scan"):
+            try:
+                return cls(root, _git_entries(root))
+            except (subprocess.CalledProcessError, OSError):
+                return cls(root, _scandir_entries(root))
+
+    def is_dir(self, rel_dir):
+        return rel_dir in self.subdirs
+
+    def exists(self, rel_path):
+        return rel_path in self.by_path or rel_path in self.subdirs
+
+    def listdir(self, rel_dir=""):
+        """Names directly inside rel_dir, like os.listdir"""
+        names = [entry.name for entry in self.files_in.get(rel_dir, [])]
+        return names + sorted(self.subdirs.get(rel_dir, ()))
+
+    def files_under(self, rel_dir=""):
+        if not rel_dir:
+            return list(self.files)
+        prefix = rel_dir + "/"
+        return [entry for entry in self.files if entry.path.startswith(prefix)]
+
+    def find(self, names, rel_dir="", lower=False):
+        """Files directly in rel_dir whose name is in names"""
+        found = []
+        for entry in self.files_in.get(rel_dir, []):
+            name = entry.name.lower() if lower else entry.name
+            if name in names:
+                found.append(entry)
+        return found
+
+    def project_dirs(self, markers, skip_dirs=PROJECT_SKIP_DIRS, max_depth=None):
+        """
+        Directories (root excluded) that contain one of the marker files, at
+        any depth or at most max_depth levels below the root
+        """
+        found = []
+        for directory, entries in self.files_in.items():
+            if not directory:
+                continue
+            parts = directory.split("/")
+            if max_depth is not None and len(parts) > max_depth:
+                continue
+            if any(part in skip_dirs or part.startswith(".") for part in parts):
+                continue
+            if any(entry.name in markers for entry in entries):
+                found.append(directory)
+        return sorted(found)
+
+    def abspath(self, rel_path):
+        return os.path.join(self.root, *rel_path.split("/"))
+
+
+def _git_entries(root):
+    output = subprocess.run(
+        ["git", "ls-tree", "-r", "-l", "-z", "HEAD"],
+        cwd=root, check=True, capture_output=True,
+    ).stdout.decode("utf-8", errors="replace")
+    entries = []
+    for record in output.split("\0"):
+        if not record:
+            continue
+        meta, _, path = record.partition("\t")
+        _, kind, sha, size = meta.split(None, 3)
+        if kind != "blob":
+            continue  # submodules
+        entries.append(_entry(path, int(size) if size.strip().isdigit() else 0, sha))
+    return entries
+
+
+def _scandir_entries(root):
+    entries = []
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            with os.scandir(os.path.join(root, rel_dir)) as it:
+                children = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for child in children:
+            rel_path = f"{rel_dir}/{child.name}" if rel_dir else child.name
+            if child.is_dir(follow_symlinks=False):
+                if child.name not in SCAN_SKIP_DIRS:
+                    subdirs.append(rel_path)
+            elif child.is_file(follow_symlinks=False):
+                entries.append(_entry(rel_path, child.stat(follow_symlinks=False).st_size))
+        stack.extend(reversed(subdirs))
+    return entries
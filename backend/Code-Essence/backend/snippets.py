@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import io
+import os
+import re
+import threading
+import tokenize
+from concurrent.futures import Future
+import batching
+import summarizer
+import summary_cache
+from chunking import count_tokens
+
+# How long the first snippet of a window waits for others to share its call
+SNIPPET_BATCH_WINDOW_MS = float(os.getenv("SNIPPET_BATCH_WINDOW_MS", "50"))
+SNIPPET_BATCH_MAX = int(os.getenv("SNIPPET_BATCH_MAX", str(batching.BATCH_MAX_FILES)))
+
+C_STYLE = {"js", "jsx", "ts", "tsx", "mjs", "cjs", "java", "go", "c", "h", "cpp", "cs", "css", "rs", "swift", "kt"}
+HASH_STYLE = {"sh", "bash", "yaml", "yml", "rb", "dockerfile", "toml", "r"}
+
+_STRING = r""""(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'"""
+C_COMMENTS = re.compile(r"(%s|`(?:\\.|[^`\\])*`)|//[^\n]*|/\*.*?\*/" % _STRING, re.DOTALL)
+SQL_COMMENTS = re.compile(r"(%s)|--[^\n]*|/\*.*?\*/" % _STRING, re.DOTALL)
+HASH_COMMENTS = re.compile(r"(%s)|#[^\n]*" % _STRING)
+WHITESPACE = re.compile(r"\s+")
+
+PY_SKIP = {tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER}
+# Block structure is meaning in Python: kept as markers, independent of indent width
+PY_MARKERS = {tokenize.NEWLINE: ";", tokenize.INDENT: "{", tokenize.DEDENT: "}"}
+
+
+def _strip(pattern, code):
+    return pattern.sub(lambda m: m.group(1) or " ", code)
+
+
+def normalize(code, language):
+    """Code with comments dropped and whitespace collapsed, for cache keys"""
+    language = language.lower()
+    if language == "py":
+        try:
+            tokens = tokenize.generate_tokens(io.StringIO(code).readline)
+            return " ".join(PY_MARKERS.get(tok.type, tok.string) for tok in tokens if tok.type not in PY_SKIP)
+        except (tokenize.TokenError, IndentationError, SyntaxError):
+            code = _strip(HASH_COMMENTS, code)
+    elif language in C_STYLE:
+        code = _strip(C_COMMENTS, code)
+    elif language == "sql":
+        code = _strip(SQL_COMMENTS, code)
+    elif language in HASH_STYLE:
+        code = _strip(HASH_COMMENTS, code)
+    return WHITESPACE.sub(" ", code).strip()
+
+
+def snippet_key(code, language):
+    normalized = normalize(code, language)
+    return "snippet:" + hashlib.sha256(f"{language.lower()}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+def _prompt(language):
+    return summarizer.FILE_PROMPTS.get(language.lower(), "Summarize source code file briefly.")
+
+
+class MicroBatcher:
+    """
+    Collects concurrent submissions for up to `window` seconds (or until
+    max_size are waiting) and hands them to run_batch({key: item}) together.
+    The first caller of a window runs the batch; identical keys share a result.
+    """
+
+    def __init__(self, run_batch, window, max_size):
+        self.run_batch = run_batch
+        self.window = window
+        self.max_size = max_size
+        self.pending = {}
+        self.full = threading.Event()
+        self.lock = threading.Lock()
+
+    def submit(self, key, item):
+        """Return (result, shared) where shared means another caller's entry was reused"""
+        with self.lock:
+            if key in self.pending:
+                future = self.pending[key][1]
+                leader, shared = False, True
+            else:
+                future = Future()
+                leader, shared = not self.pending, False
+                self.pending[key] = (item, future)
+                if len(self.pending) >= self.max_size:
+                    self.full.set()
+        if leader:
+            self.full.wait(self.window)
+            with self.lock:
+                batch, self.pending = self.pending, {}
+                self.full.clear()
+            try:
+                results = self.run_batch({k: entry[0] for k, entry in batch.items()})
+                for k, (_, pending_future) in batch.items():
+                    pending_future.set_result(results[k])
+            except Exception as e:
+                for _, pending_future in batch.values():
+                    if not pending_future.done():
+                        pending_future.set_exception(e)
+        return future.result(), shared
+
+
+def _run_batch(items):
+    """{key: (summary, prompt it is cached under)}: batched answers get batching.cache_prompt"""
+    if len(items) == 1:
+        (key, (code, language)), = items.items()
+        return {key: (summarizer.summarize_content("snippet", code, file_type=language), _prompt(language))}
+    print(f"[INFO] Micro-batching {len(items)} snippets into one call")
+    batched = set()
+    summaries = summarizer.summarize_batch(
+        [(key, f"snippet.{language}", code) for key, (code, language) in items.items()], batched=batched
+    )
+    return {
+        key: (summaries[key], batching.cache_prompt(_prompt(language)) if key in batched else _prompt(language))
+        for key, (code, language) in items.items()
+    }
+
+
+_batcher = MicroBatcher(_run_batch, SNIPPET_BATCH_WINDOW_MS / 1000, SNIPPET_BATCH_MAX)
+
+
+def summarize_snippet(code, language="py", on_delta=None):
+    """
+    Summary for a code snippet and how it was served: "HIT" when an
+    equivalent snippet (ignoring whitespace and comments) was summarized
+    before, "COALESCED" when it shared a concurrent request's entry, else "MISS".
+    Streaming (on_delta) requests skip micro-batching. Requests that would be
+    batched also accept an earlier batched answer; the others never get one.
+    """
+    key = snippet_key(code, language)
+    prompt = _prompt(language)
+    cached = summary_cache.get_summary(key, language, prompt, summarizer.MODEL_ID)
+    if cached is not None:
+        if on_delta is not None:
+            on_delta(cached)
+        return cached, "HIT"
+
+    if (on_delta is not None or SNIPPET_BATCH_WINDOW_MS <= 0
+            or count_tokens(code) > batching.BATCH_FILE_MAX_TOKENS):
+        summary = summarizer.summarize_content("snippet", code, file_type=language, on_delta=on_delta)
+        shared, store_prompt = False, prompt
+    else:
+        cached = summary_cache.get_summary(key, language, batching.cache_prompt(prompt), summarizer.MODEL_ID)
+        if cached is not None:
+            return cached, "HIT"
+        (summary, store_prompt), shared = _batcher.submit(key, (code, language))
+    if not shared and not summary.startswith("[FAILED SUMMARY]"):
+        summary_cache.put_summary(key, language, store_prompt, summarizer.MODEL_ID, summary)
+    return summary, "COALESCED" if shared else "MISS"
+
+
+async def asummarize_snippet(code, language="py"):
+    """
+    summarize_snippet for the event loop. Misses that would be micro-batched
+    wait for their batch on a thread; the rest go through the async client.
+    """
+    key = snippet_key(code, language)
+    prompt = _prompt(language)
+    cached = summary_cache.get_summary(key, language, prompt, summarizer.MODEL_ID)
+    if cached is not None:
+        return cached, "HIT"
+    if SNIPPET_BATCH_WINDOW_MS > 0 and count_tokens(code) <= batching.BATCH_FILE_MAX_TOKENS:
+        return await asyncio.to_thread(summarize_snippet, code, language)
+    summary = await summarizer.asummarize_content("snippet", code, file_type=language)
+    if not summary.startswith("[FAILED SUMMARY]"):
+        summary_cache.put_summary(key, language, prompt, summarizer.MODEL_ID, summary)
+    return summary, "MISS"
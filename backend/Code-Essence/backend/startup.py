@@ -0,0 +1,59 @@
+import gc
+import importlib
+import os
+import time
+import jobs
+import llm_client
+
+# Slow third-party modules the app only imports on first use. A worker that
+# boots on its own skips them; a gunicorn --preload master imports them once
+# so forked workers share the pages copy-on-write.
+HEAVY_MODULES = [
+    "langchain.text_splitter",
+    "langchain_aws",
+    "boto3",
+    "botocore.config",
+    "authlib.integrations.flask_client",
+    "langgraph.graph",
+    "controllers.file_analysis_graph",
+    "git",
+    "yaml",
+]
+# Also load the tokenizer (and transformers with it) before forking, when
+# chunking.TOKENIZER_NAME opts into one
+PRELOAD_TOKENIZER = os.getenv("PRELOAD_TOKENIZER", "1") == "1"
+
+
+def warm(modules=None):
+    """
+    Import the heavy modules in this process and freeze the heap so forked
+    children do not copy it on their first garbage collection. Returns
+    {module: seconds}. Clients and pools are left for after_fork.
+    """
+    timings = {}
+    for name in modules or HEAVY_MODULES:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"[WARN] Preload skipped {name}: {e}")
+            continue
+        timings[name] = time.perf_counter() - started
+    import chunking
+
+    if PRELOAD_TOKENIZER and chunking.TOKENIZER_NAME:
+        started = time.perf_counter()
+        chunking.count_tokens("warm up")
+        timings["tokenizer"] = time.perf_counter() - started
+    gc.collect()
+    gc.freeze()
+    total = sum(timings.values())
+    print(f"[INFO] Preloaded {len(timings)} modules in {total:.2f}s: "
+          + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items()))
+    return timings
+
+
+def after_fork():
+    """Per-worker reset: nothing that holds sockets, threads or DB handles may cross the fork"""
+    llm_client.reset_clients()
+    jobs.reset()
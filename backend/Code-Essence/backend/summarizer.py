@@ -1,25 +1,26 @@
+import asyncio
 import os
-import shutil
-import tempfile
+import subprocess
+import threading
 from dotenv import load_dotenv
-from git import Repo
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains.summarize import load_summarize_chain
-from langchain_aws import ChatBedrock
-import boto3
+import batching
+import file_access
+import llm_client
+import repo_cache
+import summary_cache
+from chunking import TokenBudget, count_tokens, split_code, truncate_tokens
+from concurrency import map_ordered
+from scanner import FileIndex
 
 load_dotenv()
 # Load GitHub token from env
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
-# AWS Bedrock client
-bedrock_client = boto3.client("bedrock-runtime", region_name="us-east-1")
-llm = ChatBedrock(
-    client=bedrock_client,
-    model_id="anthropic.claude-3-5-sonnet-20240620-v1:0"
-)
+# Bedrock model; the client, rate limiting and retries live in llm_client
+MODEL_ID = llm_client.MODEL_ID
 
-splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=200)
+# Parallel summarization settings
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
 
 # File prompts
 FILE_PROMPTS = {
@@ -51,100 +52,674 @@ REPO_PROMPT = """
     Format as: - Key points separated by periods. - No code blocks, no JSON.
 """
 
+FOLDER_PROMPT = """
+    You are a senior software engineer. Combine these summaries from {folder} into one summary.
+    {docs}
+    Describe in 3 sentences, max 200 words, what this part of the code does and how the pieces fit together.
+    Output a clean summary without code blocks or JSON.
+"""
+
+# Max tokens of child summaries fed into one rollup call
+REDUCE_TOKEN_BUDGET = int(os.getenv("REDUCE_TOKEN_BUDGET", "6000"))
+
+# Chunking of oversized files and token ceilings
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "3000"))
+CHUNK_CONCURRENCY = int(os.getenv("CHUNK_CONCURRENCY", "4"))
+FILE_TOKEN_BUDGET = int(os.getenv("FILE_TOKEN_BUDGET", "24000"))
+REQUEST_TOKEN_BUDGET = int(os.getenv("REQUEST_TOKEN_BUDGET", "0"))  # 0 = unlimited
+
 def clone_repo(repo_url, dest_dir):
-    """Clone a GitHub repo using token authentication"""
-    url = repo_url
-    if GITHUB_TOKEN and repo_url.startswith("https://github.com"):
-        url = repo_url.replace(
-            "https://github.com",
-            f"https://{GITHUB_TOKEN}@github.com"
-        )
-    Repo.clone_from(url, dest_dir)
+    """Check out a GitHub repo into dest_dir from the shared mirror cache"""
+    repo_cache.add_worktree(repo_url, dest_dir)
 
 def should_ignore_file(file_name):
     return file_name.lower() not in ALLOWED_EXTENSIONS and not any(
         file_name.lower().endswith(ext) for ext in ALLOWED_EXTENSIONS
     )
 
-def summarize_content(file_name, content, file_type):
-    prompt = FILE_PROMPTS.get(file_type.lower(), "Summarize source code file briefly.")
-    try:
-        full_prompt = f"""
+def invoke_llm(prompt):
+    """Call the shared model through llm_client's limits, retries and breaker"""
+    return llm_client.invoke(prompt, MODEL_ID)
+
+def _response_text(response):
+    if hasattr(response, "content"):
+        return response.content.strip()
+    elif isinstance(response, str):
+        return response.strip()
+    return str(response)
+
+
+def _stream_llm(prompt, on_delta):
+    """
+    Stream the answer to on_delta and return it, stripped like _response_text:
+    leading whitespace is dropped and trailing whitespace held back until
+    more text follows it.
+    """
+    parts, held = [], ""
+    for text in llm_client.stream(prompt, MODEL_ID):
+        if not parts:
+            text = text.lstrip()
+        text = held + text
+        stripped = text.rstrip()
+        held = text[len(stripped):]
+        if stripped:
+            parts.append(stripped)
+            on_delta(stripped)
+    return "".join(parts)
+
+
+def _invoke_counted(prompt, token_budget=None, on_delta=None):
+    """
+    invoke_llm, charging the prompt against the request's token budget.
+    With on_delta the answer is streamed to it as it is generated.
+    """
+    if token_budget is not None:
+        token_budget.consume(count_tokens(prompt))
+    if on_delta is not None:
+        return _stream_llm(prompt, on_delta)
+    return _response_text(invoke_llm(prompt))
+
+
+def _file_prompt(file_name, file_type, prompt, content, part=None):
+    part_note = f" (part {part[0]} of {part[1]})" if part else ""
+    return f"""
         You are a senior engineer. Summarize this {file_type} file for documentation.
         
-        File: {file_name}
+        File: {file_name}{part_note}
         Instructions: {prompt}
         
         Code/content:
-        {content[:4000]}  # truncate if huge
+        {content}
         """
 
-        response = llm.invoke(full_prompt)  # direct Bedrock call
-        if hasattr(response, "content"):
-            return response.content.strip()
-        elif isinstance(response, str):
-            return response.strip()
+
+def summarize_content(file_name, content, file_type, token_budget=None, on_delta=None):
+    """
+    Summarize one file. Content over CHUNK_TOKENS is split on function/class
+    boundaries, the chunks are summarized in parallel and merged; at most
+    FILE_TOKEN_BUDGET tokens of a file are sent. token_budget (a
+    chunking.TokenBudget) caps prompt tokens across a whole request.
+    on_delta receives the final summary text as it streams in.
+    """
+    prompt = FILE_PROMPTS.get(file_type.lower(), "Summarize source code file briefly.")
+    # Unchanged content (same blob in any repo or fork) is never re-sent
+    blob = summary_cache.blob_sha(content)
+    cached = summary_cache.get_summary(blob, file_type, prompt, MODEL_ID)
+    if cached is not None:
+        if on_delta is not None:
+            on_delta(cached)
+        return cached
+    try:
+        if count_tokens(content) <= CHUNK_TOKENS:
+            summary = _invoke_counted(
+                _file_prompt(file_name, file_type, prompt, content), token_budget, on_delta
+            )
         else:
-            return str(response)
+            chunks = split_code(content, file_type, CHUNK_TOKENS)
+            kept, used = [], 0
+            for chunk in chunks:
+                used += count_tokens(chunk)
+                if kept and used > FILE_TOKEN_BUDGET:
+                    break
+                kept.append(chunk)
+            if len(kept) < len(chunks):
+                print(f"[WARN] {file_name}: summarizing {len(kept)} of {len(chunks)} chunks (file token budget)")
+            print(f"[INFO] Summarizing {file_name} in {len(kept)} chunks...")
+            partials = map_ordered(
+                lambda item: _invoke_counted(
+                    _file_prompt(file_name, file_type, prompt, item[1], part=(item[0] + 1, len(kept))),
+                    token_budget,
+                ),
+                list(enumerate(kept)),
+                CHUNK_CONCURRENCY,
+            )
+            summary = reduce_summaries(
+                file_name,
+                [f"part {i + 1}: {partial}" for i, partial in enumerate(partials)],
+                FOLDER_PROMPT,
+                token_budget=token_budget,
+                on_delta=on_delta,
+            )
+            if summary.startswith("[FAILED SUMMARY]"):
+                raise RuntimeError("merging chunk summaries failed")
+        summary_cache.put_summary(blob, file_type, prompt, MODEL_ID, summary)
+        return summary
 
     except Exception as e:
         print(f"[ERROR] Summarization failed for {file_name}: {e}")
         return f"[FAILED SUMMARY] {file_name}"
 
 
-def summarize_repo(repo_url, level="repo"):
-    temp_dir = tempfile.mkdtemp()
-    summaries = {}
+def summarize_repo_file(repo_url, file_path, ref=None, on_delta=None):
+    """
+    Summarize one file of repo_url without a checkout. The blob SHA from the
+    tree is checked against the summary cache first, so a hit never downloads
+    the file; a miss reads only that blob. Returns None if file_path is not
+    a file at ref.
+    """
+    file_path = file_path.strip("/")
+    file_name = os.path.basename(file_path)
+    file_type = _file_type(file_name)
+    prompt = FILE_PROMPTS.get(file_type, "Summarize source code file briefly.")
+    with file_access.request_budget(), repo_cache.tree_source(repo_url, ref=ref) as (git_dir, rev, _):
+        blob = repo_cache.blob_id(git_dir, rev, file_path)
+        if blob is None:
+            return None
+        cached = summary_cache.get_summary(blob, file_type, prompt, MODEL_ID)
+        if cached is not None:
+            if on_delta is not None:
+                on_delta(cached)
+            return cached
+        data, size = repo_cache.read_blob_prefix(git_dir, blob, file_access.MAX_FILE_BYTES)
+        content = file_access.decode(data, file_name, size, source="blob")
+    if content is None:
+        return f"[SKIPPED] {file_name}: binary, generated or over the read budget"
+    return summarize_content(file_name, content, file_type=file_type, on_delta=on_delta)
+
+
+async def asummarize_content(file_name, content, file_type):
+    """
+    summarize_content for the event loop: a file that fits one prompt is
+    summarized through the model's async client; chunked files fan out on a
+    thread as before.
+    """
+    prompt = FILE_PROMPTS.get(file_type.lower(), "Summarize source code file briefly.")
+    blob = summary_cache.blob_sha(content)
+    cached = summary_cache.get_summary(blob, file_type, prompt, MODEL_ID)
+    if cached is not None:
+        return cached
+    if count_tokens(content) > CHUNK_TOKENS:
+        return await asyncio.to_thread(summarize_content, file_name, content, file_type)
     try:
-        print(f"[INFO] Cloning repository: {repo_url}")
-        clone_repo(repo_url, temp_dir)
-        print(f"[INFO] Repository cloned into {temp_dir}")
-
-        for root, dirs, files in os.walk(temp_dir):
-            dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
-            folder_summary = {}
-            for file in files:
-                if file in IGNORE_FILES or should_ignore_file(file):
-                    continue
-                file_path = os.path.join(root, file)
-                ext = file.lower().split('.')[-1] if '.' in file else file.lower()
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    print(f"[INFO] Summarizing {file} ({ext})...")
-                    summary = summarize_content(file, content, file_type=ext)
-                    if level == "file":
-                        summaries[file_path.replace(temp_dir+'/', '')] = str(summary)
-                    elif level == "folder":
-                        folder_summary[file] = str(summary)
-                except Exception as e:
-                    print(f"[WARN] Skipping {file_path}: {e}")
+        response = await llm_client.ainvoke(_file_prompt(file_name, file_type, prompt, content), MODEL_ID)
+        summary = _response_text(response)
+        summary_cache.put_summary(blob, file_type, prompt, MODEL_ID, summary)
+        return summary
+    except Exception as e:
+        print(f"[ERROR] Summarization failed for {file_name}: {e}")
+        return f"[FAILED SUMMARY] {file_name}"
+
+
+async def asummarize_repo_file(repo_url, file_path, ref=None):
+    """summarize_repo_file for the event loop: git and the model are awaited, not blocked on"""
+    file_path = file_path.strip("/")
+    file_name = os.path.basename(file_path)
+    file_type = _file_type(file_name)
+    prompt = FILE_PROMPTS.get(file_type, "Summarize source code file briefly.")
+    with file_access.request_budget():
+        async with repo_cache.tree_source_async(repo_url, ref=ref) as (git_dir, rev, _):
+            blob = await repo_cache.blob_id_async(git_dir, rev, file_path)
+            if blob is None:
+                return None
+            cached = summary_cache.get_summary(blob, file_type, prompt, MODEL_ID)
+            if cached is not None:
+                return cached
+            data, size = await repo_cache.read_blob_prefix_async(git_dir, blob, file_access.MAX_FILE_BYTES)
+            content = file_access.decode(data, file_name, size, source="blob")
+    if content is None:
+        return f"[SKIPPED] {file_name}: binary, generated or over the read budget"
+    return await asummarize_content(file_name, content, file_type)
+
+
+def _is_summarizable(rel_path):
+    parts = rel_path.replace(os.sep, "/").split("/")
+    file = parts[-1]
+    if any(part in IGNORE_DIRS for part in parts[:-1]):
+        return False
+    return file not in IGNORE_FILES and not should_ignore_file(file)
+
+
+def _collect_files(index):
+    """
+    Relative paths of summarizable files from a scanner.FileIndex, in index
+    order, leaving out IGNORE_DIRS and whatever the repo's .gitignore excludes
+    """
+    return [entry.path for entry in file_access.iter_files(index, IGNORE_DIRS) if _is_summarizable(entry.path)]
+
+
+def _file_type(file_name):
+    return file_name.lower().split('.')[-1] if '.' in file_name else file_name.lower()
+
+
+def summarize_batch(files, token_budget=None, batch_stats=None, batched=None):
+    """
+    Summarize several small files in one call. files is a list of
+    (key, file_name, content); returns {key: summary}. Files the model's
+    structured answer does not cover fall back to summarize_content.
+    Batched answers are cached apart from single-file ones (see
+    batching.cache_prompt); the keys they answer are added to `batched`.
+    """
+    entries, results = [], {}
+    for key, file_name, content in files:
+        file_type = _file_type(file_name)
+        instructions = FILE_PROMPTS.get(file_type, "Summarize source code file briefly.")
+        blob = summary_cache.blob_sha(content)
+        cached = summary_cache.get_summary(blob, file_type, batching.cache_prompt(instructions), MODEL_ID)
+        if cached is not None:
+            results[key] = cached
+            if batched is not None:
+                batched.add(key)
+            continue
+        entries.append({
+            "key": key, "file_id": f"F{len(entries) + 1}", "file_name": file_name, "blob": blob,
+            "file_type": file_type, "instructions": instructions, "content": content,
+        })
+    if not entries:
+        return results
+    prompt = batching.build_prompt(entries)
+    parsed = {}
+    try:
+        print(f"[INFO] Summarizing {len(entries)} small files in one batch...")
+        parsed = batching.parse_response(
+            _invoke_counted(prompt, token_budget), [e["file_id"] for e in entries]
+        )
+    except Exception as e:
+        print(f"[WARN] Batch summarization failed, falling back to single files: {e}")
+    if batch_stats is not None:
+        single_tokens = sum(
+            count_tokens(_file_prompt(e["file_name"], e["file_type"], e["instructions"], e["content"]))
+            for e in entries if e["file_id"] in parsed
+        )
+        batch_stats.record(len(entries), len(parsed), single_tokens, count_tokens(prompt))
+    for e in entries:
+        summary = parsed.get(e["file_id"])
+        if summary is None:
+            summary = summarize_content(e["file_name"], e["content"], e["file_type"], token_budget=token_budget)
+        else:
+            summary_cache.put_summary(
+                e["blob"], e["file_type"], batching.cache_prompt(e["instructions"]), MODEL_ID, summary
+            )
+            if batched is not None:
+                batched.add(e["key"])
+        results[e["key"]] = summary
+    return results
+
+
+def _plan_units(temp_dir, paths, sizes=None):
+    """
+    Split paths into work units: ("batch", [(path, name, content), ...]) for
+    uncached small files packed together, ("file", path, content) for
+    everything else. content is None when the file was not read here; files
+    file_access skips are left out.
+    """
+    small, read, units = {}, {}, []
+    for rel_path in paths:
+        file_path = os.path.join(temp_dir, rel_path)
+        try:
+            size = sizes[rel_path] if sizes and rel_path in sizes else os.path.getsize(file_path)
+        except OSError:
+            continue
+        if size > batching.BATCH_FILE_MAX_TOKENS * 8:
+            continue
+        content = file_access.read_text(file_path)
+        if content is None:
+            read[rel_path] = None
+            continue
+        read[rel_path] = content
+        tokens = count_tokens(content)
+        file = os.path.basename(rel_path)
+        file_type = _file_type(file)
+        prompt = FILE_PROMPTS.get(file_type, "Summarize source code file briefly.")
+        if tokens > batching.BATCH_FILE_MAX_TOKENS:
+            continue
+        if summary_cache.get_summary(summary_cache.blob_sha(content), file_type, prompt, MODEL_ID) is not None:
+            continue  # the single-file path returns it straight from the cache
+        small[rel_path] = (file, content, tokens)
+
+    batches = batching.pack([(p, small[p][2]) for p in paths if p in small])
+    batch_of = {}
+    for batch in batches:
+        if len(batch) > 1:
+            for p in batch:
+                batch_of[p] = batch
+    emitted = set()
+    for rel_path in paths:
+        batch = batch_of.get(rel_path)
+        if batch is None:
+            if rel_path in read and read[rel_path] is None:
+                continue
+            units.append(("file", rel_path, read.get(rel_path)))
+        elif batch[0] not in emitted:
+            emitted.add(batch[0])
+            units.append(("batch", [(p, small[p][0], small[p][1]) for p in batch]))
+    return units
+
+
+def _summarize_paths(temp_dir, paths, max_workers, progress=None, token_budget=None, batch_stats=None,
+                     sizes=None):
+    """
+    Summarize files concurrently; returns {rel_path: summary} in input order.
+    Small files are packed into shared prompts (see batching).
+    progress(event, data), if given, is called as each file finishes.
+    """
+    done = [0]
+    done_lock = threading.Lock()
+
+    def report(rel_path, summary):
+        if progress is None:
+            return
+        with done_lock:
+            done[0] += 1
+            count = done[0]
+        progress("file", {"path": rel_path, "summary": summary})
+        progress("progress", {"stage": "files", "done": count, "total": len(paths)})
+
+    def summarize_unit(unit):
+        kind, payload = unit[0], unit[1]
+        if kind == "batch":
+            results = summarize_batch(payload, token_budget, batch_stats)
+            for rel_path, summary in results.items():
+                report(rel_path, summary)
+            return results
+        rel_path = payload
+        file_path = os.path.join(temp_dir, rel_path)
+        file = os.path.basename(rel_path)
+        ext = _file_type(file)
+        try:
+            content = unit[2]
+            if content is None:
+                content = file_access.read_text(file_path, truncate=True)
+            if content is None:
+                report(rel_path, None)
+                return {rel_path: None}
+            print(f"[INFO] Summarizing {file} ({ext})...")
+            summary = str(summarize_content(file, content, file_type=ext, token_budget=token_budget))
+        except Exception as e:
+            print(f"[WARN] Skipping {file_path}: {e}")
+            summary = None
+        report(rel_path, summary)
+        return {rel_path: summary}
+
+    merged = {}
+    for results in map_ordered(summarize_unit, _plan_units(temp_dir, paths, sizes), max_workers):
+        merged.update(results)
+    return {path: merged[path] for path in paths if merged.get(path) is not None}
+
+
+def _git_output(temp_dir, *args):
+    return subprocess.run(
+        ["git", *args], cwd=temp_dir, check=True, capture_output=True, text=True
+    ).stdout
+
+
+def _diff_name_status(temp_dir, old_commit, new_commit):
+    """
+    Parse `git diff --name-status -M -z old..new` into
+    (changed paths, deleted paths, {old_path: new_path} for pure renames).
+    NUL-separated output keeps non-ASCII, quoted and tab-containing paths verbatim.
+    """
+    changed, deleted, renamed = set(), set(), {}
+    output = _git_output(temp_dir, "diff", "--name-status", "-M", "-z", f"{old_commit}..{new_commit}")
+    fields = iter(output.split("\0"))
+    for status in fields:
+        if not status:
+            continue
+        if status.startswith(("R", "C")):
+            old_path, new_path = next(fields), next(fields)
+            if status.startswith("C"):
+                changed.add(new_path)
+            elif status == "R100":
+                deleted.add(old_path)
+                renamed[old_path] = new_path
+            else:
+                deleted.add(old_path)
+                changed.add(new_path)
+        elif status.startswith("D"):
+            deleted.add(next(fields))
+        else:
+            changed.add(next(fields))
+    return changed, deleted, renamed
+
+
+def _flatten_previous(previous):
+    """Per-file summaries from a previous file- or folder-level result"""
+    summaries = previous.get("summaries", {})
+    if previous.get("level") == "file":
+        flat = dict(summaries)
+    elif previous.get("level") == "folder":
+        flat = {}
+        for folder, files in summaries.items():
+            for file, summary in files.items():
+                flat[os.path.normpath(os.path.join(folder, file))] = summary
+    else:
+        return {}
+    # Failed summaries are retried rather than carried over
+    return {p: s for p, s in flat.items() if not str(s).startswith("[FAILED SUMMARY]")}
+
+
+def _reusable_previous(previous, level, temp_dir):
+    """previous if it can seed an incremental run at this level, else None"""
+    if not previous or previous.get("level") != level or not previous.get("commit"):
+        return None
+    try:
+        _git_output(temp_dir, "cat-file", "-e", f"{previous['commit']}^{{commit}}")
+    except subprocess.CalledProcessError:
+        print(f"[WARN] Previous commit {previous['commit']} not found, doing a full run")
+        return None
+    return previous
+
+
+def _pack(parts, budget):
+    """Group parts into consecutive batches of at most budget tokens each"""
+    batches, batch, used = [], [], 0
+    for part in parts:
+        tokens = count_tokens(part)
+        if tokens > budget:
+            part = truncate_tokens(part, budget)
+            tokens = budget
+        if batch and used + tokens > budget:
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(part)
+        used += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _rollup(label, docs, template, token_budget=None, on_delta=None):
+    """One reduce call; results are cached by the exact input like file summaries"""
+    blob = summary_cache.blob_sha(docs)
+    cached = summary_cache.get_summary(blob, "rollup", template, MODEL_ID)
+    if cached is not None:
+        if on_delta is not None:
+            on_delta(cached)
+        return cached
+    try:
+        if template is REPO_PROMPT:
+            prompt = template.format(docs=docs)
+        else:
+            prompt = template.format(folder=label, docs=docs)
+        summary = _invoke_counted(prompt, token_budget, on_delta)
+        summary_cache.put_summary(blob, "rollup", template, MODEL_ID, summary)
+        return summary
+    except Exception as e:
+        print(f"[ERROR] Rollup failed for {label}: {e}")
+        return f"[FAILED SUMMARY] {label}"
+
+
+def reduce_summaries(label, parts, final_template, max_workers=1, budget=None, token_budget=None,
+                     on_delta=None):
+    """
+    Reduce "name: summary" parts into one summary. Parts are packed into
+    batches that fit the token budget, each batch is rolled up on its own,
+    and the rollups are reduced again until a single call fits. If a round
+    does not shrink the batch count (rollups too long to pair up), each part
+    is cut to an equal share of the budget instead. Only that last call is
+    streamed to on_delta.
+    """
+    budget = budget or REDUCE_TOKEN_BUDGET
+    parts = [p for p in parts if "[FAILED SUMMARY]" not in p]
+    if not parts:
+        return f"[FAILED SUMMARY] {label}"
+    batches = _pack(parts, budget)
+    while len(batches) > 1:
+        print(f"[INFO] Reducing {len(parts)} summaries for {label} in {len(batches)} batches...")
+        parts = map_ordered(
+            lambda batch: _rollup(label, "\n".join(batch), FOLDER_PROMPT, token_budget), batches, max_workers
+        )
+        packed = _pack(parts, budget)
+        if len(packed) >= len(batches):
+            print(f"[WARN] {label}: rollups are not shrinking, truncating {len(parts)} parts to fit")
+            share = max(1, budget // len(parts))
+            packed = [[truncate_tokens(part, share) for part in parts]]
+        batches = packed
+    return _rollup(label, "\n".join(batches[0]), final_template, token_budget, on_delta)
+
+
+def _folder_rollups(file_summaries, folders, max_workers, token_budget=None):
+    """Roll per-file summaries up into one summary per folder in `folders`"""
+    by_folder = {}
+    for rel_path, summary in file_summaries.items():
+        folder, file = os.path.split(rel_path)
+        by_folder.setdefault(folder or ".", []).append(f"{file}: {summary}")
+
+    def rollup_folder(folder):
+        parts = by_folder.get(folder, [])
+        if len(parts) == 1:
+            # Nothing to combine; reuse the file summary as is
+            return parts[0].split(": ", 1)[1]
+        return reduce_summaries(folder, parts, FOLDER_PROMPT, token_budget=token_budget)
+
+    return dict(zip(folders, map_ordered(rollup_folder, folders, max_workers)))
+
+
+def summarize_repo(repo_url, level="repo", max_workers=None, previous=None, progress=None,
+                   pipeline="default", on_delta=None, ref=None):
+    """
+    Summarize repo_url at the given level, at ref (default HEAD). When
+    `previous` is an earlier result for the same level (including its
+    "commit"), only files touched between that commit and ref are
+    re-summarized.
+
+    The repo level is a map-reduce: files are summarized one by one (sharing
+    the blob cache with file/folder runs), rolled up per folder, and the
+    folder rollups are reduced into the repo summary.
+
+    progress(event, data) receives "file", "progress" and "folder" events
+    as partial results become available.
+
+    pipeline="graph" runs files through the LangGraph file-analysis graph,
+    which summarizes and extracts imports concurrently per file, and adds
+    a per-file "dependencies" map to the result.
+
+    on_delta receives the repo-level summary text as it streams in.
+    """
+    if max_workers is None:
+        max_workers = SUMMARY_CONCURRENCY
+    token_budget = TokenBudget(REQUEST_TOKEN_BUDGET)
+    batch_stats = batching.BatchStats()
+    summaries = {}
+    print(f"[INFO] Checking out repository: {repo_url}")
+    with file_access.request_budget() as byte_budget, repo_cache.checkout(repo_url, ref=ref) as temp_dir:
+        print(f"[INFO] Repository checked out into {temp_dir}")
+        commit = _git_output(temp_dir, "rev-parse", "HEAD").strip()
+        previous = _reusable_previous(previous, level, temp_dir)
+        changed, deleted, renamed = set(), set(), {}
+        if previous:
+            changed, deleted, renamed = _diff_name_status(temp_dir, previous["commit"], commit)
+            print(f"[INFO] Incremental run from {previous['commit'][:12]}: "
+                  f"{len(changed)} changed, {len(deleted)} deleted, {len(renamed)} renamed")
+
+        # One scan of the checkout; files come back in a deterministic order
+        index = FileIndex.build(temp_dir)
+        paths = _collect_files(index)
+        sizes = {entry.path: entry.size for entry in index.files}
+        dependencies = {}
+
+        def summarize_files(todo):
+            if pipeline != "graph":
+                return _summarize_paths(temp_dir, todo, max_workers, progress, token_budget, batch_stats, sizes)
+            from controllers.file_analysis_graph import analyze_files
+            analyzed = analyze_files(repo_url, temp_dir, todo, max_workers, token_budget, progress)
+            fresh = {}
+            for rel_path, item in analyzed.items():
+                dependencies[rel_path] = item["dependencies"]
+                if item["summary"] is not None:
+                    fresh[rel_path] = item["summary"]
+            return fresh
+
+        if level in ("file", "folder"):
+            carried = {}
+            if previous:
+                carried = _flatten_previous(previous)
+                for old_path, new_path in renamed.items():
+                    if old_path in carried:
+                        carried[new_path] = carried[old_path]
+                for path in deleted | changed:
+                    carried.pop(path, None)
+            todo = [p for p in paths if p not in carried]
+            fresh = summarize_files(todo)
+            for rel_path in paths:
+                summary = carried.get(rel_path, fresh.get(rel_path))
+                if summary is None:
                     continue
-            if level == "folder" and folder_summary:
-                folder_name = root.replace(temp_dir+'/', '')
-                summaries[folder_name] = folder_summary
+                if level == "file":
+                    summaries[rel_path] = summary
+                else:
+                    folder_name, file = os.path.split(rel_path)
+                    summaries.setdefault(folder_name or ".", {})[file] = summary
 
+        folder_summaries = None
         if level == "repo":
-            all_content = ""
-            for root, dirs, files in os.walk(temp_dir):
-                dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
-                for file in files:
-                    if file in IGNORE_FILES or should_ignore_file(file):
-                        continue
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            all_content += f.read() + "\n"
-                    except Exception:
-                        continue
-            print("[INFO] Summarizing entire repository...")
-            summaries["repo_summary"] = summarize_content("entire_repo", all_content, "source")
-
-        return {
+            touched = {p for p in changed | deleted | set(renamed) | set(renamed.values())
+                       if _is_summarizable(p)}
+            folders = []
+            for rel_path in paths:
+                folder = os.path.dirname(rel_path) or "."
+                if folder not in folders:
+                    folders.append(folder)
+            carried = {}
+            if previous:
+                carried = {f: s for f, s in (previous.get("folder_summaries") or {}).items()
+                           if not str(s).startswith("[FAILED SUMMARY]")}
+                for path in touched:
+                    carried.pop(os.path.dirname(path) or ".", None)
+            if previous and not touched and "repo_summary" in previous["summaries"]:
+                summaries["repo_summary"] = previous["summaries"]["repo_summary"]
+                if on_delta is not None:
+                    on_delta(summaries["repo_summary"])
+                folder_summaries = {f: carried[f] for f in folders if f in carried}
+            else:
+                stale = [f for f in folders if f not in carried]
+                todo = [p for p in paths if (os.path.dirname(p) or ".") in stale]
+                file_summaries = summarize_files(todo)
+                rollups = _folder_rollups(file_summaries, stale, max_workers, token_budget)
+                if progress:
+                    for folder, summary in rollups.items():
+                        progress("folder", {"folder": folder, "summary": summary})
+                carried.update(rollups)
+                folder_summaries = {f: carried[f] for f in folders}
+                print("[INFO] Summarizing entire repository...")
+                summaries["repo_summary"] = reduce_summaries(
+                    "entire repository",
+                    [f"{folder}: {summary}" for folder, summary in folder_summaries.items()],
+                    REPO_PROMPT,
+                    max_workers=max_workers,
+                    token_budget=token_budget,
+                    on_delta=on_delta,
+                )
+
+        result = {
             "repo_url": repo_url,
             "level": level,
-            "summaries": summaries
+            "commit": commit,
+            "summaries": summaries,
+            "stats": {
+                "prompt_tokens": token_budget.used,
+                "batching": batch_stats.as_dict(),
+                "bytes": byte_budget.as_dict(),
+            },
         }
-    finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        
+        if folder_summaries is not None:
+            result["folder_summaries"] = folder_summaries
+        if pipeline == "graph":
+            carried_deps = dict((previous or {}).get("dependencies") or {})
+            for old_path, new_path in renamed.items():
+                if old_path in carried_deps:
+                    carried_deps[new_path] = carried_deps[old_path]
+            for path in deleted | changed:
+                carried_deps.pop(path, None)
+            carried_deps.update(dependencies)
+            result["dependencies"] = {p: carried_deps[p] for p in paths if p in carried_deps}
+        return result
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import metrics
+
+# Bump whenever the summarize_content prompt template changes
+PROMPT_VERSION = "2"
+
+SUMMARY_CACHE_BACKEND = os.getenv("SUMMARY_CACHE_BACKEND", "sqlite")  # sqlite | redis | none
+SUMMARY_CACHE_PATH = os.getenv(
+    "SUMMARY_CACHE_PATH", os.path.join(tempfile.gettempdir(), "code-essence-summaries.sqlite3")
+)
+
+
+def blob_sha(content):
+    """Git blob SHA-1 of content, identical to `git hash-object`"""
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    header = f"blob {len(data)}\0".encode("utf-8")
+    return hashlib.sha1(header + data).hexdigest()
+
+
+def cache_key(blob, file_type, prompt, model_id):
+    raw = "|".join([blob, file_type.lower(), prompt, model_id, PROMPT_VERSION])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SQLiteStore:
+    """On-disk key/value store; one connection per thread"""
+
+    def __init__(self, path, table="summaries"):
+        self.path = path
+        self.table = table
+        self.local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+
+    def _conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            f"SELECT value FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        with self._conn() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)", (key, value)
+            )
+
+
+class RedisStore:
+    """Store backed by the controllers.redis_cache interface"""
+
+    def __init__(self, namespace="blob-summaries"):
+        from controllers.redis_cache import save_docs_to_redis, load_docs_from_redis
+        self.namespace = namespace
+        self.save = save_docs_to_redis
+        self.load = load_docs_from_redis
+
+    def get(self, key):
+        return self.load(self.namespace, key)
+
+    def set(self, key, value):
+        self.save(self.namespace, key, value)
+
+
+_store = None
+_store_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0, "errors": 0}
+_stats_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None and SUMMARY_CACHE_BACKEND != "none":
+            if SUMMARY_CACHE_BACKEND == "redis":
+                _store = RedisStore()
+            else:
+                _store = SQLiteStore(SUMMARY_CACHE_PATH)
+        return _store
+
+
+def set_store(store):
+    """Swap in another backend (anything with get/set)"""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+    metrics.inc("summary_cache_total", help="Summary cache lookups and writes", result=name)
+
+
+def get_summary(blob, file_type, prompt, model_id):
+    store = get_store()
+    if store is None:
+        return None
+    try:
+        value = store.get(cache_key(blob, file_type, prompt, model_id))
+    except Exception as e:
+        print(f"[WARN] Summary cache lookup failed: {e}")
+        _count("errors")
+        return None
+    _count("hits" if value is not None else "misses")
+    return value
+
+
+def put_summary(blob, file_type, prompt, model_id, summary):
+    store = get_store()
+    if store is None:
+        return
+    try:
+        store.set(cache_key(blob, file_type, prompt, model_id), summary)
+        _count("stores")
+    except Exception as e:
+        print(f"[WARN] Summary cache store failed: {e}")
+        _count("errors")
+
+
+def cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    stats["backend"] = SUMMARY_CACHE_BACKEND
+    return stats
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import tempfile
+import pytest
+
+# The backend is a flat set of modules run from its own directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep blob caches and the job store out of the shared temp dir
+_state_dir = tempfile.mkdtemp(prefix="code-essence-tests-")
+os.environ.setdefault("SUMMARY_CACHE_PATH", os.path.join(_state_dir, "cache.sqlite3"))
+os.environ.setdefault("JOBS_DB_PATH", os.path.join(_state_dir, "jobs.sqlite3"))
+# Deterministic offline model (llm_client.FakeChatModel)
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+GIT = ["git", "-c", "user.name=test", "-c", "user.email=test@example.com"]
+
+
+@pytest.fixture
+def git_repo(tmp_path, monkeypatch):
+    """
+    A local repository plus commit(files) -> SHA, where a None text deletes
+    the file; mirrors go to a private cache dir so tests never share one
+    """
+    import repo_cache
+
+    monkeypatch.setattr(repo_cache, "REPO_CACHE_DIR", str(tmp_path / "mirrors"))
+    source = tmp_path / "source"
+    subprocess.run(GIT + ["init", "--quiet", str(source)], check=True)
+
+    def commit(files):
+        for rel_path, text in files.items():
+            path = source / rel_path
+            if text is None:
+                path.unlink()
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text)
+        subprocess.run(GIT + ["add", "-A"], cwd=source, check=True)
+        subprocess.run(GIT + ["commit", "--quiet", "-m", "update"], cwd=source, check=True)
+        return subprocess.run(GIT + ["rev-parse", "HEAD"], cwd=source, check=True,
+                              capture_output=True, text=True).stdout.strip()
+
+    commit.url = str(source)
+    return commit
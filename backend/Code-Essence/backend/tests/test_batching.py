@@ -0,0 +1,34 @@
+import uuid
+import batching
+import summarizer
+
+
+def _files(n):
+    tag = uuid.uuid4().hex
+    return [(f"k{i}", f"mod{i}.py", f"def f{i}():\n    return '{tag}'\n") for i in range(n)]
+
+
+def test_batch_answers_are_not_served_to_single_file_requests():
+    files = _files(3)
+    batched = set()
+    results = summarizer.summarize_batch(files, batched=batched)
+    assert batched == {"k0", "k1", "k2"}
+    assert results["k0"].endswith("of F1.")
+
+    _, name, content = files[0]
+    single = summarizer.summarize_content(name, content, "py")
+    assert single != results["k0"]
+    assert "character prompt" in single
+
+
+def test_batch_answers_are_reused_by_later_batches():
+    files = _files(2)
+    first = summarizer.summarize_batch(files)
+    batched = set()
+    assert summarizer.summarize_batch(files, batched=batched) == first
+    assert batched == {"k0", "k1"}
+
+
+def test_pack_respects_budget_and_file_limit():
+    assert batching.pack([("a", 5), ("b", 5), ("c", 5)], budget=10, max_files=5) == [["a", "b"], ["c"]]
+    assert batching.pack([("a", 1), ("b", 1), ("c", 1)], budget=10, max_files=2) == [["a", "b"], ["c"]]
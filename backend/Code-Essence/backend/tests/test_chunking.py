@@ -0,0 +1,18 @@
+import chunking
+
+
+def test_truncate_tokens_agrees_with_count_tokens():
+    text = "def handler(event):\n    return event\n" * 200
+    for limit in (1, 10, 257, 1000):
+        assert chunking.count_tokens(chunking.truncate_tokens(text, limit)) <= limit
+
+
+def test_truncate_tokens_keeps_short_text():
+    assert chunking.truncate_tokens("x = 1", 100) == "x = 1"
+
+
+def test_split_code_on_function_boundaries():
+    content = "".join(f"def f{i}():\n    return {i}\n\n\n" for i in range(40))
+    chunks = chunking.split_code(content, "py", 60)
+    assert "".join(chunks) == content
+    assert all(chunking.count_tokens(chunk) <= 60 for chunk in chunks)
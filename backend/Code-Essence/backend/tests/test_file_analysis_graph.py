@@ -0,0 +1,25 @@
+import uuid
+import pytest
+
+pytest.importorskip("langgraph")
+
+from chunking import TokenBudget
+from controllers.file_analysis_graph import analyze_files
+
+
+def test_analyze_files_charges_budget_and_reports_progress(tmp_path):
+    tag = uuid.uuid4().hex
+    (tmp_path / "app.py").write_text(f"import os\nfrom .util import helper\nNAME = '{tag}'\n")
+    (tmp_path / "util.js").write_text(f"const fs = require('fs');\nexport const tag = '{tag}';\n")
+    budget = TokenBudget(0)
+    events = []
+
+    results = analyze_files("repo", str(tmp_path), ["app.py", "util.js"], token_budget=budget,
+                            progress=lambda event, data: events.append((event, data)))
+
+    assert results["app.py"]["dependencies"] == ["os", ".util"]
+    assert results["util.js"]["dependencies"] == ["fs"]
+    assert all(item["summary"] for item in results.values())
+    assert budget.used > 0
+    assert sorted(data["path"] for event, data in events if event == "file") == ["app.py", "util.js"]
+    assert events[-1] == ("progress", {"stage": "files", "done": 2, "total": 2})
@@ -0,0 +1,44 @@
+import health_rules
+from scanner import FileIndex
+
+REACT_APP = {
+    "package.json": "{}",
+    "README.md": "# app",
+    "public/index.html": "<html></html>",
+    "src/App.js": "export default 1",
+    "src/components/Button/index.js": "export default 1",
+    "src/components/Card/index.js": "export default 1",
+    "server/server.js": "require('http')",
+    "server/package.json": "{}",
+    "server/app/routes.js": "module.exports = {}",
+    "packages/ui/package.json": "{}",
+}
+
+
+def _index(tmp_path, files):
+    for rel_path, text in files.items():
+        path = tmp_path / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    return FileIndex.build(str(tmp_path))
+
+
+def test_only_top_level_entry_point_folders_are_subprojects(tmp_path):
+    result = health_rules.evaluate(_index(tmp_path, REACT_APP))
+    assert list(result["projects"]) == ["root", "server"]
+    assert result["overall_repo_max_score"] == 24
+    assert result["projects"]["root"]["details"] == [
+        "Dependency file found: package.json → +2",
+        "Recognizable folder layout → +2",
+    ]
+    assert result["projects"]["server"]["details"] == [
+        "Found entry point: server.js → +2",
+        "Recognizable folder layout → +2",
+        "Dependency file found: package.json → +2",
+    ]
+
+
+def test_nested_projects_are_marked_by_manifests(tmp_path, monkeypatch):
+    monkeypatch.setattr(health_rules, "HEALTH_NESTED_PROJECTS", True)
+    result = health_rules.evaluate(_index(tmp_path, REACT_APP))
+    assert list(result["projects"]) == ["root", "packages/ui", "server"]
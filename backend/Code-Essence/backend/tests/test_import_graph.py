@@ -0,0 +1,37 @@
+import import_graph
+
+
+def _graph(internal, external, links):
+    return {
+        "nodes": [{"id": n, "group": "root"} for n in internal]
+        + [{"id": n, "group": "python"} for n in external],
+        "links": [{"source": s, "target": t} for s, t in links],
+    }
+
+
+def test_cluster_graph_small_graph_unchanged():
+    graph = _graph(["a.py"], ["requests"], [("a.py", "requests")])
+    assert import_graph.cluster_graph(graph, 5) is graph
+
+
+def test_cluster_graph_collapses_directories():
+    internal = ["app.py", "pkg/a.py", "pkg/b.py", "pkg/sub/c.py"]
+    graph = _graph(internal, ["requests"], [("app.py", "pkg/a.py"), ("pkg/a.py", "pkg/b.py"),
+                                            ("pkg/b.py", "requests"), ("pkg/sub/c.py", "requests")])
+    result = import_graph.cluster_graph(graph, 3)
+    ids = {n["id"] for n in result["nodes"]}
+    assert ids == {"app.py", "pkg/", "requests"}
+    assert {"source": "pkg/", "target": "requests", "value": 2} in result["links"]
+    assert result["clustered"]
+
+
+def test_cluster_graph_flat_repo():
+    internal = [f"m{i}.py" for i in range(5)]
+    graph = _graph(internal, ["requests"], [(n, "requests") for n in internal])
+    result = import_graph.cluster_graph(graph, 3)
+    assert len(result["nodes"]) <= 3
+    assert {n["id"] for n in result["nodes"]} == {"m0.py", "requests", import_graph.OTHER_CLUSTER}
+    assert result["links"] == [
+        {"source": import_graph.OTHER_CLUSTER, "target": "requests", "value": 4},
+        {"source": "m0.py", "target": "requests", "value": 1},
+    ]
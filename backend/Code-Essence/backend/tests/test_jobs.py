@@ -0,0 +1,63 @@
+import json
+import os
+import socket
+import time
+import uuid
+import jobs
+
+jobs.register("echo", lambda params, emit: params)
+
+
+def _insert(owner, updated_at):
+    job_id = uuid.uuid4().hex
+    jobs._conn().execute(
+        "INSERT INTO jobs (id, kind, params, status, owner, created_at, updated_at) "
+        "VALUES (?, 'echo', ?, 'running', ?, ?, ?)",
+        (job_id, json.dumps({"n": 1}), owner, updated_at, updated_at),
+    )
+    return job_id
+
+
+def _wait_done(job_id):
+    for _ in range(100):
+        if jobs.get_job(job_id)["status"] == "done":
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_recover_leaves_live_foreign_owner_alone():
+    job_id = _insert("other-pod:1", time.time())
+    assert job_id not in jobs.recover()
+    assert jobs.get_job(job_id)["status"] == "running"
+
+
+def test_recover_reclaims_expired_foreign_lease():
+    job_id = _insert("other-pod:1", time.time() - jobs.JOB_LEASE_SECONDS - 1)
+    assert job_id in jobs.recover()
+    assert _wait_done(job_id)
+
+
+def test_recover_reclaims_dead_local_process():
+    # PIDs are capped well below this, so no process has it
+    job_id = _insert(f"{socket.gethostname()}:999999999", time.time())
+    assert job_id in jobs.recover()
+    assert _wait_done(job_id)
+
+
+def test_recover_reclaims_jobs_of_an_exited_forked_worker():
+    # The parent holds a connection across the fork, like a --preload master
+    jobs._conn()
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            jobs.reset()  # startup.after_fork
+            os.write(write_end, _insert(jobs.owner(), time.time()).encode())
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    job_id = os.read(read_end, 64).decode()
+    assert jobs.get_job(job_id)["status"] == "running"
+    assert job_id in jobs.recover()
+    assert _wait_done(job_id)
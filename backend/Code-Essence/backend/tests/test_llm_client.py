@@ -0,0 +1,43 @@
+import pytest
+import llm_client
+
+
+def _half_open(model_id):
+    breaker = llm_client._guards(model_id)[1]
+    for _ in range(breaker.threshold):
+        breaker.failure()
+    breaker.opened_at -= breaker.cooldown
+    return breaker
+
+
+def test_stream_closed_early_ends_half_open_trial():
+    model_id = "test-stream-closed"
+    breaker = _half_open(model_id)
+    chunks = llm_client.stream("say something long enough to span chunks", model_id)
+    next(chunks)
+    assert breaker.state == "half-open"
+    chunks.close()
+    assert breaker.state == "closed"
+
+
+def test_stream_error_reopens_breaker():
+    class Broken:
+        def stream(self, prompt):
+            raise RuntimeError("boom")
+
+    model_id = "test-stream-error"
+    llm_client.set_llm(Broken(), model_id)
+    breaker = _half_open(model_id)
+    with pytest.raises(RuntimeError):
+        list(llm_client.stream("hi", model_id))
+    assert breaker.state == "open"
+
+
+def test_breaker_opens_after_threshold():
+    breaker = llm_client.CircuitBreaker(threshold=2, cooldown=60)
+    breaker.failure()
+    assert breaker.state == "closed"
+    breaker.failure()
+    assert breaker.state == "open"
+    with pytest.raises(llm_client.CircuitOpenError):
+        breaker.before()
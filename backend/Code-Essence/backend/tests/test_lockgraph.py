@@ -0,0 +1,64 @@
+import json
+import pytest
+import lockgraph
+
+# a -> b@1 (nested copy), d (dev) -> b@2 (hoisted)
+LOCK_V3 = {
+    "lockfileVersion": 3,
+    "packages": {
+        "": {"name": "app", "dependencies": {"a": "^1.0.0"}, "devDependencies": {"d": "^1.0.0"}},
+        "node_modules/a": {"version": "1.0.0", "dependencies": {"b": "^1.0.0"}},
+        "node_modules/a/node_modules/b": {"version": "1.0.0"},
+        "node_modules/b": {"version": "2.0.0", "dev": True},
+        "node_modules/d": {"version": "1.0.0", "dev": True, "dependencies": {"b": "^2.0.0"}},
+    },
+}
+LOCK_V1 = {
+    "lockfileVersion": 1,
+    "dependencies": {
+        "a": {"version": "1.0.0", "requires": {"b": "^1.0.0"}, "dependencies": {"b": {"version": "1.0.0"}}},
+        "b": {"version": "2.0.0", "dev": True},
+        "d": {"version": "1.0.0", "dev": True, "requires": {"b": "^2.0.0"}},
+    },
+}
+
+
+def _edges(graph):
+    return {(graph.name(node), graph.version(node), graph.name(dep), graph.version(dep))
+            for node in range(len(graph)) for dep in graph.deps(node)}
+
+
+@pytest.mark.parametrize("lock, root_deps", [(LOCK_V3, None), (LOCK_V1, ["a", "d"])])
+def test_parse_npm_resolves_nested_installs(tmp_path, lock, root_deps):
+    path = tmp_path / "package-lock.json"
+    path.write_text(json.dumps(lock))
+    graph = lockgraph.parse_npm(str(path), root_deps)
+    assert _edges(graph) == {
+        ("", "", "a", "1.0.0"), ("", "", "d", "1.0.0"),
+        ("a", "1.0.0", "b", "1.0.0"), ("d", "1.0.0", "b", "2.0.0"),
+    }
+
+
+def test_query_depth_dev_and_paths(tmp_path):
+    path = tmp_path / "package-lock.json"
+    path.write_text(json.dumps(LOCK_V3))
+    graph = lockgraph.parse_npm(str(path))
+
+    def names(result):
+        compact = result["graph"]
+        return sorted(compact["names"][i] for i in compact["name"])
+
+    assert names(lockgraph.query(graph, depth=1)) == ["", "a", "d"]
+    assert names(lockgraph.query(graph, include_dev=False)) == ["", "a", "b"]
+
+    result = lockgraph.query(graph, package="b")
+    compact = result["graph"]
+    paths = [[compact["names"][compact["name"][node]] for node in p] for p in result["paths"]]
+    assert sorted(paths) == [["", "a", "b"], ["", "d", "b"]]
+
+
+def test_compact_round_trip(tmp_path):
+    path = tmp_path / "package-lock.json"
+    path.write_text(json.dumps(LOCK_V3))
+    graph = lockgraph.parse_npm(str(path))
+    assert _edges(lockgraph.DepGraph.from_compact(graph.to_compact())) == _edges(graph)
@@ -0,0 +1,70 @@
+import pytest
+import manifests
+
+PIP_COMPILE = """\
+#
+# This file is autogenerated by pip-compile
+#
+--index-url https://pypi.org/simple
+
+numpy==1.26.4 \\
+    --hash=sha256:2a02aba9ed12e4ac4eb3ea9421c420301a0c6460d9830d74a9df87efa4912010 \\
+    --hash=sha256:03a8c78d01d9781b28a6989f6fa1bb2c4f2d51201cf99d3dd875df6fbd96b23b
+    # via pandas
+pandas==2.2.1 \\
+    --hash=sha256:8df8612be9cd1c7797c93e1c5df861b2ddda0b48b08f2c3eaa0702cf88fb5f88
+"""
+
+
+@pytest.mark.parametrize("parse, text, expected", [
+    (manifests.parse_requirements, PIP_COMPILE,
+     [["numpy", "==1.26.4", "main"], ["pandas", "==2.2.1", "main"]]),
+    (manifests.parse_requirements,
+     "Django>=4.2,<5  # web\nrequests[socks] ; python_version >= '3.8'\n-e git+https://x/y.git#egg=My_Lib\n",
+     [["django", ">=4.2,<5", "main"], ["requests", "", "main"], ["my-lib", "git+https://x/y.git", "main"]]),
+    (manifests.parse_requirements, "flask==3.0 --config-settings editable_mode=compat\n",
+     [["flask", "==3.0", "main"]]),
+    (manifests.parse_pyproject,
+     '[project]\ndependencies = ["httpx>=0.27", "Typing_Extensions"]\n'
+     '[project.optional-dependencies]\ntest = ["pytest>=8"]\n',
+     [["httpx", ">=0.27", "main"], ["typing-extensions", "", "main"], ["pytest", ">=8", "optional"]]),
+    (manifests.parse_pyproject,
+     '[tool.poetry.dependencies]\npython = "^3.10"\nrich = "^13"\n'
+     '[tool.poetry.group.dev.dependencies]\nruff = {version = "^0.4"}\n',
+     [["rich", "^13", "main"], ["ruff", "^0.4", "dev"]]),
+    (manifests.parse_go_mod,
+     "module example.com/app\n\ngo 1.22\n\nrequire github.com/pkg/errors v0.9.1\n"
+     "require (\n\tgolang.org/x/sync v0.7.0\n\tgolang.org/x/text v0.14.0 // indirect\n)\n",
+     [["github.com/pkg/errors", "v0.9.1", "main"], ["golang.org/x/sync", "v0.7.0", "main"],
+      ["golang.org/x/text", "v0.14.0", "indirect"]]),
+    (manifests.parse_package_json,
+     '{"dependencies": {"react": "^18.2.0"}, "devDependencies": {"jest": "29"}}',
+     [["react", "^18.2.0", "main"], ["jest", "29", "dev"]]),
+])
+def test_manifest_deps(parse, text, expected):
+    assert parse(text)["deps"] == expected
+
+
+def test_requirements_includes_but_not_constraints():
+    parsed = manifests.parse_requirements("-r base.txt\n--requirement=dev.txt\n-c constraints.txt\n")
+    assert parsed["includes"] == ["base.txt", "dev.txt"]
+
+
+def test_package_lock_resolved_versions():
+    v3 = '{"packages": {"": {}, "node_modules/a": {"version": "1.0.0"}, "node_modules/a/node_modules/b": {"version": "1.0.0"}}}'
+    v1 = '{"dependencies": {"a": {"version": "1.0.0"}}}'
+    assert manifests.parse_package_lock(v3)["resolved"] == {"a": "1.0.0"}
+    assert manifests.parse_package_lock(v1)["resolved"] == {"a": "1.0.0"}
+
+
+def test_same_name_in_two_ecosystems_stays_two_nodes(tmp_path):
+    from scanner import FileIndex
+
+    (tmp_path / "package.json").write_text('{"dependencies": {"redis": "^4.6.0", "project": "1.0.0"}}')
+    (tmp_path / "requirements.txt").write_text("redis==5.0\n")
+    graph = manifests.build_graph(FileIndex.build(str(tmp_path)))
+    nodes = {node["id"]: node for node in graph["nodes"]}
+    assert nodes["npm:redis"] == {"id": "npm:redis", "name": "redis", "group": "node", "versions": ["^4.6.0"]}
+    assert nodes["pypi:redis"]["versions"] == ["==5.0"]
+    assert nodes["project"]["group"] == "root"
+    assert nodes["npm:project"]["name"] == "project"
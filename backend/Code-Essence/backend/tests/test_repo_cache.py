@@ -0,0 +1,63 @@
+import asyncio
+import subprocess
+import pytest
+import repo_cache
+
+TOKEN = "ghp_SECRET123"
+
+
+@pytest.fixture
+def token_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(repo_cache, "GITHUB_TOKEN", TOKEN)
+    monkeypatch.setattr(repo_cache, "REPO_CACHE_DIR", str(tmp_path / "mirrors"))
+    return tmp_path
+
+
+def test_token_stays_off_the_command_line_and_out_of_errors(token_cache, monkeypatch):
+    calls = []
+
+    def failing_run(args, env=None, **kwargs):
+        calls.append((args, env))
+        raise subprocess.CalledProcessError(
+            128, args, stderr=f"fatal: unable to access 'https://{TOKEN}@github.com/acme/missing/'"
+        )
+
+    monkeypatch.setattr(repo_cache.subprocess, "run", failing_run)
+    with pytest.raises(subprocess.CalledProcessError) as info:
+        repo_cache.ensure_mirror("https://github.com/acme/missing")
+
+    args, env = calls[0]
+    assert not any(TOKEN in arg for arg in args)
+    assert "http.https://github.com/.extraheader" in env.values()
+    assert TOKEN not in str(info.value)
+    assert TOKEN not in info.value.stderr
+
+
+def test_mirror_with_token_configured(token_cache, git_repo):
+    head = git_repo({"a.py": "print('a')\n"})
+    mirror = repo_cache.ensure_mirror(git_repo.url)
+    assert repo_cache.resolve_head(git_repo.url) == head
+    with open(f"{mirror}/config") as f:
+        assert TOKEN not in f.read()
+
+
+@pytest.mark.parametrize("pinned", [True, False])
+def test_tree_source_without_mirror_reads_any_ref(git_repo, pinned):
+    first = git_repo({"a.py": "print('a')\n"})
+    git_repo({"b.py": "print('b')\n"})
+    ref = first if pinned else None
+    with repo_cache.tree_source(git_repo.url, ref=ref) as (git_dir, rev, partial):
+        assert partial
+        assert (repo_cache.blob_id(git_dir, rev, "b.py") is None) == pinned
+        sha = repo_cache.blob_id(git_dir, rev, "a.py")
+        assert repo_cache.read_blob(git_dir, sha) == b"print('a')\n"
+
+
+def test_tree_source_async_reads_a_commit_sha(git_repo):
+    first = git_repo({"a.py": "print('a')\n"})
+    git_repo({"b.py": "print('b')\n"})
+
+    async def paths():
+        return [entry["path"] async for entry in repo_cache.list_tree_async(git_repo.url, ref=first)]
+
+    assert asyncio.run(paths()) == ["a.py"]
@@ -0,0 +1,34 @@
+import uuid
+import result_cache
+
+
+def _key():
+    return result_cache.request_key("test", "https://github.com/o/r", uuid.uuid4().hex)
+
+
+def test_results_with_failed_summaries_are_not_cached():
+    key, calls = _key(), []
+
+    def compute():
+        calls.append(1)
+        return {"summaries": {"a.py": "[FAILED SUMMARY] a.py", "b.py": "fine"}}
+
+    assert result_cache.get_or_compute(key, compute)[1] == result_cache.MISS
+    assert result_cache.get_or_compute(key, compute)[1] == result_cache.MISS
+    assert len(calls) == 2
+
+
+def test_complete_results_are_cached():
+    key = _key()
+    body, status = result_cache.get_or_compute(key, lambda: {"summaries": {"a.py": "fine"}})
+    assert status == result_cache.MISS
+    assert result_cache.get_or_compute(key, lambda: {}) == (body, result_cache.HIT)
+
+
+def test_hit_found_inside_flight_counts_as_hit(monkeypatch):
+    key = _key()
+    lookups = iter([None, '{"cached": true}'])
+    monkeypatch.setattr(result_cache._cache, "get", lambda k: next(lookups))
+    before = result_cache.cache_stats()["hit"]
+    assert result_cache.get_or_compute(key, lambda: {}) == ('{"cached": true}', result_cache.HIT)
+    assert result_cache.cache_stats()["hit"] == before + 1
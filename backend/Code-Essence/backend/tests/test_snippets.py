@@ -0,0 +1,30 @@
+import uuid
+import snippets
+
+
+def test_batched_snippet_answer_not_served_to_streaming_request():
+    tag = uuid.uuid4().hex
+    codes = [f"x_{i} = '{tag}'" for i in range(3)]
+    keys = {snippets.snippet_key(code, "py"): (code, "py") for code in codes}
+    results = snippets._run_batch(keys)
+    summary, store_prompt = results[snippets.snippet_key(codes[0], "py")]
+    assert store_prompt != snippets._prompt("py")
+    snippets.summary_cache.put_summary(snippets.snippet_key(codes[0], "py"), "py", store_prompt,
+                                       snippets.summarizer.MODEL_ID, summary)
+
+    deltas = []
+    streamed, status = snippets.summarize_snippet(codes[0], "py", on_delta=deltas.append)
+    assert status == "MISS"
+    assert streamed != summary
+
+
+def test_equivalent_snippets_share_a_key():
+    assert snippets.snippet_key("x = 1  # note\n", "py") == snippets.snippet_key("x = 1", "py")
+
+
+def test_python_indentation_is_part_of_the_key():
+    inside = "if x:\n    a()\n    b()\n"
+    after = "if x:\n    a()\nb()\n"
+    assert snippets.snippet_key(inside, "py") != snippets.snippet_key(after, "py")
+    # Indent width, blank lines and comments still do not matter
+    assert snippets.snippet_key(inside, "py") == snippets.snippet_key("if x:  # guard\n\n\ta()\n\tb()", "py")
@@ -0,0 +1,46 @@
+import llm_client
+import summarizer
+
+
+class VerboseModel:
+    """Answers every prompt with the same long text, so rollups never shrink"""
+
+    def __init__(self, words):
+        self.words = words
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return llm_client.FakeMessage(" ".join(f"w{self.calls}x{i}" for i in range(self.words)))
+
+
+def test_reduce_summaries_stops_when_rollups_do_not_shrink(monkeypatch):
+    model = VerboseModel(words=500)
+    monkeypatch.setitem(llm_client._models, summarizer.MODEL_ID, model)
+    parts = [f"file{i}.py: " + "detail " * 150 for i in range(6)]
+    summary = summarizer.reduce_summaries("pkg", parts, summarizer.FOLDER_PROMPT, budget=1000)
+    assert summary.startswith("w")
+    assert model.calls < 20
+
+
+def test_reduce_summaries_single_batch():
+    summary = summarizer.reduce_summaries("pkg", ["a.py: parses input", "b.py: writes output"],
+                                          summarizer.FOLDER_PROMPT)
+    assert summary.startswith("Summary ")
+
+
+def test_summarize_repo_at_a_pinned_commit(git_repo):
+    first = git_repo({"a.py": "def a():\n    return 1\n"})
+    git_repo({"b.py": "def b():\n    return 2\n"})
+    result = summarizer.summarize_repo(git_repo.url, level="file", ref=first)
+    assert result["commit"] == first
+    assert list(result["summaries"]) == ["a.py"]
+
+
+def test_diff_name_status_keeps_unusual_paths(git_repo):
+    old = git_repo({"src/été.py": "x = 1\n", "tab\there.py": "y = 2\n", 'q"uote.py': "z = 3\n"})
+    new = git_repo({"src/été.py": "x = 2\n", 'q"uote.py': None, "tab\there.py": None, "täb.py": "y = 2\n"})
+    changed, deleted, renamed = summarizer._diff_name_status(git_repo.url, old, new)
+    assert changed == {"src/été.py"}
+    assert deleted == {'q"uote.py', "tab\there.py"}
+    assert renamed == {"tab\there.py": "täb.py"}
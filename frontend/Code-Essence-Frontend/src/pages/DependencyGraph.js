@@ -3,9 +3,32 @@ import { useLocation } from "react-router-dom";
 import { Box, Typography, CircularProgress, Drawer, List, ListItem, ListItemText } from "@mui/material";
 import ForceGraph2D from "react-force-graph-2d";
 
+// Expand the compact CSR graph returned by mode=transitive into nodes/links.
+// npm installs one name@version at several nested paths, so ids are node indexes.
+function decodeCompactGraph(graph) {
+  const dev = new Set(graph.dev || []);
+  const nodes = graph.name.map((nameId, i) => ({
+    id: i,
+    label: i === 0 ? "(root)" : `${graph.names[nameId]}@${graph.versions[graph.version[i]]}`,
+    group: dev.has(i) ? "dev" : (graph.depth ? graph.depth[i] : 0),
+  }));
+  const links = [];
+  for (let i = 0; i < nodes.length; i++) {
+    for (let k = graph.offsets[i]; k < graph.offsets[i + 1]; k++) {
+      links.push({ source: i, target: graph.targets[k] });
+    }
+  }
+  return { nodes, links };
+}
+
+function withLabels(graph) {
+  return { ...graph, nodes: graph.nodes.map((node) => ({ ...node, label: node.name || node.id })) };
+}
+
 export default function DependencyGraph() {
   const location = useLocation();
   const repoUrl = location.state?.repoUrl || "";
+  const mode = location.state?.mode; // manifest (default) | imports | transitive
   const [graphData, setGraphData] = useState(null);
   const [loading, setLoading] = useState(true);
   const [nodeColors, setNodeColors] = useState({}); // Store actual node colors
@@ -19,14 +42,14 @@ export default function DependencyGraph() {
         const response = await fetch("http://localhost:5000/dependency_graph", {
           method: "POST",
           headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ repo_url: repoUrl }),
+          body: JSON.stringify(mode ? { repo_url: repoUrl, mode } : { repo_url: repoUrl }),
         });
         if (!response.ok) {
           const errorText = await response.text();
           throw new Error(`HTTP error! status: ${response.status}, details: ${errorText}`);
         }
         const data = await response.json();
-        setGraphData(data);
+        setGraphData(data.graph ? decodeCompactGraph(data.graph) : withLabels(data));
       } catch (err) {
         console.error("Error fetching dependency graph:", err);
       } finally {
@@ -35,7 +58,7 @@ export default function DependencyGraph() {
     };
 
     fetchGraph();
-  }, [repoUrl]);
+  }, [repoUrl, mode]);
 
   if (loading) {
     return (
@@ -54,7 +77,7 @@ export default function DependencyGraph() {
   graphData.nodes.forEach((node) => {
     const color = nodeColors[node.id] || "grey";
     if (!filesByColor[color]) filesByColor[color] = [];
-    filesByColor[color].push(node.id);
+    filesByColor[color].push(node);
   });
 
   return (
@@ -81,7 +104,7 @@ export default function DependencyGraph() {
           {Object.entries(filesByColor).map(([color, files]) => (
             <Box key={color}>
               {files.map((file) => (
-                <ListItem key={file} sx={{ pl: 2 }}>
+                <ListItem key={file.id} sx={{ pl: 2 }}>
                   <Box
                     sx={{
                       width: 16,
@@ -92,7 +115,7 @@ export default function DependencyGraph() {
                       display: "inline-block",
                     }}
                   />
-                  <ListItemText primary={file} sx={{ color: "white", ml: 1 }} />
+                  <ListItemText primary={file.label} sx={{ color: "white", ml: 1 }} />
                 </ListItem>
               ))}
             </Box>
@@ -108,7 +131,7 @@ export default function DependencyGraph() {
         <ForceGraph2D
           graphData={graphData}
           nodeAutoColorBy="group"
-          nodeLabel="id"
+          nodeLabel="label"
           linkDirectionalArrowLength={6}
           linkDirectionalArrowRelPos={1}
           width={window.innerWidth - 250} // reserve space for sidebar
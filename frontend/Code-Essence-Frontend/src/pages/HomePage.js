@@ -30,6 +30,11 @@ export default function HomePage() {
     navigate("/dependency-graph", { state: { repoUrl } });
   };
 
+  const goTransitiveGraph = () => {
+    if (!repoUrl.trim()) return;
+    navigate("/dependency-graph", { state: { repoUrl, mode: "transitive" } });
+  };
+
   return (
     <Box
       sx={{
@@ -99,6 +104,13 @@ export default function HomePage() {
         >
           Dependency Graph
         </Button>
+        <Button
+          onClick={goTransitiveGraph}
+          variant="contained"
+          sx={{ backgroundColor: "#0c610cff", color: "white", fontWeight: "bold" }}
+        >
+          Transitive Deps
+        </Button>
       </Box>
 
       <Box sx={{ position: "absolute", top: 16, right: 16 }}>